@@ -1,8 +1,13 @@
-import json
 import os
+import sys
+from pathlib import Path
 
 import tqdm
 
+PARSER_DIR = Path(__file__).resolve().parents[1] / 'scripts' / 'parser'
+sys.path.insert(0, str(PARSER_DIR))  # json_backend is shared with the parser scripts
+import json_backend  # noqa: E402
+
 path = "frontmatter_transitions"
 total = 0
 little = 0
@@ -14,8 +19,8 @@ empty_list = []
 selected_list = []
 for trans_file in tqdm.tqdm(os.listdir(path)):
     total += 1
-    with open(os.path.join(path, trans_file)) as fd:
-        trans_content = json.load(fd)
+    with open(os.path.join(path, trans_file), 'rb') as fd:
+        trans_content = json_backend.loads(fd.read())
         if "activities" not in trans_content:
             timeout += 1
             continue
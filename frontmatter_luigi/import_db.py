@@ -1,10 +1,15 @@
 import argparse
-import json
 import os
 import sqlite3
+import sys
+from pathlib import Path
 
 import tqdm
 
+PARSER_DIR = Path(__file__).resolve().parents[1] / 'scripts' / 'parser'
+sys.path.insert(0, str(PARSER_DIR))  # json_backend is shared with the parser scripts
+import json_backend  # noqa: E402
+
 
 class SQLiteHelper:
     create_pkg_table = ('''CREATE TABLE IF NOT EXISTS pkgs (
@@ -128,8 +133,7 @@ def get_pkg(apk_path):
 
 def import_apk(apk_path, conn):
     cursor = conn.cursor()
-    with open(apk_path) as fd:
-        data = json.load(fd)
+    data = json_backend.load(apk_path)
     pkg_name, pkg_ver = get_pkg(apk_path)
     cursor.execute(SQLiteHelper.add_pkg, (pkg_name, pkg_ver))
     pid = cursor.lastrowid
@@ -0,0 +1,37 @@
+"""
+Compares decoding speed of the available json backends on frontmatter result files
+"""
+import argparse
+import time
+from pathlib import Path
+
+import json_backend
+
+
+def bench_backend(name, files, repeat):
+    json_backend.set_backend(name)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for file in files:
+            json_backend.load(file)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-d', '--data-dir', action='append', required=True, help="folder with json analysis results, can be repeated")
+    parser.add_argument('-n', '--repeat', type=int, default=3)
+    parser.add_argument('-l', '--limit', type=int, default=0, help="use at most this number of files per folder")
+    args = parser.parse_args()
+    files = []
+    for data_dir in args.data_dir:
+        dir_files = sorted(f for f in Path(data_dir).iterdir() if f.suffix.endswith('json'))
+        files.extend(dir_files[:args.limit] if args.limit else dir_files)
+    total_mb = sum(f.stat().st_size for f in files) * args.repeat / 2 ** 20
+    print(f"{len(files)} files, {total_mb / args.repeat:.1f} MB, {args.repeat} rounds")
+    default_backend = json_backend.get_backend()
+    for name in json_backend.BACKENDS:
+        bench_backend(name, files[:10], 1)  # warm up
+        elapsed = bench_backend(name, files, args.repeat)
+        marker = '*' if name == default_backend else ' '
+        print(f"{marker} {name:10} {elapsed:8.2f}s {total_mb / elapsed:8.1f} MB/s {len(files) * args.repeat / elapsed:8.1f} files/s")
@@ -0,0 +1,74 @@
+"""
+Measures memory retained by a parsed app (widgets, activities, transitions and apis) per widget
+--legacy repeats the measurement with the former dict-based View without string interning for comparison
+"""
+import argparse
+import gc
+import tracemalloc
+from pathlib import Path
+
+import frontmatter_parser
+import permission_index
+from frontmatter_parser import FrontmatterUiParser
+
+
+class LegacyView:
+    """
+    View before __slots__: per-instance __dict__ and own empty lists
+    """
+
+    def __init__(self):
+        self.var_name = ""
+        self.icon = ""
+        self.listeners = []
+        self.label = ""
+        self.clazz = ""
+        self.activity = ""
+        self.is_menu = ""
+        self.is_dialog = ""
+        self.context = ""
+        self.api = []
+
+
+def measure(files, api_dir):
+    total_bytes = 0
+    total_widgets = 0
+    for file in files:
+        gc.collect()
+        tracemalloc.start()
+        frontmatter = FrontmatterUiParser(file)
+        frontmatter.read_ui(True)
+        api_file = api_dir / file.name if api_dir else None
+        if api_file and api_file.exists():
+            frontmatter.read_api(api_file, False)
+        gc.collect()
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        total_bytes += current
+        total_widgets += len(frontmatter.ui)
+        del frontmatter
+    return total_bytes, total_widgets
+
+
+def report(name, total_bytes, total_widgets):
+    per_widget = total_bytes / total_widgets if total_widgets else 0
+    print(f"{name:8} {total_widgets:10} widgets {total_bytes / 2 ** 20:10.1f} MB {per_widget:10.1f} bytes/widget")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-d', '--data-dir', required=True, help="folder with json ui analysis results")
+    parser.add_argument('-a', '--api-dir', help="folder with json api analysis results")
+    parser.add_argument('-l', '--limit', type=int, default=0, help="use at most this number of files")
+    parser.add_argument('--legacy', default=False, action='store_true', help="also measure the former dict-based representation")
+    args = parser.parse_args()
+    files = sorted(f for f in Path(args.data_dir).iterdir() if f.suffix.endswith('json'))
+    if args.limit:
+        files = files[:args.limit]
+    api_dir = Path(args.api_dir) if args.api_dir else None
+    permission_index.get_index()  # shared by all apps, not part of the measurement
+    report('current', *measure(files, api_dir))
+    if args.legacy:
+        frontmatter_parser.View = LegacyView
+        frontmatter_parser.intern = lambda string: string
+        report('legacy', *measure(files, api_dir))
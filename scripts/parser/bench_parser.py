@@ -0,0 +1,216 @@
+"""
+Benchmarks of the parser on a result corpus (real or generated by generate_results.py): decoding and parsing of the ui
+and api results, the three table drivers and the sqlite import of frontmatter_luigi/import_db.py
+Every benchmark runs in a fresh interpreter so that its peak RSS is not inflated by the previous ones, the report has
+apps/s, MB/s (of result files read) and the peak RSS of the benchmark and of its worker processes
+The results can be saved and compared with a baseline to catch regressions
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import result_source
+from driver import ParseOptions, RunOptions
+
+BENCHMARKS = ('read_ui', 'read_api', 'widgets', 'activity', 'extract', 'import_db')
+LUIGI_DIR = Path(__file__).resolve().parents[2] / 'frontmatter_luigi'
+
+
+def result_size(path) -> int:
+    return path.stat().st_size if path.exists() else 0
+
+
+def corpus_pairs(args):
+    return list(result_source.list_pairs(Path(args.ui_dir), Path(args.api_dir), with_api=True))
+
+
+def bench_read_ui(args):
+    from frontmatter_parser import FrontmatterUiParser
+    pairs = corpus_pairs(args)
+    start = time.perf_counter()
+    for ui_file, _ in pairs:
+        FrontmatterUiParser(ui_file).read_ui(force=False, streaming=args.streaming)
+    return len(pairs), sum(result_size(ui_file) for ui_file, _ in pairs), time.perf_counter() - start
+
+
+def bench_read_api(args):
+    """
+    only the api results are timed, the ui results they are attached to are parsed beforehand
+    """
+    from frontmatter_parser import FrontmatterUiParser
+    parsers = []
+    for ui_file, api_file in corpus_pairs(args):
+        frontmatter = FrontmatterUiParser(ui_file)
+        frontmatter.read_ui(force=False)
+        parsers.append((frontmatter, api_file))
+    start = time.perf_counter()
+    for frontmatter, api_file in parsers:
+        frontmatter.read_api(api_file, sensitive_only=True, streaming=args.streaming)
+    return len(parsers), sum(result_size(api_file) for _, api_file in parsers), time.perf_counter() - start
+
+
+def bench_driver(args, read_data):
+    pairs = corpus_pairs(args)
+    start = time.perf_counter()
+    read_data()
+    seconds = time.perf_counter() - start
+    if args.parallel:  # reap the workers to account their peak RSS
+        from joblib.externals.loky import get_reusable_executor
+        get_reusable_executor().shutdown(wait=True)
+    return len(pairs), sum(result_size(ui_file) + result_size(api_file) for ui_file, api_file in pairs), seconds
+
+
+def bench_widgets(args):
+    import parse_ui_to_widgets
+    options = ParseOptions(with_api=True, sensitive_only=True, streaming=args.streaming)
+    return bench_driver(args, lambda: parse_ui_to_widgets.read_data(Path(args.ui_dir), Path(args.api_dir), options, RunOptions(parallel=args.parallel)))
+
+
+def bench_activity(args):
+    import parse_ui_to_activity
+    options = ParseOptions(with_api=True, sensitive_only=True, force=True, streaming=args.streaming)
+    return bench_driver(args, lambda: parse_ui_to_activity.read_data(Path(args.ui_dir), Path(args.api_dir), options, RunOptions(parallel=args.parallel)))
+
+
+def bench_extract(args):
+    import extract_corpus
+    options = ParseOptions(with_api=True, sensitive_only=True, streaming=args.streaming, tables=list(extract_corpus.TABLES))
+    return bench_driver(args, lambda: extract_corpus.read_data(Path(args.ui_dir), Path(args.api_dir), options, RunOptions(parallel=args.parallel)))
+
+
+def bench_import_db(args):
+    """
+    imports the legacy results into an in-memory database with the schema of import_db.SQLiteHelper
+    """
+    import sqlite3
+    sys.path.insert(0, str(LUIGI_DIR))
+    import import_db
+    helper = import_db.SQLiteHelper
+    conn = sqlite3.connect(':memory:')
+    for statement in (helper.create_pkg_table, helper.create_index, helper.create_activity_table, helper.create_widget_table,
+                      helper.create_text_table, helper.create_drawable_table):
+        conn.execute(statement)
+    files = sorted(Path(args.legacy_dir).glob('*.json'))
+    start = time.perf_counter()
+    for file in files:
+        import_db.import_apk(str(file), conn)
+    conn.commit()
+    seconds = time.perf_counter() - start
+    conn.close()
+    return len(files), sum(file.stat().st_size for file in files), seconds
+
+
+def run_benchmark(name, args):
+    """
+    runs the benchmark in this process
+    :return: measurements
+    """
+    apps, size, seconds = globals()[f"bench_{name}"](args)
+    self_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    workers_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return {'apps': apps, 'bytes': size, 'seconds': round(seconds, 4), 'apps_per_s': round(apps / seconds, 2) if seconds else None,
+            'mb_per_s': round(size / seconds / 1e6, 3) if seconds else None, 'peak_rss_mb': round(self_rss / 1024, 1),
+            'workers_peak_rss_mb': round(workers_rss / 1024, 1)}
+
+
+def spawn_benchmark(name, args):
+    """
+    runs the benchmark in a fresh interpreter
+    """
+    command = [sys.executable, __file__, '--run', name, '-d', str(args.ui_dir), '-a', str(args.api_dir)]
+    if args.legacy_dir:
+        command += ['--legacy-dir', str(args.legacy_dir)]
+    if args.parallel:
+        command.append('-p')
+    if args.streaming:
+        command.append('--streaming')
+    process = subprocess.run(command, capture_output=True, text=True, cwd=Path(__file__).parent)
+    if process.returncode != 0:
+        raise RuntimeError(f"benchmark {name} failed:\n{process.stderr}")
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def best_of(runs: list) -> dict:
+    """
+    fastest run, with the highest peak RSS of all runs
+    """
+    best = dict(min(runs, key=lambda run: run['seconds']))
+    best['peak_rss_mb'] = max(run['peak_rss_mb'] for run in runs)
+    best['workers_peak_rss_mb'] = max(run['workers_peak_rss_mb'] for run in runs)
+    return best
+
+
+def regressions(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    :return: descriptions of the benchmarks slower or bigger than the baseline by more than tolerance (fraction)
+    """
+    found = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        base = baseline[name]
+        if base['apps_per_s'] and result['apps_per_s'] < base['apps_per_s'] * (1 - tolerance):
+            found.append(f"{name}: {result['apps_per_s']} apps/s, baseline {base['apps_per_s']}")
+        if result['peak_rss_mb'] > base['peak_rss_mb'] * (1 + tolerance):
+            found.append(f"{name}: peak RSS {result['peak_rss_mb']} MB, baseline {base['peak_rss_mb']}")
+    return found
+
+
+def print_report(results: dict):
+    print(f"{'benchmark':<12}{'apps':>8}{'seconds':>10}{'apps/s':>10}{'MB/s':>9}{'RSS MB':>9}{'workers MB':>12}")
+    for name, result in results.items():
+        print(f"{name:<12}{result['apps']:>8}{result['seconds']:>10.3f}{result['apps_per_s'] or 0:>10.1f}{result['mb_per_s'] or 0:>9.2f}"
+              f"{result['peak_rss_mb']:>9.1f}{result['workers_peak_rss_mb']:>12.1f}")
+
+
+def run_suite(args) -> dict:
+    names = [name for name in args.benchmarks if name != 'import_db' or args.legacy_dir]
+    results = {}
+    for name in names:
+        results[name] = best_of([spawn_benchmark(name, args) for _ in range(args.repeat)])
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-d', '--ui-dir', help="folder or archive with the ui results")
+    parser.add_argument('-a', '--api-dir', help="folder or archive with the api results")
+    parser.add_argument('--legacy-dir', help="folder with results in the format of import_db.py, import_db is skipped without it")
+    parser.add_argument('--generate', type=int, metavar='N', help="benchmark on N generated apps instead of -d/-a/--legacy-dir")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the generated apps")
+    parser.add_argument('-b', '--benchmarks', nargs='+', choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument('-p', '--parallel', default=False, action='store_true', help="run the drivers with their worker processes")
+    parser.add_argument('--streaming', default=False, action='store_true', help="parse the results with the streaming parser")
+    parser.add_argument('--repeat', type=int, default=1, help="runs per benchmark, the fastest is reported")
+    parser.add_argument('-o', '--output-file', help="save the results as json")
+    parser.add_argument('--baseline', help="json results of an earlier run, exit with 1 if a benchmark regressed")
+    parser.add_argument('--tolerance', type=float, default=0.1, help="accepted slowdown/memory growth relative to the baseline")
+    parser.add_argument('--run', choices=BENCHMARKS, help=argparse.SUPPRESS)  # benchmark process
+    args = parser.parse_args()
+    if args.run:
+        print(json.dumps(run_benchmark(args.run, args)))
+        sys.exit(0)
+    with tempfile.TemporaryDirectory(prefix='bench_parser_') as tmp:
+        if args.generate:
+            import generate_results
+            args.ui_dir, args.api_dir = generate_results.generate(Path(tmp), args.generate, seed=args.seed)
+            if 'import_db' in args.benchmarks:
+                args.legacy_dir, _ = generate_results.generate(Path(tmp), args.generate, seed=args.seed, legacy=True)
+        elif not args.ui_dir or not args.api_dir:
+            parser.error("either --generate or -d and -a are required")
+        results = run_suite(args)
+    print_report(results)
+    if args.output_file:
+        with open(args.output_file, 'w') as fd:
+            json.dump(results, fd, indent=2)
+    if args.baseline:
+        with open(args.baseline) as fd:
+            found = regressions(results, json.load(fd), args.tolerance)
+        for regression in found:
+            print(f"regression {regression}")
+        sys.exit(1 if found else 0)
@@ -0,0 +1,56 @@
+"""
+Compares the transport of extracted rows from workers to the parent: row dicts vs packed rows (table_writer.pack_rows)
+Measures the pickled size, the workers' and the parent's share of serialization and the parent's writing time for the results of extract_corpus.process_file
+"""
+import argparse
+import pickle
+import tempfile
+import time
+from pathlib import Path
+
+import extract_corpus
+from driver import ParseOptions
+from table_writer import open_writer
+
+
+def extract(file_paths, packed):
+    options = ParseOptions(tables=list(extract_corpus.TABLES), packed=packed)
+    return [extract_corpus.process_file(data_file, api_file, options) for data_file, api_file in file_paths]
+
+
+def bench_mode(file_paths, packed, out_dir: Path):
+    start = time.perf_counter()
+    results = extract(file_paths, packed)
+    extract_time = time.perf_counter() - start
+    start = time.perf_counter()
+    payloads = [pickle.dumps(res, protocol=pickle.HIGHEST_PROTOCOL) for res in results]  # as joblib sends them to the parent
+    dump_time = time.perf_counter() - start
+    start = time.perf_counter()
+    results = [pickle.loads(payload) for payload in payloads]
+    load_time = time.perf_counter() - start
+    start = time.perf_counter()
+    writers = {table: open_writer(out_dir / f"{table}.csv") for table in extract_corpus.TABLES}
+    for rows, _, _ in results:
+        for table, table_rows in rows.items():
+            writers[table].write_app(table_rows)
+    for writer in writers.values():
+        writer.close()
+    write_time = time.perf_counter() - start
+    return extract_time, sum(map(len, payloads)), dump_time, load_time, write_time
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-d', '--data-dir', required=True, help="folder with json ui analysis results")
+    parser.add_argument('-a', '--api-dir', required=True, help="folder with json api analysis results")
+    parser.add_argument('-l', '--limit', type=int, default=0, help="use at most this number of apps")
+    args = parser.parse_args()
+    file_paths = extract_corpus.list_files(Path(args.data_dir), Path(args.api_dir), False)
+    if args.limit:
+        file_paths = file_paths[:args.limit]
+    print(f"{len(file_paths)} apps")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for mode in ('dicts', 'packed'):
+            extract_time, size, dump_time, load_time, write_time = bench_mode(file_paths, mode == 'packed', Path(tmp_dir))
+            parent_time = load_time + write_time
+            print(f"{mode:7} worker: extract {extract_time:6.2f}s pickle {dump_time:6.2f}s | {size / 2 ** 20:7.1f} MB | parent: unpickle {load_time:6.2f}s write {write_time:6.2f}s total {parent_time:6.2f}s")
@@ -0,0 +1,100 @@
+"""
+Checkpoints of long extraction runs
+Results of finished apps are appended to shard files in the checkpoint folder, every `every` apps the current shard is
+flushed to disk and committed to the manifest; a resumed run replays the committed shards (rebuilding the outputs and stats)
+and parses only the remaining apps, results of an uncommitted shard are parsed again
+The shards hold the pickled results of every app, in addition to the output files, until the folder is removed
+"""
+import json
+import os
+import pickle
+from pathlib import Path
+
+from dedup import read_records
+
+CHECKPOINT_EVERY = 1000  # apps per shard
+MANIFEST = 'manifest.json'
+SHARD_PATTERN = 'shard-*.pickle'
+
+
+class Checkpoint:
+    def __init__(self, path: Path, options: dict, every: int = CHECKPOINT_EVERY, resume: bool = False):
+        """
+        :param options: extraction options, a run can only be resumed with the same options
+        :param resume: continue from the committed shards, otherwise the checkpoint files in the folder are removed
+        """
+        self.path = Path(path)
+        self.options = repr(sorted(options.items()))
+        self.every = every
+        self.shards = []
+        if resume and (self.path / MANIFEST).exists():
+            with (self.path / MANIFEST).open() as fd:
+                manifest = json.load(fd)
+            if manifest['options'] != self.options:
+                raise ValueError(f"checkpoint {self.path} was created with different options: {manifest['options']}")
+            self.shards = manifest['shards']
+        elif self.path.exists():
+            self.clear()
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.shard_fd = None
+        self.shard_apps = 0
+
+    def clear(self):
+        """
+        removes the manifest and shards of an earlier run, other files in the folder are kept
+        """
+        for path in [self.path / MANIFEST, self.path / f"{MANIFEST}.tmp", *self.path.glob(SHARD_PATTERN)]:
+            path.unlink(missing_ok=True)
+
+    def replay(self, names: set = None):
+        """
+        yields (ui file name, result) of the apps in committed shards
+        :param names: replay only these apps
+        """
+        for shard in self.shards:
+            for name, result in read_records(self.path / shard):
+                if names is None or name in names:
+                    yield name, result
+
+    def add(self, name: str, result):
+        if self.shard_fd is None:
+            shard = f"shard-{len(self.shards):06d}.pickle"
+            self.shard_fd = (self.path / shard).open('wb')
+        pickle.dump((name, result), self.shard_fd, protocol=pickle.HIGHEST_PROTOCOL)
+        self.shard_apps += 1
+        if self.shard_apps >= self.every:
+            self.commit()
+
+    def commit(self):
+        if self.shard_fd is None:
+            return
+        self.shard_fd.flush()
+        os.fsync(self.shard_fd.fileno())
+        self.shard_fd.close()
+        self.shards.append(Path(self.shard_fd.name).name)
+        self.shard_fd = None
+        self.shard_apps = 0
+        tmp_path = self.path / f"{MANIFEST}.tmp"
+        with tmp_path.open('w') as fd:
+            json.dump({'options': self.options, 'shards': self.shards}, fd)
+        os.replace(tmp_path, self.path / MANIFEST)  # the shard is part of the checkpoint only once the manifest lists it
+
+
+def checkpointed_results(file_paths: list, checkpoint: Checkpoint, compute):
+    """
+    yields the results of the apps of committed shards first, then of the remaining apps, which are checkpointed
+    :param file_paths: list of (ui file, api file)
+    :param compute: function taking a list of (ui file, api file) and returning an iterator over their results in order
+    """
+    if checkpoint is None:
+        yield from compute(file_paths)
+        return
+    done = set()
+    for name, result in checkpoint.replay({ui_file.name for ui_file, _ in file_paths}):
+        done.add(name)
+        yield result
+    remaining = [paths for paths in file_paths if paths[0].name not in done]
+    for (ui_file, _), result in zip(remaining, compute(remaining)):
+        checkpoint.add(ui_file.name, result)
+        yield result
+    checkpoint.commit()
@@ -0,0 +1,131 @@
+"""
+Streaming de-duplication of extracted rows
+Rows are identified by a 64-bit (blake2b keyed per process, valid within one process) or 128-bit (blake2b) hash of their values
+Hashes are kept in an exact in-memory set until max_hashes is reached, after that the emitted hashes and all following rows
+are spilled to disk, partitioned by hash; at the end every partition is de-duplicated separately and the surviving rows
+are merged back in their original order, so memory stays bounded by the set limit and one partition
+"""
+import hashlib
+import heapq
+import os
+import pickle
+import shutil
+import tempfile
+from pathlib import Path
+
+MAX_HASHES = 2_000_000  # in-memory hashes per table, ~150 MB for 128-bit hashes
+PARTITIONS = 64
+EMITTED = -1  # sequence number of spilled hashes of already emitted rows
+HASH_KEY_64 = os.urandom(16)  # the builtin hash() is not used: it maps integers modulo 2**61 - 1, interned ids collide
+
+
+def row_hash_64(row: tuple) -> int:
+    return int.from_bytes(hashlib.blake2b(repr(row).encode(), digest_size=8, key=HASH_KEY_64).digest(), 'little')
+
+
+def row_hash_128(row: tuple) -> int:
+    return int.from_bytes(hashlib.blake2b(repr(row).encode(), digest_size=16).digest(), 'little')
+
+
+def read_records(path: Path):
+    with path.open('rb') as fd:
+        while True:
+            try:
+                yield pickle.load(fd)
+            except EOFError:
+                return
+
+
+class Deduplicator:
+    def __init__(self, hash_bits: int = 128, max_hashes: int = MAX_HASHES, partitions: int = PARTITIONS, spill_dir=None):
+        if hash_bits not in (64, 128):
+            raise ValueError(f"unsupported hash size: {hash_bits}")
+        self.row_hash = row_hash_64 if hash_bits == 64 else row_hash_128
+        self.max_hashes = max_hashes
+        self.partitions = partitions
+        self.spill_dir = spill_dir
+        self.hashes = set()
+        self.spill_path = None  # temporary folder with partition files, set once the hashes are spilled
+        self.spill_files = []
+        self.seq = 0  # sequence number of spilled rows
+        self.total = 0
+        self.unique = 0
+
+    @property
+    def spilled(self) -> bool:
+        return self.spill_path is not None
+
+    @property
+    def duplicate_ratio(self) -> float:
+        return (self.total - self.unique) / self.total if self.total else 0.0
+
+    def add_dropped(self, count: int):
+        """
+        account for duplicates dropped before the rows reached the deduplicator
+        """
+        self.total += count
+
+    def filter(self, rows) -> list:
+        """
+        :param rows: iterable of row tuples
+        :return: rows that can be emitted now, rows of a spilled deduplicator are only returned by drain()
+        """
+        unique_rows = []
+        for row in rows:
+            self.total += 1
+            digest = self.row_hash(row)
+            if self.spilled:
+                self.spill(digest, self.seq, row)
+                self.seq += 1
+                continue
+            if digest in self.hashes:
+                continue
+            self.hashes.add(digest)
+            self.unique += 1
+            unique_rows.append(row)
+            if len(self.hashes) >= self.max_hashes:
+                self.start_spilling()
+        return unique_rows
+
+    def start_spilling(self):
+        self.spill_path = Path(tempfile.mkdtemp(prefix='dedup_', dir=self.spill_dir))
+        self.spill_files = [(self.spill_path / f"{partition}.pickle").open('wb') for partition in range(self.partitions)]
+        for digest in self.hashes:
+            self.spill(digest, EMITTED, None)
+        self.hashes = set()
+
+    def spill(self, digest, seq, row):
+        pickle.dump((seq, digest, row), self.spill_files[digest % self.partitions], protocol=pickle.HIGHEST_PROTOCOL)
+
+    def drain(self):
+        """
+        yields the unique spilled rows in their original order
+        """
+        if not self.spilled:
+            return
+        for fd in self.spill_files:
+            fd.close()
+        sorted_paths = []
+        for partition in range(self.partitions):
+            seen = set()
+            survivors = []
+            for seq, digest, row in sorted(read_records(self.spill_path / f"{partition}.pickle"), key=lambda record: record[0]):
+                if digest in seen:
+                    continue
+                seen.add(digest)
+                if seq != EMITTED:
+                    survivors.append((seq, row))
+            sorted_path = self.spill_path / f"{partition}.sorted.pickle"
+            with sorted_path.open('wb') as fd:
+                for record in survivors:
+                    pickle.dump(record, fd, protocol=pickle.HIGHEST_PROTOCOL)
+            self.unique += len(survivors)
+            sorted_paths.append(sorted_path)
+        for _, row in heapq.merge(*(read_records(path) for path in sorted_paths), key=lambda record: record[0]):
+            yield row
+
+    def close(self):
+        for fd in self.spill_files:
+            fd.close()
+        if self.spill_path is not None:
+            shutil.rmtree(self.spill_path, ignore_errors=True)
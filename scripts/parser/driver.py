@@ -0,0 +1,168 @@
+"""
+Options and the app loop shared by the table drivers (parse_ui_to_widgets.py, parse_ui_to_activity.py, extract_corpus.py)
+ParseOptions are sent with every app to the workers and change the extracted data, RunOptions hold the driver side
+objects (caches, checkpoints, writers, prefetcher, profiler); a new option is added here once instead of per driver
+"""
+import argparse
+import os
+from collections import namedtuple
+from pathlib import Path
+
+from joblib import Parallel, delayed
+from tqdm import tqdm
+
+import checkpoint
+import dedup
+import permission_index
+import prefetch
+import profiling
+import result_head
+import sharding
+from frontmatter_parser import FrontmatterUiParser
+from result_cache import ResultCache, cached_results
+
+ParseOptions = namedtuple('ParseOptions', [
+    'with_api',  # read the api results (widgets/activity drivers), process only apps with api results (extract_corpus)
+    'sensitive_only',  # collect only sensitive APIs
+    'force',  # parse apps detected as unity/platform too
+    'streaming',  # decode result files incrementally
+    'max_alternatives',  # upper bound of label combinations per activity/view
+    'factored',  # emit label sets of an activity instead of their combinations
+    'packed',  # return rows as PackedRows (compact transport for the streaming output)
+    'profile',  # time the parsing phases, results are returned together with the profile report of the app
+    'tables',  # tables extracted by extract_corpus
+    'intern',  # integer-coded tables (extract_corpus)
+    'features',  # also return the api features of the app (extract_corpus)
+    'variants',  # api tables with and without sensitive_only from one parse (extract_corpus)
+], defaults=(False, False, False, False, None, False, False, False, (), False, False, False))
+
+RunOptions = namedtuple('RunOptions', [
+    'parallel',  # parse the apps in worker processes
+    'head_cache',  # result_head.HeadCache of the meta/error heads of the ui files
+    'writers',  # TableWriter per table to write rows incrementally, None to return DataFrames
+    'cache',  # ResultCache of apps parsed by earlier runs, updated with the newly parsed apps
+    'checkpoints',  # checkpoint.Checkpoint, results of an interrupted run are replayed from there
+    'shard',  # (index, count) of the processed part of the apps, None for all apps
+    'prefetcher',  # prefetch.Prefetcher reading the result files ahead of the workers
+    'profiler',  # profiling.Profiler aggregating the parsing phase timings of the apps
+], defaults=(False, None, None, None, None, None, None, None))
+
+
+def cache_options(driver: str, options: ParseOptions) -> dict:
+    """
+    :return: the options that change the results of an app, identify cached results and checkpoints
+    """
+    key = {'driver': driver, **options._asdict(), 'tables': sorted(options.tables)}
+    del key['streaming'], key['profile']
+    return key
+
+
+def positive_int(text: str) -> int:
+    """
+    argparse type for counts >= 1
+    """
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not an integer: {text}")
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"should be at least 1: {text}")
+    return value
+
+
+def add_arguments(parser):
+    """
+    command line arguments of the options shared by the drivers
+    """
+    parser.add_argument('-p', '--parallel', default=False, action='store_true', help="use parallel processing")
+    parser.add_argument('--sensitive_only', default=False, action='store_true', help="collect only sensitive APIs")
+    parser.add_argument('--streaming', default=False, action='store_true', help="decode result files incrementally (requires ijson), bounds memory by the largest activity")
+    parser.add_argument('--stream-output', default=False, action='store_true', help="write rows app by app instead of building the whole corpus in memory")
+    parser.add_argument('--dedup-bits', type=int, choices=[64, 128], default=128, help="row hash size used to drop duplicates with --stream-output")
+    parser.add_argument('--dedup-max-hashes', type=int, default=dedup.MAX_HASHES, help="row hashes kept in memory per table before spilling to disk")
+    parser.add_argument('--cache-dir', help="folder caching the extracted data of every app, reruns only parse new or changed result files")
+    parser.add_argument('--cache-content-hash', default=False, action='store_true', help="identify changed files by a hash of their content instead of size and mtime")
+    parser.add_argument('--shard', type=sharding.parse_shard, help="process only shard i/N of the apps (by package name), outputs get a .shard-i-of-N suffix, see merge_shards.py")
+    parser.add_argument('--checkpoint-dir', help="folder for checkpoints of the extracted data, allows to continue an interrupted run with --resume; keeps the pickled results of every app (disk space in the order of the outputs) until it is removed")
+    parser.add_argument('--checkpoint-every', type=int, default=checkpoint.CHECKPOINT_EVERY, help="number of apps between checkpoints")
+    parser.add_argument('--resume', default=False, action='store_true', help="continue from the last checkpoint in --checkpoint-dir")
+    parser.add_argument('--prefetch-depth', type=int, default=0, help="number of apps whose result files are read ahead by a thread pool while the workers parse, 0 disables it")
+    parser.add_argument('--prefetch-budget', type=int, default=prefetch.PREFETCH_BUDGET // (1024 * 1024), help="MB of read ahead result files held in memory")
+    parser.add_argument('--profile', default=False, action='store_true', help="time the parsing phases of every app, stats.json gets percentiles per phase and the slowest apps")
+    parser.add_argument('--profile-top', type=int, default=profiling.TOP_APPS, help="number of slowest apps reported with --profile")
+    parser.add_argument('--head-cache', help="file caching the meta/error head of every result file, rejected apps are skipped without reading them on later runs")
+    parser.add_argument('--max-alternatives', type=positive_int, default=None, help="max number of label combinations per activity (orphaned fragments x layouts), sampled deterministically")
+
+
+def parse_options(args, **options) -> ParseOptions:
+    """
+    :param options: driver specific ParseOptions fields
+    """
+    return ParseOptions(with_api=args.with_api, sensitive_only=args.sensitive_only, streaming=args.streaming, max_alternatives=args.max_alternatives,
+                        packed=args.stream_output, profile=args.profile, **options)
+
+
+def run_options(args, cache_key: dict) -> RunOptions:
+    """
+    :param cache_key: cache_options() of the run
+    """
+    return RunOptions(
+        parallel=args.parallel,
+        head_cache=result_head.HeadCache(Path(args.head_cache)) if args.head_cache else None,
+        cache=ResultCache(args.cache_dir, cache_key, args.cache_content_hash) if args.cache_dir else None,
+        checkpoints=checkpoint.Checkpoint(args.checkpoint_dir, cache_key, args.checkpoint_every, args.resume) if args.checkpoint_dir else None,
+        shard=args.shard,
+        prefetcher=prefetch.Prefetcher(args.prefetch_depth, args.prefetch_budget * 1024 * 1024) if args.prefetch_depth else None,
+        profiler=profiling.Profiler(args.profile_top) if args.profile else None,
+    )
+
+
+def deduplicator(args) -> dedup.Deduplicator:
+    return dedup.Deduplicator(args.dedup_bits, args.dedup_max_hashes)
+
+
+def app_results(file_paths: list, process_file, options: ParseOptions, run: RunOptions, read_api: bool):
+    """
+    results of process_file(ui_file, api_file, options, head) for the apps of the shard, in the order of file_paths
+    results are replayed from the checkpoints and the cache, the other apps are parsed (by the workers if parallel)
+    :param read_api: the api results are read, prefetched together with the ui results
+    """
+    file_paths = sharding.select_shard(file_paths, run.shard)
+    head_cache = run.head_cache
+    profiler = run.profiler
+
+    def compute(paths):
+        heads = [head_cache.get(data_file) if head_cache else None for data_file, _ in paths]
+        rejected = [head is not None and not FrontmatterUiParser.head_accepted(head) for head in heads]  # the workers reject them without reading
+        prefetched = prefetch.prefetched(paths, run.prefetcher, read_api, rejected)
+        tasks = (delayed(process_file)(data_file, api_file, options, head) for (data_file, api_file), head in zip(tqdm(prefetched, total=len(paths)), heads))
+        if run.parallel:
+            n_jobs = max(1, os.cpu_count() - 1)
+            permission_index.get_index()  # compile the index file once before the workers start, each loky worker then only unpickles it
+            results = Parallel(n_jobs=n_jobs, return_as='generator')(tasks)  # consumed as the workers finish them
+        else:
+            results = (func(*args, **kwargs) for func, args, kwargs in tasks)
+        for (data_file, _), res in zip(paths, results):
+            if run.prefetcher:
+                run.prefetcher.finished()
+            if profiler:
+                res = profiler.add(*res)
+            if head_cache:
+                head_cache.put(data_file, res[-1])
+            yield res
+
+    return checkpoint.checkpointed_results(file_paths, run.checkpoints, lambda paths: cached_results(paths, run.cache, compute))
+
+
+def run_stats(run: RunOptions) -> dict:
+    """
+    :return: stats of the cache, prefetcher and profiler of the run
+    """
+    stats = {}
+    if run.cache:
+        stats['cache'] = run.cache.stats()
+    if run.prefetcher:
+        stats['prefetch'] = run.prefetcher.stats()
+    if run.profiler:
+        stats['profile'] = run.profiler.stats()
+    return stats
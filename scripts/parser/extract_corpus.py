@@ -0,0 +1,231 @@
+"""
+Single pass extraction of all tables from frontmatter results
+Every app is parsed once and its rows are fanned out to the requested tables:
+widgets, widget_api (parse_ui_to_widgets.py), activities, transitions, activity_api (parse_ui_to_activity.py),
+label_api (parse_api.py) and component_api (activity lifecycle, broadcast receiver and service apis)
+"""
+import argparse
+import contextlib
+import json
+import traceback
+from collections import defaultdict, Counter
+from pathlib import Path
+
+import pandas as pd
+
+import driver
+import json_backend
+import profiling
+import feature_matrix
+import result_source
+import sharding
+import string_dictionary
+import transition_graph
+from driver import ParseOptions, RunOptions
+from frontmatter_parser import FrontmatterUiParser
+from table_writer import open_writer, pack_rows, row_count, save_table
+
+# table -> (requires api results, rows of a parsed app)
+TABLES = {
+    'widgets': (False, lambda frontmatter, factored: frontmatter.get_widget_ui_data(True)),
+    'activities': (False, lambda frontmatter, factored: frontmatter.get_activity_data(factored)),
+    'transitions': (False, lambda frontmatter, factored: frontmatter.get_app_data_transitions()),
+    'widget_api': (True, lambda frontmatter, factored: frontmatter.get_widget_api_data(True)),
+    'activity_api': (True, lambda frontmatter, factored: frontmatter.collect_api()),
+    'label_api': (True, lambda frontmatter, factored: frontmatter.get_label_api_data()),
+    'component_api': (True, lambda frontmatter, factored: frontmatter.get_component_api_data()),
+    'graph_nodes': (False, lambda frontmatter, factored: frontmatter.get_transition_graph().nodes),
+    'graph_label_sets': (False, lambda frontmatter, factored: frontmatter.get_transition_graph().label_sets),
+    'graph_edges': (False, lambda frontmatter, factored: frontmatter.get_transition_graph().edges),
+}
+DEFAULT_TABLES = [table for table in TABLES if table not in transition_graph.GRAPH_TABLES]
+SENSITIVE_SUFFIX = '_sensitive'  # api tables of the sensitive_only variant with --sensitive-variants
+STATS = ('errors', 'api_errors', 'platform', 'lang')
+
+
+def output_tables(tables, intern=False, variants=False) -> list:
+    """
+    :return: names of the tables returned by process_file for the extracted tables
+    """
+    names = list(tables)
+    if variants:
+        names += [f"{table}{SENSITIVE_SUFFIX}" for table in tables if TABLES[table][0]]
+    if intern:
+        names.append(string_dictionary.DICTIONARY_TABLE)
+    return names
+
+
+def process_file(ui_file_path: Path, api_file_path: Path, options: ParseOptions, head=None):
+    """
+    :param options: tables (names of the tables to extract), sensitive_only, force, streaming, max_alternatives, factored,
+        packed, profile and
+        intern: replace strings by their ids (string_dictionary), the strings of the app are returned as an extra table
+        features: also return the api features of the app (feature_matrix.app_features)
+        variants: the api results are read once for both variants, the api tables are returned without and (with
+        SENSITIVE_SUFFIX) with sensitive_only; features are computed without sensitive_only
+    :param head: cached error marker/meta block of the ui file
+    :return: rows per table, stats of the app, head of the ui file; with profile together with the profile report of the app
+    """
+    tables, factored, packed, intern = options.tables, options.factored, options.packed, options.intern
+    rows = {}
+    strings = {}
+    l_stats = {name: defaultdict(int) for name in STATS}
+    l_stats['truncated'] = {}
+    app_profile = profiling.AppProfile() if options.profile else profiling.NULL_PROFILE
+    try:
+        frontmatter = FrontmatterUiParser(ui_file_path, max_alternatives=options.max_alternatives, profile=app_profile)
+        frontmatter.read_ui(options.force, options.streaming, head)
+        head = frontmatter.head
+        if reads_api(options) and frontmatter.activities and api_file_path.exists():
+            frontmatter.read_api(api_file_path, options.sensitive_only and not options.variants, options.streaming)
+
+        def extract(table, name):
+            with app_profile.phase(f"rows.{name}"):
+                table_rows = TABLES[table][1](frontmatter, factored)
+                if intern:
+                    table_rows = string_dictionary.encode_rows(table_rows, strings)
+                rows[name] = pack_rows(table_rows) if packed else table_rows
+
+        for table in tables:
+            extract(table, table)
+        if options.features:
+            rows[feature_matrix.FEATURE_TABLE] = feature_matrix.app_features(frontmatter)
+        if options.variants:
+            frontmatter.keep_sensitive_only()
+            for table in tables:
+                if TABLES[table][0]:
+                    extract(table, f"{table}{SENSITIVE_SUFFIX}")
+        if intern:
+            dictionary_rows = string_dictionary.dictionary_rows(strings)
+            rows[string_dictionary.DICTIONARY_TABLE] = pack_rows(dictionary_rows) if packed else dictionary_rows
+        if frontmatter.ui_error != '':
+            l_stats['errors'][frontmatter.ui_error] += 1
+        if frontmatter.api_error != '':
+            l_stats['api_errors'][frontmatter.api_error] += 1
+        if frontmatter.apk_platform != '':
+            l_stats['platform'][frontmatter.apk_platform] += 1
+        l_stats['lang'][frontmatter.lang] += 1
+        if frontmatter.truncated_alternatives:
+            l_stats['truncated'][frontmatter.pkg] = frontmatter.truncated_alternatives
+        del frontmatter
+    except Exception:
+        print(ui_file_path)
+        traceback.print_exc()
+        rows = {}
+    if options.profile:
+        return (rows, l_stats, head), app_profile.report(FrontmatterUiParser.get_pkg_name(ui_file_path))
+    return rows, l_stats, head
+
+
+def reads_api(options: ParseOptions) -> bool:
+    return options.features or any(TABLES[table][0] for table in options.tables)
+
+
+def list_files(ui_path: Path, api_path: Path, with_api):
+    return result_source.list_pairs(ui_path, api_path, with_api, sort=True)
+
+
+def read_data(ui_path: Path, api_path: Path, options: ParseOptions, run: RunOptions = RunOptions(), graph: transition_graph.GraphWriter = None, features: feature_matrix.FeatureStore = None):
+    """
+    :param options: the tables and how to extract them, with_api: process only apps with api results
+    :param run: with writers, a TableWriter per table to write rows incrementally, the returned DataFrames are empty then
+    :param graph: writes the CSR arrays of the graph_nodes/graph_edges rows of every app
+    :param features: store appended with the api features of every app
+    """
+    writers = run.writers
+    options = options._replace(packed=writers is not None, profile=run.profiler is not None, features=features is not None)
+    table_names = output_tables(options.tables, options.intern, options.variants)
+    results = driver.app_results(list_files(ui_path, api_path, options.with_api), process_file, options, run, reads_api(options))
+    corpus = {table: [] for table in table_names}
+    c_stats = {name: Counter() for name in STATS}
+    truncated_stats = {}  # pkg -> number of dropped label combinations
+    row_counts = Counter()
+    for rows, l_stats, head in results:
+        if features and feature_matrix.FEATURE_TABLE in rows:
+            features.add_app(rows[feature_matrix.FEATURE_TABLE])
+        for table, table_rows in rows.items():
+            if table == feature_matrix.FEATURE_TABLE:
+                continue
+            row_counts[table] += row_count(table_rows)
+            if writers is not None:
+                writers[table].write_app(table_rows)
+            else:
+                corpus[table].extend(table_rows)
+        if graph:
+            graph.add_app(rows.get('graph_nodes', []), rows.get('graph_edges', []), rows.get(string_dictionary.DICTIONARY_TABLE))
+        for name in STATS:
+            c_stats[name].update(l_stats[name])
+        truncated_stats.update(l_stats['truncated'])
+    stats = {name: dict(c_stats[name]) for name in STATS}
+    stats['truncated'] = truncated_stats
+    stats['json_backend'] = json_backend.get_backend()
+    stats['rows'] = {table: row_counts[table] for table in table_names}
+    stats.update(driver.run_stats(run))
+    if graph:
+        stats['graph'] = graph.stats()
+    if features:
+        stats['features'] = features.stats()
+    return {table: pd.DataFrame(corpus[table]) for table in table_names}, stats
+
+
+def save_data(corpus, path):
+    """
+    :return: ratio of dropped duplicate rows
+    """
+    unique_corpus = corpus.drop_duplicates()
+    save_table(unique_corpus, path)
+    return (len(corpus) - len(unique_corpus)) / len(corpus) if len(corpus) else 0.0
+
+
+def save_stats(stats, stats_file):
+    with open(stats_file, "w") as fd:
+        json.dump(stats, fd)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-d', '--data-dir', required=True, help="folder or archive (.tar, .tar.gz, .tar.zst, .zip) with json ui analysis results, optionally .gz/.zst compressed")
+    parser.add_argument('-a', '--api-dir', help="folder or archive with json api analysis results (files named after the package as the ui results)")
+    parser.add_argument('-o', '--output-dir', required=True, help="folder for <table>.<format> files and stats.json")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv', help="format of the output tables")
+    parser.add_argument('-t', '--tables', nargs='+', choices=list(TABLES), default=DEFAULT_TABLES, help="tables to extract, all except the normalized transition graph (graph_nodes, graph_label_sets, graph_edges) by default")
+    parser.add_argument('--with-api', default=False, action='store_true', help="process only apps with api results")
+    parser.add_argument('-f', '--force', default=False, action='store_true', help="parse apps detected as unity/platform too")
+    parser.add_argument('--sensitive-variants', default=False, action='store_true', help=f"write the api tables with all APIs and with only sensitive APIs (<table>{SENSITIVE_SUFFIX}) from one parse of the api results")
+    parser.add_argument('--factored', default=False, action='store_true', help="emit label sets of an activity (numbered by group) instead of their combinations")
+    parser.add_argument('--intern', default=False, action='store_true', help="write strings as stable integer ids, the ids are resolved by the strings table (see string_dictionary.py)")
+    parser.add_argument('--features', help="folder of sparse app/activity/widget x api and app x permission matrices (requires scipy), extended with the apps not yet in it")
+    parser.add_argument('--graph-npz', help="write CSR adjacency arrays of the transition graph: one file for the corpus if the name ends with .npz, otherwise a folder with <pkg>.npz per app (requires the graph_nodes and graph_edges tables)")
+    driver.add_arguments(parser)
+    args = parser.parse_args()
+    if args.graph_npz and not {'graph_nodes', 'graph_edges'} <= set(args.tables):
+        parser.error("--graph-npz requires the graph_nodes and graph_edges tables")
+    if args.sensitive_variants and args.sensitive_only:
+        parser.error("--sensitive-variants already writes the --sensitive_only tables")
+    if args.api_dir is None and (args.with_api or args.features or any(TABLES[table][0] for table in args.tables)):
+        parser.error("api tables require --api-dir")
+    print(f"json backend: {json_backend.get_backend()}")
+    data_dir = Path(args.data_dir)
+    api_dir = Path(args.api_dir) if args.api_dir else data_dir
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    options = driver.parse_options(args, force=args.force, factored=args.factored, tables=args.tables, intern=args.intern, features=bool(args.features), variants=args.sensitive_variants)
+    run = driver.run_options(args, driver.cache_options('corpus', options))
+    graph_path = Path(args.graph_npz) if args.graph_npz else None
+    graph = transition_graph.GraphWriter(sharding.shard_path(graph_path, args.shard) if graph_path and graph_path.suffix == '.npz' else graph_path) if graph_path else None
+    features = feature_matrix.FeatureStore(sharding.shard_path(Path(args.features), args.shard)) if args.features else None
+    if args.stream_output:
+        with contextlib.ExitStack() as stack:
+            writers = {table: stack.enter_context(open_writer(sharding.shard_path(output_dir / f"{table}.{args.format}", args.shard), dedup=driver.deduplicator(args))) for table in output_tables(args.tables, args.intern, args.sensitive_variants)}
+            _, stats = read_data(data_dir, api_dir, options, run._replace(writers=writers), graph, features)
+        stats['duplicates'] = {table: writer.dedup.duplicate_ratio for table, writer in writers.items()}
+    else:
+        corpus, stats = read_data(data_dir, api_dir, options, run, graph, features)
+        stats['duplicates'] = {table: save_data(data, sharding.shard_path(output_dir / f"{table}.{args.format}", args.shard)) for table, data in corpus.items()}
+    if graph:
+        graph.close()
+    if features:
+        features.save()
+    save_stats(stats, sharding.shard_path(output_dir / 'stats.json', args.shard))
+    if run.head_cache:
+        run.head_cache.save()
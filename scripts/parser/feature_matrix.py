@@ -0,0 +1,218 @@
+"""
+Sparse feature matrices of the apis triggered by apps, activities and widgets for ML pipelines (extract_corpus.py --features)
+The workers summarize every parsed app (app_features), the FeatureStore appends the apps as rows of CSR matrices
+    app_api: apis of widgets, activity lifecycles, services and broadcasts of the app
+    activity_api: apis of the widgets of the activity (without dialogs and menus, as collect_api) and of its lifecycle
+    widget_api: apis of the widget
+    app_permission: declared permissions (rows as app_api)
+Values are occurrence counts, rows exist for every app and for activities/widgets with apis
+Row vocabularies (apps, activities, widgets) and column vocabularies (apis, permissions) are saved as tables next to the
+matrices, row/column i of a matrix is row i of its vocabulary; a store is extended in place: apps already in it are
+skipped, new apis and permissions get new columns
+"""
+import argparse
+from collections import Counter, defaultdict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from table_writer import read_table, save_table
+
+try:
+    import scipy.sparse
+except ImportError:  # feature matrices require scipy
+    scipy = None
+
+FEATURE_TABLE = 'features'  # key of the app summary in the rows returned by the workers
+MATRICES = {  # matrix -> (row vocabulary, column vocabulary)
+    'app_api': ('apps', 'apis'),
+    'activity_api': ('activities', 'apis'),
+    'widget_api': ('widgets', 'apis'),
+    'app_permission': ('apps', 'permissions'),
+}
+VOCABULARY_COLUMNS = {'apps': ['pkg'], 'activities': ['pkg', 'activity'], 'widgets': ['pkg', 'guid'], 'apis': ['api'], 'permissions': ['permission']}
+
+
+def require_scipy():
+    if scipy is None:
+        raise RuntimeError("feature matrices require scipy, install it with: pip install scipy")
+
+
+def app_features(frontmatter) -> dict:
+    """
+    :param frontmatter: FrontmatterUiParser with ui and api results
+    :return: api counts of the app, per activity and per widget guid, declared permissions
+    """
+    activity_apis = defaultdict(Counter)
+    widget_apis = {}
+    for guid, view in frontmatter.ui.items():
+        if not view.api:
+            continue
+        widget_apis[guid] = Counter(view.api)
+        if not (view.is_dialog or view.is_menu):
+            activity_apis[view.activity].update(view.api)
+    app_apis = Counter(frontmatter.ui_apis)
+    for name, apis in frontmatter.lifecycle.items():
+        if apis:
+            activity_apis[name].update(apis)
+            app_apis.update(apis)
+    for apis in frontmatter.services.values():
+        app_apis.update(apis)
+    for broadcast in frontmatter.broadcasts.values():
+        app_apis.update(broadcast.apis)
+    return {'pkg': frontmatter.pkg, 'app': app_apis, 'activity': dict(activity_apis), 'widget': widget_apis,
+            'permission': Counter(dict.fromkeys(frontmatter.permissions, 1))}  # declared once, in declaration order
+
+
+class Vocabulary:
+    def __init__(self, keys: list = ()):
+        self.ids = {key: index for index, key in enumerate(keys)}
+
+    def get(self, key) -> int:
+        """
+        :return: id of the key, new keys are appended
+        """
+        index = self.ids.get(key)
+        if index is None:
+            index = self.ids[key] = len(self.ids)
+        return index
+
+    def __contains__(self, key):
+        return key in self.ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def keys(self) -> list:
+        return list(self.ids)
+
+
+class FeatureStore:
+    def __init__(self, folder):
+        """
+        :param folder: store to extend, created on save() if it does not exist
+        """
+        require_scipy()
+        self.folder = Path(folder)
+        self.vocabularies = {name: Vocabulary(self.load_vocabulary(name)) for name in VOCABULARY_COLUMNS}
+        self.matrices = {name: self.load_matrix(name) for name in MATRICES}
+        self.entries = {name: ([], [], []) for name in MATRICES}  # rows, columns, values of the appended apps
+        self.added = 0
+        self.skipped = 0
+
+    def load_vocabulary(self, name) -> list:
+        path = self.folder / f"{name}.csv"
+        if not path.exists():
+            return []
+        table = read_table(path)
+        table = table.astype({column: object for column in VOCABULARY_COLUMNS[name] if column != 'guid'}).fillna('')
+        columns = VOCABULARY_COLUMNS[name]
+        return list(table[columns[0]]) if len(columns) == 1 else list(table[columns].itertuples(index=False, name=None))
+
+    def load_matrix(self, name):
+        path = self.folder / f"{name}.npz"
+        if not path.exists():
+            return None
+        return scipy.sparse.load_npz(path).tocsr()
+
+    def add(self, matrix: str, row, counts: Counter):
+        rows, columns, values = self.entries[matrix]
+        row_id = self.vocabularies[MATRICES[matrix][0]].get(row)
+        column_vocabulary = self.vocabularies[MATRICES[matrix][1]]
+        for key, count in counts.items():
+            rows.append(row_id)
+            columns.append(column_vocabulary.get(key))
+            values.append(count)
+
+    def add_app(self, features: dict) -> bool:
+        """
+        :param features: app_features() of an app
+        :return: False if the app is already in the store
+        """
+        pkg = features['pkg']
+        if pkg in self.vocabularies['apps']:
+            self.skipped += 1
+            return False
+        self.add('app_api', pkg, features['app'])
+        self.add('app_permission', pkg, features['permission'])
+        for activity, counts in features['activity'].items():
+            self.add('activity_api', (pkg, activity), counts)
+        for guid, counts in features['widget'].items():
+            self.add('widget_api', (pkg, guid), counts)
+        self.added += 1
+        return True
+
+    def extend(self, other: 'FeatureStore'):
+        """
+        appends the apps of another store (e.g. of a shard) that are not in this store
+        """
+        apps = other.vocabularies['apps'].keys()
+        matrices = {name: other.matrix(name) for name in MATRICES}
+        columns = {name: other.vocabularies[name].keys() for name in ('apis', 'permissions')}
+        rows = {name: defaultdict(list) for name in ('activities', 'widgets')}  # pkg -> row ids in the other store
+        for name in rows:
+            for index, (pkg, _) in enumerate(other.vocabularies[name].keys()):
+                rows[name][pkg].append(index)
+        row_keys = {name: other.vocabularies[name].keys() for name in rows}
+
+        def row_counts(matrix: str, index: int) -> Counter:
+            row = matrices[matrix].getrow(index)
+            column_keys = columns[MATRICES[matrix][1]]
+            return Counter({column_keys[column]: int(value) for column, value in zip(row.indices, row.data)})
+
+        for index, pkg in enumerate(apps):
+            self.add_app({'pkg': pkg, 'app': row_counts('app_api', index), 'permission': row_counts('app_permission', index),
+                          'activity': {row_keys['activities'][row][1]: row_counts('activity_api', row) for row in rows['activities'][pkg]},
+                          'widget': {row_keys['widgets'][row][1]: row_counts('widget_api', row) for row in rows['widgets'][pkg]}})
+
+    def matrix(self, name):
+        """
+        :return: CSR matrix with the stored and the appended rows
+        """
+        shape = (len(self.vocabularies[MATRICES[name][0]]), len(self.vocabularies[MATRICES[name][1]]))
+        rows, columns, values = self.entries[name]
+        matrix = scipy.sparse.csr_matrix((np.array(values, dtype=np.int32), (np.array(rows, dtype=np.int64), np.array(columns, dtype=np.int64))), shape=shape)
+        stored = self.matrices[name]
+        if stored is not None:
+            stored = stored.copy()
+            stored.resize(shape)  # rows of the appended apps are empty, new columns are empty in the stored rows
+            matrix = matrix + stored
+        matrix.sort_indices()
+        return matrix
+
+    def save(self):
+        self.folder.mkdir(parents=True, exist_ok=True)
+        for name, columns in VOCABULARY_COLUMNS.items():
+            keys = self.vocabularies[name].keys()
+            save_table(pd.DataFrame(keys if len(columns) > 1 else {columns[0]: keys}, columns=columns), self.folder / f"{name}.csv")
+        for name in MATRICES:
+            self.matrices[name] = self.matrix(name)
+            self.entries[name] = ([], [], [])
+            scipy.sparse.save_npz(self.folder / f"{name}.npz", self.matrices[name])
+
+    def stats(self) -> dict:
+        return {'added': self.added, 'skipped': self.skipped, **{name: len(vocabulary) for name, vocabulary in self.vocabularies.items()}}
+
+
+def load_features(folder) -> dict:
+    """
+    :return: CSR matrix per matrix name and vocabulary table per vocabulary name
+    """
+    require_scipy()
+    folder = Path(folder)
+    features = {name: scipy.sparse.load_npz(folder / f"{name}.npz").tocsr() for name in MATRICES}
+    features.update({name: read_table(folder / f"{name}.csv") for name in VOCABULARY_COLUMNS})
+    return features
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="merge feature stores, e.g. of sharded runs")
+    parser.add_argument('-o', '--output-dir', required=True, help="store to extend")
+    parser.add_argument('stores', nargs='+', help="stores whose apps are appended")
+    args = parser.parse_args()
+    store = FeatureStore(args.output_dir)
+    for path in args.stores:
+        store.extend(FeatureStore(path))
+    store.save()
+    print(store.stats())
@@ -6,37 +6,245 @@ FrontmatterUiParser.ui contains all views as a mapping: view_id->{label, activit
 FrontmatterUiParser.activities contains activities data, a map: activity_name->{title, labels}
 FrontmatterUiParser.transitions contains transition data, a map: src_activity->{dest_activity, trigger}
 """
+import bisect
+import functools
 import itertools
-import json
-import os
+import math
+import random
 import re
-from collections import defaultdict, Iterable
+import sys
+from collections import defaultdict, namedtuple
+from collections.abc import Iterable
 from pathlib import Path
+from sys import intern
 
 import more_itertools
 
+import json_backend
+import json_stream
+import profiling
+import result_head
+import result_source
+from permission_index import PermissionIndex, get_index
+
+PARSER_VERSION = 1  # bump when the extracted data changes, invalidates cached results (result_cache.py)
+
 
 class View:
+    __slots__ = ('var_name', 'icon', 'listeners', 'label', 'clazz', 'activity', 'is_menu', 'is_dialog', 'context', 'api')
+
     def __init__(self):
         self.var_name = ""
         self.icon = ""
-        self.listeners = []
+        self.listeners = ()  # replaced by the list from the results, shared empty tuple otherwise
         self.label = ""
         self.clazz = ""
         self.activity = ""
         self.is_menu = ""
         self.is_dialog = ""
         self.context = ""  # in case of a dialog this is title+message
-        self.api = []
+        self.api = ()
 
 
 class Activity:
+    __slots__ = ('title', 'labels', 'views')
+
     def __init__(self):
         self.title = ""
         self.labels = ""
         self.views = []
 
 
+Transition = namedtuple('Transition', ['dest', 'trigger'])
+TransitionGraph = namedtuple('TransitionGraph', ['nodes', 'label_sets', 'edges'])  # row lists, see get_transition_graph()
+
+
+class LabelAlternatives:
+    """
+    lazy cartesian product of label sets, combined labels are only built on iteration
+    with a `limit` at most `limit` combinations are produced, sampled from the whole product with a fixed seed (deterministic)
+    factors are label lists or lazy label sequences (LabelAlternatives, LabelChain), which are indexed instead of expanded
+    """
+
+    def __init__(self, factors: list, delimiter: str, prefix: str = None, limit: int = None):
+        if limit is not None and limit < 1:
+            raise ValueError(f"limit of label combinations should be at least 1: {limit}")
+        self.factors = factors  # list of label lists
+        self.delimiter = delimiter
+        self.prefix = prefix
+        self.limit = limit
+        self.total = math.prod(len(factor) for factor in factors)
+        self.indices = None  # sorted indices of the sampled combinations, drawn on first use
+
+    def __len__(self):
+        return self.total if self.limit is None else min(self.total, self.limit)
+
+    def __iter__(self):
+        if self.truncated == 0:
+            for items in itertools.product(*self.factors):
+                yield self.join(items)
+        else:
+            for index in self.sampled():
+                yield self.combination(index)
+
+    def __getitem__(self, index):
+        return self.combination(index if self.truncated == 0 else self.sampled()[index])
+
+    @property
+    def truncated(self):
+        return self.total - len(self)
+
+    def sampled(self) -> list:
+        if self.indices is None:
+            rng = random.Random(self.total)
+            if self.total <= sys.maxsize:
+                indices = rng.sample(range(self.total), len(self))
+            else:  # range() is limited to sys.maxsize items, collisions of indices drawn from such a product are negligible
+                indices = set()
+                while len(indices) < len(self):
+                    indices.add(rng.randrange(self.total))
+            self.indices = sorted(indices)
+        return self.indices
+
+    def combination(self, index):
+        """
+        combination at `index` in itertools.product order
+        """
+        items = []
+        for factor in reversed(self.factors):
+            index, item_index = divmod(index, len(factor))
+            items.append(factor[item_index])
+        return self.join(reversed(items))
+
+    def join(self, items):
+        text = f" {self.delimiter} ".join(items)
+        if self.prefix is None:
+            return text
+        return f"{self.prefix}{self.delimiter} {text}"
+
+
+class LabelChain:
+    """
+    lazy concatenation of labels and LabelAlternatives, the alternatives of a text with nested products
+    """
+
+    def __init__(self, parts: list):
+        self.parts = parts  # labels (str) and LabelAlternatives
+        self.ends = list(itertools.accumulate(1 if isinstance(part, str) else len(part) for part in parts))
+
+    def __len__(self):
+        return self.ends[-1] if self.ends else 0
+
+    def __iter__(self):
+        for part in self.parts:
+            if isinstance(part, str):
+                yield part
+            else:
+                yield from part
+
+    def __getitem__(self, index):
+        part_index = bisect.bisect_right(self.ends, index)
+        part = self.parts[part_index]
+        if isinstance(part, str):
+            return part
+        return part[index - (self.ends[part_index - 1] if part_index else 0)]
+
+
+class PlatformRule:
+    """
+    marks apps built with a framework by a regex matched at the start of activity names or dialog button listeners
+    `empty_only` rules apply only to apps without layout content
+    """
+
+    def __init__(self, platform, name_pattern=None, listener_pattern=None, empty_only=False):
+        self.platform = platform
+        self.name_pattern = name_pattern
+        self.listener_pattern = listener_pattern
+        self.empty_only = empty_only
+
+
+class PlatformClassifier:
+    """
+    classifies an app in a single pass over its activities, the first matching rule of the table gives the platform
+    with `stop_early` the pass ends as soon as a rule that rejects the app regardless of its content has matched and no
+    rule before it in the table can still apply
+    """
+
+    def __init__(self, rules: tuple, stop_early: bool):
+        self.rules = rules
+        self.stop_early = stop_early
+        self.matched = set()  # indices of matched rules
+        self.rejecting = None  # index of the first matched rule without empty_only
+        self.has_content = False
+        self.regexes = self.compile_rules(rules)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def compile_rules(rules: tuple) -> dict:
+        """
+        one alternation per attribute, group names carry the rule index
+        :return: has_content -> (name regex, listener regex), apps with content are only matched against rules without empty_only
+        """
+        def alternation(attr, with_empty_only):
+            patterns = [f"(?P<r{index}>{getattr(rule, attr)})" for index, rule in enumerate(rules)
+                        if getattr(rule, attr) and (with_empty_only or not rule.empty_only)]
+            return re.compile('|'.join(patterns)) if patterns else None
+
+        return {
+            False: (alternation('name_pattern', True), alternation('listener_pattern', True)),
+            True: (alternation('name_pattern', False), alternation('listener_pattern', False)),
+        }
+
+    @staticmethod
+    def has_layout_content(jactivity):
+        if 'orphanedFragments' in jactivity:
+            return True
+        for layout in jactivity.get('layouts', []):
+            if layout.get('children') or 'fragmentClass' in layout:
+                return True
+        return False
+
+    def add(self, jactivity) -> bool:
+        """
+        :return: True if the remaining activities can't change the result
+        """
+        if not self.has_content:
+            self.has_content = self.has_layout_content(jactivity)
+        name_regex, listener_regex = self.regexes[self.has_content]
+        if name_regex:
+            self.match(name_regex, jactivity['name'])
+        if listener_regex:
+            for dialog in jactivity.get('dialogs', []):
+                for button in dialog.get('buttons', []):
+                    self.match(listener_regex, button.get('listener', ''))
+        return self.stop_early and self.decided
+
+    def match(self, regex, value):
+        match = regex.match(value)
+        if match:
+            index = int(match.lastgroup[1:])
+            self.matched.add(index)
+            if not self.rules[index].empty_only and (self.rejecting is None or index < self.rejecting):
+                self.rejecting = index
+
+    @property
+    def decided(self):
+        """
+        True if the platform can't change anymore, the rules before the matched rejecting rule only apply to apps without content
+        """
+        return self.rejecting is not None and all(rule.empty_only and self.has_content for rule in self.rules[:self.rejecting])
+
+    @property
+    def platform(self):
+        """
+        name of the framework, 'unidentified' for apps without layout content, None for regular android apps
+        """
+        for index, rule in enumerate(self.rules):
+            if index in self.matched and not (rule.empty_only and self.has_content):
+                return rule.platform
+        return None if self.has_content else 'unidentified'
+
+
 class Broadcast:
     def __init__(self, name, intents: list, apis: list):
         self.name = name
@@ -53,9 +261,26 @@ class FrontmatterUiParser:
     dynamic_image_pattern = r'image\d*'
 
     # image_attr: otherAttributes/src/value, otherAttributes/image0
-
-    def __init__(self, path):
+    platform_rules = (
+        PlatformRule('xamarin', name_pattern=r'md5[0-9a-f]{32}'),  # activities generated by xamarin have specific name
+        PlatformRule('unity', name_pattern=r'com\.unity3d(?!\.service)'),
+        PlatformRule('appbuilder', name_pattern=r'com\.appybuilder', empty_only=True),
+        PlatformRule('apache', listener_pattern=r'<org\.apache\.cordova', empty_only=True),
+        PlatformRule('air', name_pattern=r'air\.', empty_only=True),
+        PlatformRule('kodular', name_pattern=r'io\.kodular', empty_only=True),
+        PlatformRule('solar2d', name_pattern=r'com\.ansca\.corona', empty_only=True),
+    )  # ordered by priority, empty_only rules: the app has no layouts which is an indication that a framework was used
+
+    def __init__(self, path, permission_index: PermissionIndex = None, max_alternatives: int = None, profile: profiling.AppProfile = None):
+        """
+        :param max_alternatives: upper bound of label combinations per activity/view, None means unbounded
+        :param profile: collects the time spent per parsing phase, disabled if None
+        """
         self.permissions = []
+        self.declared_permissions = frozenset()
+        self.api_filter = {}  # api string -> (filtered with sensitive_only=False, with sensitive_only=True)
+        self.uri_filter = {}  # (uri string, method) -> (calls with sensitive_only=False, with sensitive_only=True)
+        self.sensitive_apis = set()  # filtered apis covered by a declared sensitive permission
         self.broadcasts = {}
         self.lifecycle = {}
         self.services = {}
@@ -70,86 +295,27 @@ class FrontmatterUiParser:
         self.ui = defaultdict(View)  # map guid->View
         self.ui_apis = []
         self.meta = None
+        self.head = None  # error marker/meta block read before parsing
         self.activities = defaultdict(Activity)
         self.transitions = dict()
         self.dialogs = defaultdict(View)  # for dialogs with missing guid (old version of analysis)
-        self.sensitive_perms = {}
-        self.load_sensitive_permissions()
-        self.actions = self.load_actions()
+        self.max_alternatives = max_alternatives
+        self.subtree_ids = {}  # (texts, children subtree ids) -> subtree id
+        self.subtree_texts = {}  # subtree id -> (parsed text, label combinations dropped when combining it)
+        self.shared_subtrees = {}  # guid -> (subtree id, text, views list, first index, end index, dropped combinations) of parsed view groups
+        self.truncated_alternatives = 0  # number of label combinations dropped because of max_alternatives
+        self.transition_graph = None  # built on demand by get_transition_graph()
+        self.profile = profile or profiling.NULL_PROFILE
+        permission_index = permission_index or get_index()
+        self.sensitive_perms = permission_index.sensitive_perms
+        self.actions = permission_index.actions
 
     def is_system_broadcast(self, broadcast: Broadcast):
         return any(intent in self.actions for intent in broadcast.intents)
 
-    @staticmethod
-    def is_xamarin(activity):
-        """
-        activities generated by xamarin have specific name
-        """
-        name = activity['name']
-        prefix = name.split('.')[0]
-        return re.match(r'md5[0-9a-f]{32}', prefix)
-
-    @staticmethod
-    def is_unity(activity):
-        name = activity['name']
-        return name.startswith('com.unity3d') and not name.startswith('com.unity3d.service')
-
-    @staticmethod
-    def is_apache(activities):
-        for activity in activities:
-            dialogs = activity.get('dialogs', [])
-            for dialog in dialogs:
-                buttons = dialog.get("buttons", [])
-                for button in buttons:
-                    listener = button.get('listener', '')
-                    if listener.startswith('<org.apache.cordova'):
-                        return True
-        return False
-
-    @staticmethod
-    def is_air(activity):
-        name = activity['name']
-        return name.startswith('air.')
-
-    @staticmethod
-    def is_kodular(activity):
-        name = activity['name']
-        return name.startswith('io.kodular')
-
-    @staticmethod
-    def is_appybuilder(jactivities):
-        for activity in jactivities:
-            name = activity['name']
-            if name.startswith('com.appybuilder'):
-                return True
-        return False
-
-    @staticmethod
-    def is_solar2d(activity):
-        name = activity['name']
-        return name.startswith('com.ansca.corona')
-
-    @staticmethod
-    def is_platform(activities):
-        """
-        Return true if the results are empty which is an indication that a framework (like abobe.air, apache, ionic) was used
-        """
-        for activity in activities:
-            if 'orphanedFragments' in activity:
-                return False
-            layouts = activity['layouts']
-            for layout in layouts:
-                if 'children' in layout and len(layout['children']) > 0:
-                    return False
-                if 'fragmentClass' in layout or 'fragmentClass' in layout:
-                    return False
-        return True
-
     @staticmethod
     def get_pkg_name(path):
-        basename = os.path.basename(path)
-        pkg = os.path.splitext(basename)[0]
-        return pkg
+        return result_source.pkg_name(path)
 
     @classmethod
     def sanitize(cls, text: str):
@@ -158,37 +324,33 @@ class FrontmatterUiParser:
         return text.replace('"', "'").replace('\n\r', ' ').replace('\n', ' ').replace('\r', ' ').replace(cls.sentence_delimiter, ' ')
 
     def is_english(self):
-        return self.meta.get('defaultLanguage', '') in {'en', 'unknown'}
+        return self.english_meta(self.meta)
 
     @staticmethod
-    def load_permission_list(perm_file: Path):
-        with perm_file.open() as fd:
-            apis = [api.strip() for api in fd.readlines() if not api.startswith("#")]
-        return apis
-
-    def load_sensitive_permissions(self):
-        perm_list_path = Path('permission_mapping')
-        for perm_file in perm_list_path.iterdir():
-            perm_name = perm_file.stem
-            apis = self.load_permission_list(perm_file)
-            for api in apis:
-                self.sensitive_perms[api] = f"android.permission.{perm_name}"
+    def english_meta(meta) -> bool:
+        return meta.get('defaultLanguage', '') in {'en', 'unknown'}
 
-    def read_api(self, api_file_path: Path, sensitive_only: bool = True):
+    def read_api(self, api_file_path: Path, sensitive_only: bool = True, streaming=False):
         """
             should be used after loading ui
         """
-        with open(api_file_path) as fd:
-            try:
-                data = json.load(fd)
-            except:
-                print(f"Error while reading {api_file_path}")
-                self.api_error = 'read_error'
-                return
-            if 'error' in data:
-                self.api_error = data['error'].lower()
-                return
-            self.permissions = data['permissions']
+        if streaming:
+            with self.profile.phase('api_stream'):
+                self.read_api_stream(api_file_path, sensitive_only)
+            self.profile.count('view_apis', len(self.ui_apis))
+            return
+        try:
+            with self.profile.phase('api_decode'):
+                data = json_backend.load(api_file_path)
+        except:
+            print(f"Error while reading {api_file_path}")
+            self.api_error = 'read_error'
+            return
+        if 'error' in data:
+            self.api_error = data['error'].lower()
+            return
+        self.set_permissions(data.get('permissions', []))  # absent for non-analysable apps (meta only)
+        with self.profile.phase('api_parse'):
             for view in data.get('views', []):
                 self.load_api_view(view, sensitive_only)
             # load serviceLS
@@ -200,20 +362,44 @@ class FrontmatterUiParser:
             # load activityLC
             for activityLC in data.get('activityLC', []):
                 self.load_api_activity_lifecycle(activityLC, sensitive_only)
+        self.profile.count('view_apis', len(self.ui_apis))
 
-    def load_broadcasts_api(self, api_file_path: Path, sensitive_only: bool):
-        with open(api_file_path) as fd:
+    def read_api_stream(self, api_file_path: Path, sensitive_only: bool):
+        """
+        streaming version of read_api, relies on permissions being serialized before the api lists
+        """
+        loaders = {
+            'views.item': self.load_api_view,
+            'serviceLS.item': self.load_api_service_lifecycle,
+            'broadcasts.item': self.load_api_broadcast,
+            'activityLC.item': self.load_api_activity_lifecycle,
+        }
+        with result_source.open_result(api_file_path) as fd:
             try:
-                data = json.load(fd)
-            except:
+                for prefix, value in json_stream.iter_items(fd, {'error', 'permissions', *loaders}):
+                    if prefix == 'error':
+                        self.api_error = value.lower()
+                        return
+                    if prefix == 'permissions':
+                        self.set_permissions(value)
+                    else:
+                        loaders[prefix](value, sensitive_only)
+            except json_stream.JSONError:
                 print(f"Error while reading {api_file_path}")
-                return
-            if 'error' in data:
-                return
-            self.permissions = data['permissions']
-            # load broadcasts
-            for broadcast in data.get('broadcasts', []):
-                self.load_api_broadcast(broadcast, sensitive_only)
+                self.api_error = 'read_error'
+
+    def load_broadcasts_api(self, api_file_path: Path, sensitive_only: bool):
+        try:
+            data = json_backend.load(api_file_path)
+        except:
+            print(f"Error while reading {api_file_path}")
+            return
+        if 'error' in data:
+            return
+        self.set_permissions(data.get('permissions', []))
+        # load broadcasts
+        for broadcast in data.get('broadcasts', []):
+            self.load_api_broadcast(broadcast, sensitive_only)
 
     def load_api_view(self, view: dict, sensitive_only: bool):
         apis = view['api']
@@ -228,103 +414,250 @@ class FrontmatterUiParser:
         if ui is None:
             pass
             # print(f'Unknown UI widget: {guid} in {self.apk_path}')
-        else:
+        elif ui.api:
             ui.api.extend(ui_apis)
+        elif ui_apis:
+            ui.api = ui_apis
+
+    def set_permissions(self, permissions: list):
+        self.permissions = permissions
+        self.declared_permissions = frozenset(permissions)
+        self.api_filter.clear()
+        self.uri_filter.clear()
+        self.sensitive_apis.clear()
 
     def filter_api(self, api, sensitive_only):
+        """
+        :return: api without surrounding '/' if it passes the filter, None otherwise
+        both filter variants are decided once per distinct api string of the app
+        """
+        decision = self.api_filter.get(api)
+        if decision is None:
+            decision = self.api_filter[api] = self.filter_decision(api)
+        return decision[bool(sensitive_only)]
+
+    def filter_decision(self, api) -> tuple:
+        """
+        :return: filtered api with sensitive_only=False, with sensitive_only=True
+        """
         api = api.strip('/')
-        perm = self.sensitive_perms.get(api, None)
-        if perm in self.permissions:  # sensitive permission is declared
-            return api
-        if perm is None and not sensitive_only:
-            return api  # permission is not sensitive, we have no information if api is covered by any other permission
-        return None
-
-    def read_ui(self, force):
-        with open(self.apk_path) as fd:
+        perm = self.sensitive_perms.get(api)
+        if perm is None:
+            return api, None  # permission is not sensitive, we have no information if api is covered by any other permission
+        if perm in self.declared_permissions:  # sensitive permission is declared
+            self.sensitive_apis.add(api)
+            return api, api
+        return None, None
+
+    def filter_uri_call(self, uris: str, method: str, sensitive_only) -> tuple:
+        """
+        :param uris: several uris or parts of one uri separated by '|'
+        :return: filtered 'uri|method' calls, both filter variants are decided once per distinct (uris, method) of the app
+        """
+        key = (uris, method)
+        decision = self.uri_filter.get(key)
+        if decision is None:
+            decision = self.uri_filter[key] = tuple(
+                tuple(f"{self.sanitize_uri(uri)}|{method}" for uri in (self.filter_api(part, variant) for part in uris.split('|')) if uri)
+                for variant in (False, True))
+            self.sensitive_apis.update(decision[True])
+        return decision[bool(sensitive_only)]
+
+    def keep_sensitive_only(self):
+        """
+        drops the apis that read_api(sensitive_only=True) would have filtered out, after reading them with
+        sensitive_only=False, so that both variants are extracted from one parse
+        """
+        keep = self.sensitive_apis
+        self.ui_apis = [api for api in self.ui_apis if api in keep]
+        for view in self.ui.values():
+            if view.api:
+                view.api = [api for api in view.api if api in keep]
+        self.lifecycle = {name: [api for api in apis if api in keep] for name, apis in self.lifecycle.items()}
+        self.services = {name: [api for api in apis if api in keep] for name, apis in self.services.items()}
+        for broadcast in self.broadcasts.values():
+            broadcast.apis = [api for api in broadcast.apis if api in keep]
+
+    def read_ui(self, force, streaming=False, head=None):
+        """
+        :param force: parse file even if it is considered as unity/platform
+        :param streaming: decode activities and transitions one at a time instead of loading the whole file
+        :param head: error marker/meta block of the file if known (see result_head), otherwise it is read from the file start
+        """
+        if head is None:
             try:
-                data = json.load(fd)
-            except:
-                print(f"Error while reading {self.apk_path}")
+                with self.profile.phase('head'):
+                    head = result_head.read_head(self.apk_path)
+            except OSError:
+                head = None
+        self.head = head
+        if head is not None and not self.accept_head(head):
+            return  # rejected without decoding the whole file
+        if streaming:
+            with self.profile.phase('ui_stream'):
+                self.read_ui_stream(force)
+            self.count_parsed()
+            return
+        try:
+            with self.profile.phase('decode'):
+                data = json_backend.load(self.apk_path)
+        except:
+            print(f"Error while reading {self.apk_path}")
+            return
+        if not self.accept_head(data):
+            return
+        jactivities = data['activities']
+        jtransitions = data['transitions']
+        with self.profile.phase('platform'):
+            if not self.detect_platform(jactivities, force):
                 return
+        with self.profile.phase('activities'):
+            self.parse_activities(jactivities)
+        with self.profile.phase('transitions'):
+            self.parse_transitions(jtransitions)
+        self.count_parsed()
+
+    def count_parsed(self):
+        self.profile.count('activities', len(self.activities))
+        self.profile.count('views', len(self.ui))
+        self.profile.count('transitions', sum(map(len, self.transitions.values())))
+
+    def accept_head(self, data):
+        """
+        applies the error marker and the meta block of a result
+        :return: False if the app should not be parsed
+        """
         if 'error' in data:
             self.ui_error = data['error'].lower()
+            return False
+        self.load_meta(data.get('meta', {}))
+        if not self.is_normal():
+            return False
+        if not self.is_english():
+            return False
+        return True
+
+    @classmethod
+    def head_accepted(cls, head) -> bool:
+        """
+        accept_head() of a known head without a parser, e.g. to skip reading rejected apps
+        """
+        meta = head.get('meta', {})
+        return 'error' not in head and cls.normal_meta(meta) and cls.english_meta(meta)
+
+    def read_ui_stream(self, force):
+        """
+        streaming version of read_ui: the file is decoded twice, first to detect the platform (stops once a framework that rejects the app is decided),
+        then to parse activities and transitions. Only one activity is kept in memory at a time
+        """
+        classifier = PlatformClassifier(self.platform_rules, stop_early=not force)
+        try:
+            with result_source.open_result(self.apk_path) as fd:
+                for prefix, value in json_stream.iter_items(fd, {'error', 'meta', 'activities.item'}):
+                    if prefix == 'error':
+                        self.ui_error = value.lower()
+                        return
+                    if prefix == 'meta':
+                        self.load_meta(value)
+                        if not self.is_normal():
+                            return
+                        if not self.is_english():
+                            return
+                    elif classifier.add(value):
+                        break
+        except json_stream.JSONError:
+            print(f"Error while reading {self.apk_path}")
             return
-        self.meta = data.get('meta', {})
+        if self.meta is None:
+            self.load_meta({})
+            if not self.is_normal() or not self.is_english():
+                return
+        if not self.apply_platform(classifier.platform, force):
+            return
+        with result_source.open_result(self.apk_path) as fd:
+            try:
+                for prefix, value in json_stream.iter_items(fd, {'activities.item', 'transitions.item'}):
+                    if prefix == 'activities.item':
+                        self.store_activity(value)
+                    else:
+                        self.parse_transition(value)
+            except json_stream.JSONError:
+                print(f"Error while reading {self.apk_path}")
+
+    def load_meta(self, meta):
+        self.meta = meta
         self.apk_platform = self.meta.get('type', 'android').lower()
         if self.apk_platform == 'normal':
             self.apk_platform = 'android'
         self.lang = self.meta.get('defaultLanguage', '')
-        if not self.is_normal():
-            return
-        if not self.is_english():
-            return
-        jactivities = data['activities']
-        jtransitions = data['transitions']
-        if any(map(self.is_xamarin, jactivities)):
-            self.apk_platform = 'xamarin'
-            if not force:
-                return
-        if any(map(self.is_unity, jactivities)) and not force:
-            self.apk_platform = 'unity'
-            if not force:
-                return
-        if self.is_platform(jactivities):
-            self.apk_platform = 'unidentified'
-            if self.is_appybuilder(jactivities):
-                self.apk_platform = 'appbuilder'
-                if not force:
-                    return
-            if self.is_apache(jactivities):
-                self.apk_platform = 'apache'
-                if not force:
-                    return
-            if any(map(self.is_air, jactivities)):
-                self.apk_platform = 'air'
-                if not force:
-                    return
-            if any(map(self.is_kodular, jactivities)):
-                self.apk_platform = 'kodular'
-                if not force:
-                    return
-            if any(map(self.is_solar2d, jactivities)):
-                self.apk_platform = 'solar2d'
-                if not force:
-                    return
-            if not force:
-                return
-        activity_names = set()
-        # parse activities
+
+    def detect_platform(self, jactivities, force):
+        """
+        sets apk_platform for apps built with a framework, see platform_rules
+        :return: False if the app should not be parsed
+        """
+        classifier = PlatformClassifier(self.platform_rules, stop_early=not force)
         for jactivity in jactivities:
-            name, title, texts = self.parse_activity(jactivity)
-            activity_names.add(name)
-            self.activities[name].title = title
-            self.activities[name].labels = texts
-        # parse transitions
+            if classifier.add(jactivity):
+                break
+        return self.apply_platform(classifier.platform, force)
+
+    def apply_platform(self, platform, force):
+        """
+        :return: False if the app should not be parsed
+        """
+        if platform is None:
+            return True
+        self.apk_platform = platform
+        return force
+
+    def parse_activities(self, jactivities):
+        for jactivity in jactivities:
+            self.store_activity(jactivity)
+
+    def store_activity(self, jactivity):
+        name, title, texts = self.parse_activity(jactivity)
+        self.activities[name].title = title
+        self.activities[name].labels = texts
+
+    def parse_transitions(self, jtransitions):
         for jtransition in jtransitions:
-            src_name = jtransition['scr']
-            dest_name = jtransition['dest']
-            button_ids = jtransition['trigger']
-            button_labels = []
-            for guid in button_ids:
-                if guid in self.ui:
-                    button_labels.append(self.ui[guid].label)
-            button_labels = [self.ui[guid].label for guid in button_ids if guid in self.ui]
-            # button_label = f" {self.sentence_delimeter} ".join(filter(self.is_not_blank, button_labels))
-            # src_activity = self.activities[src_name]
-            # dest_activity = self.activities[dest_name]
-            transition_src = self.transitions.setdefault(src_name, [])
-            if len(button_labels) == 0:
-                transition_src.append({'dest': dest_name, 'trigger': ''})
-            else:
-                for button_label in button_labels:
-                    transition_src.append({'dest': dest_name, 'trigger': button_label})
+            self.parse_transition(jtransition)
+
+    def parse_transition(self, jtransition):
+        src_name = jtransition['scr']
+        dest_name = jtransition['dest']
+        button_ids = jtransition['trigger']
+        button_labels = [self.ui[guid].label for guid in button_ids if guid in self.ui]
+        # button_label = f" {self.sentence_delimeter} ".join(filter(self.is_not_blank, button_labels))
+        transition_src = self.transitions.setdefault(src_name, [])
+        if len(button_labels) == 0:
+            transition_src.append(Transition(dest_name, ''))
+        else:
+            for button_label in button_labels:
+                transition_src.append(Transition(dest_name, button_label))
 
-    def get_activity_data(self):
+    def get_activity_data(self, factored=False):
+        """
+        :param factored: instead of every label combination emit each label set of a combination separately, numbered by `group`
+        """
         app_data = []
         for name, activity in self.activities.items():
             title = activity.title
             labels = activity.labels
+            if factored:
+                for group, label_set in enumerate(self.label_groups(labels)):
+                    for label in label_set:
+                        app_data.append(
+                            {
+                                'pkg': self.pkg,
+                                'activity': name,
+                                'title': title,
+                                'group': group,
+                                'labels': label,
+                            }
+                        )
+                continue
             for label in labels:
                 app_data.append(
                     {
@@ -336,6 +669,38 @@ class FrontmatterUiParser:
                 )
         return app_data
 
+    @staticmethod
+    def label_sets(labels):
+        if isinstance(labels, LabelAlternatives):
+            return labels.factors
+        return [labels]
+
+    @classmethod
+    def label_groups(cls, labels) -> list:
+        """
+        label sets of the factored activity data: the factors of the activity's product, nested products (texts of view
+        groups with alternatives) are not expanded but add their prefix and factors as further groups
+        """
+        if isinstance(labels, LabelAlternatives):
+            groups = [[labels.prefix]] if labels.prefix else []
+            for factor in labels.factors:
+                groups.extend(cls.label_groups(factor))
+            return groups
+        if not isinstance(labels, LabelChain):
+            return [labels]
+        groups = [[part for part in labels.parts if isinstance(part, str)]]
+        for part in labels.parts:
+            if not isinstance(part, str):
+                groups.extend(cls.label_groups(part))
+        return [group for group in groups if group]
+
+    @staticmethod
+    def label_value(label):
+        """
+        :return: widget label for the tables, the list of alternatives of a lazy product
+        """
+        return list(label) if isinstance(label, LabelAlternatives) else label
+
     def get_widget_ui_data(self, with_empty) -> list:
         app_ui = []
         for guid, view in self.ui.items():
@@ -344,7 +709,7 @@ class FrontmatterUiParser:
                     {
                         'pkg': self.pkg,
                         'activity': view.activity,
-                        'label': view.label,
+                        'label': self.label_value(view.label),
                         'icon': view.icon,
                         'guid': guid,
                         'class': view.clazz,
@@ -388,6 +753,35 @@ class FrontmatterUiParser:
                 )
         return api_data
 
+    def get_label_api_data(self) -> list:
+        """
+        apis of labeled widgets together with the widget label
+        """
+        api_data = []
+        for view in self.ui.values():
+            if not view.label:
+                continue
+            for api in view.api:
+                api_data.append({'pkg': self.pkg, 'activity': view.activity, 'api': api, 'label': self.label_value(view.label)})
+        return api_data
+
+    def get_component_api_data(self) -> list:
+        """
+        apis of activity lifecycle methods, broadcast receivers and services
+        """
+        api_data = []
+        for name, apis in self.lifecycle.items():
+            for api in apis:
+                api_data.append({'pkg': self.pkg, 'type': 'activity', 'name': name, 'api': api})
+        for name, broadcast in self.broadcasts.items():
+            component_type = 'system_broadcast' if self.is_system_broadcast(broadcast) else 'broadcast'
+            for api in broadcast.apis:
+                api_data.append({'pkg': self.pkg, 'type': component_type, 'name': name, 'api': api})
+        for name, apis in self.services.items():
+            for api in apis:
+                api_data.append({'pkg': self.pkg, 'type': 'service', 'name': name, 'api': api})
+        return api_data
+
     def get_app_data_transitions(self):
         app_data = []
         for activity_name, transitions in self.transitions.items():
@@ -396,13 +790,13 @@ class FrontmatterUiParser:
             src_activity = self.activities[activity_name]
             src_labels = src_activity.labels
             for transition in transitions:
-                dest_name = transition['dest']
+                dest_name = transition.dest
                 if dest_name not in self.activities:
                     continue
                 dest_activity = self.activities[dest_name]
                 dest_labels = dest_activity.labels
-                triggers = transition['trigger']
-                button_label = self.concat_labels(triggers)
+                triggers = transition.trigger
+                button_label = self.sanitize(triggers) if isinstance(triggers, str) else self.concat_labels(triggers)
                 for src_label in src_labels:
                     for dest_label in dest_labels:
                         app_data.append(
@@ -415,6 +809,46 @@ class FrontmatterUiParser:
                         )
         return app_data
 
+    def get_transition_graph(self) -> TransitionGraph:
+        """
+        normalized form of get_app_data_transitions(): one node per activity referring to its label set, one edge per
+        distinct (src, dest, trigger) and every label set of the app once as (label_set, group, label) rows, the label
+        combinations of a node are the product of its groups (complete, max_alternatives is not applied)
+        ids are local to the app, -1 stands for no labels/trigger; activities without labels keep their edges
+        """
+        if self.transition_graph is not None:
+            return self.transition_graph
+        label_set_ids = {}  # tuple of label groups -> label set id
+        label_sets = []
+
+        def label_set_id(groups) -> int:
+            key = tuple(tuple(group) for group in groups if group)
+            if not key:
+                return -1
+            if key not in label_set_ids:
+                label_set_ids[key] = len(label_set_ids)
+                label_sets.extend({'pkg': self.pkg, 'label_set': label_set_ids[key], 'group': group, 'label': label}
+                                  for group, labels in enumerate(key) for label in labels)
+            return label_set_ids[key]
+
+        node_ids = {name: node for node, name in enumerate(self.activities)}
+        nodes = [{'pkg': self.pkg, 'node': node_ids[name], 'activity': name, 'title': activity.title, 'label_set': label_set_id(self.label_sets(activity.labels))}
+                 for name, activity in self.activities.items()]
+        edges = {}  # insertion ordered set
+        for activity_name, transitions in self.transitions.items():
+            if activity_name not in node_ids:
+                continue
+            for transition in transitions:
+                if transition.dest not in node_ids:
+                    continue
+                triggers = transition.trigger
+                button_label = self.sanitize(triggers) if isinstance(triggers, str) else self.concat_labels(triggers)
+                trigger = label_set_id([[button_label]] if self.is_not_blank(button_label) else [])
+                edges[(node_ids[activity_name], node_ids[transition.dest], trigger)] = None
+        edges = [{'pkg': self.pkg, 'src': src, 'dest': dest, 'trigger': trigger} for src, dest, trigger in edges]
+        self.transition_graph = TransitionGraph(nodes, label_sets, edges)
+        return self.transition_graph
+
     def concat_labels(self, labels):
         labels = list(labels)
         return f" {self.sentence_delimiter} ".join(filter(self.is_not_blank, map(self.sanitize, labels)))
@@ -437,19 +871,44 @@ class FrontmatterUiParser:
         # parse layouts
         jlayouts = jactivity['layouts']
         parsed_layouts = [self.parse_layout(layout, activity_name) for layout in jlayouts]
-        layout_strings = list(filter(self.is_not_blank, self.flatten(parsed_layouts)))
+        layout_strings = self.alternatives(parsed_layouts)
         # parse disconnected fragments XXX: we assume these fragments are replaced by each other and don't appear together
         orphaned_fragments = jactivity.get('orphanedFragments', [])
-        orphaned_fragment_strings = list(filter(self.is_not_blank, self.flatten([self.parse_fragment(fragment, activity_name) for fragment in orphaned_fragments])))
+        orphaned_fragment_strings = self.alternatives([self.parse_fragment(fragment, activity_name) for fragment in orphaned_fragments])
         # combine extracted texts
         if len(orphaned_fragment_strings) == 0:
             res_text = layout_strings
         elif len(layout_strings) == 0:
             res_text = orphaned_fragment_strings
         else:
-            res_text = [f" {self.sentence_delimiter} ".join(item) for item in itertools.product(layout_strings, orphaned_fragment_strings)]
+            res_text = self.combine_alternatives([layout_strings, orphaned_fragment_strings])
         return activity_name, titles_string, res_text
 
+    def alternatives(self, texts):
+        """
+        concatenates the non-blank labels of texts (strings, label lists and lazy products)
+        :return: list of strings, a LabelChain if a nested product is among them (kept unexpanded)
+        """
+        parts = []
+        for text in texts:
+            if isinstance(text, str):
+                if self.is_not_blank(text):
+                    parts.append(text)
+            elif isinstance(text, LabelAlternatives):
+                parts.append(text)  # combinations of a view group are never blank
+            elif isinstance(text, LabelChain):
+                parts.extend(text.parts)
+            else:
+                parts.extend(filter(self.is_not_blank, text))
+        if all(isinstance(part, str) for part in parts):
+            return parts
+        return LabelChain(parts)
+
+    def combine_alternatives(self, factors, prefix=None) -> LabelAlternatives:
+        alternatives = LabelAlternatives(factors, self.sentence_delimiter, prefix, self.max_alternatives)
+        self.truncated_alternatives += alternatives.truncated
+        return alternatives
+
     def parse_menu_items(self, items, activity_name):
         for item in items:
             guid = item.get('guid', '')
@@ -472,44 +931,103 @@ class FrontmatterUiParser:
         return 'fragmentClass' in view
 
     def parse_view(self, view, activity_name):
-        if self.is_fragment(view):  # fragment container
-            return self.parse_fragment(view, activity_name)
-        view_class = view['viewClass']
-        vid = view['id']
-        guid = view['guid']
-        id_variable_name = view.get('idVariable', '')
-        text_attrs = view.get('textAttributes', [])
-        view_text = self.collect_text(text_attrs)
-        input_type = view.get('inputTypes', [])
-        other_attrs = view.get('otherAttributes', [])
-        listeners = view.get('listeners', [])
-        icon = self.get_icon(other_attrs)
-        children = view.get('children', [])
-        self.activities[activity_name].views.append(guid)
-        self.ui[guid].activity = activity_name
-        self.ui[guid].clazz = view_class
-        self.ui[guid].listeners = listeners
-        self.ui[guid].var_name = id_variable_name
-        self.ui[guid].icon = icon
+        """
+        walks the view tree with an explicit stack, views are recorded in pre-order and their texts are built in post-order
+        a subtree is parsed once per app: a repeated guid (the same layout instance attached again) is replayed from the views recorded before,
+        copies with new guids share the text of the structurally identical subtree
+        returns string or list of strings (alternatives)
+        """
+        views = self.activities[activity_name].views
+        results = {}  # id(node) -> (subtree id, text) of processed nodes whose parent is not finished yet
+        stack = [(view, None, 0, 0)]
+        while stack:
+            node, children, first_view, truncated = stack.pop()
+            is_fragment = 'fragmentClass' in node
+            if children is None:  # pre-order visit
+                if not is_fragment:
+                    shared = self.shared_subtrees.get(node['guid'])
+                    if shared is not None:
+                        results[id(node)] = self.replay_subtree(shared, views, activity_name)
+                        continue
+                    self.record_view(node, views, activity_name)
+                children = self.ordered_children(node, is_fragment)
+                stack.append((node, children, len(views) - 1, self.truncated_alternatives))
+                for child in reversed(children):
+                    stack.append((child, None, 0, 0))
+                continue
+            child_results = [results.pop(id(child)) for child in children]
+            child_ids = tuple([subtree_id for subtree_id, _ in child_results])
+            if is_fragment:
+                content = (None, child_ids)
+            else:
+                text_attrs = node.get('textAttributes', ())
+                content = (tuple([(attr['name'], attr['value']) if type(attr) == dict else attr for attr in text_attrs]), child_ids)
+            subtree_id = self.subtree_ids.setdefault(content, len(self.subtree_ids))
+            parsed = self.subtree_texts.get(subtree_id)
+            if parsed is None:
+                child_texts = [child_text for _, child_text in child_results]
+                dropped = self.truncated_alternatives
+                if is_fragment:
+                    text = self.alternatives(child_texts)  # list of strings
+                else:
+                    text = self.combine_view_text(node, children, child_texts)
+                self.subtree_texts[subtree_id] = (text, self.truncated_alternatives - dropped)
+            else:
+                text, dropped = parsed
+                self.truncated_alternatives += dropped  # counted for every copy, as if it was combined again
+            if not is_fragment:
+                self.ui[node['guid']].label = text
+                if children:
+                    self.shared_subtrees[node['guid']] = (subtree_id, text, views, first_view, len(views), self.truncated_alternatives - truncated)
+            results[id(node)] = (subtree_id, text)
+        return results[id(view)][1]
+
+    def replay_subtree(self, shared, views, activity_name):
+        subtree_id, text, source_views, first_view, end, truncated = shared
+        self.truncated_alternatives += truncated
+        subtree_views = source_views[first_view:end]
+        for guid in subtree_views:
+            self.ui[guid].activity = activity_name
+        views.extend(subtree_views)
+        return subtree_id, text
 
+    def ordered_children(self, node, is_fragment):
+        """
+        children in parsing order: views first, then fragment containers
+        """
+        if is_fragment:
+            return node.get('layouts') or []
+        children = node.get('children')
+        if not children:
+            return []
+        fragments = list(filter(self.is_fragment, children))
+        if not fragments:
+            return children
+        return [child for child in children if not self.is_fragment(child)] + fragments
+
+    def record_view(self, view, views, activity_name):
+        guid = view['guid']
+        views.append(guid)
+        ui = self.ui[guid]
+        ui.activity = activity_name
+        ui.clazz = intern(view['viewClass'])  # few distinct classes repeated in every widget
+        ui.listeners = view.get('listeners') or ()
+        ui.var_name = view.get('idVariable', '')
+        ui.icon = self.get_icon(view.get('otherAttributes', ()))
+
+    def combine_view_text(self, view, children, child_texts):
+        view_text = self.collect_text(view.get('textAttributes', []))
         if not children:
-            self.ui[guid].label = view_text
             return view_text
-        children_text_items = [self.parse_view(child, activity_name) for child in children if not self.is_fragment(child)]
-        child_fragments = list(filter(self.is_fragment, children))
-        if len(child_fragments) > 0:
-            child_fragments_text = self.flatten(self.parse_fragment(fragment, activity_name) for fragment in child_fragments)  # list of lists
-            children_text_items.extend(child_fragments_text)
+        children_text_items = [text for child, text in zip(children, child_texts) if not self.is_fragment(child)]
+        child_fragments_text = [text for child, text in zip(children, child_texts) if self.is_fragment(child)]
+        children_text_items.extend(self.flatten(child_fragments_text))  # fragment alternatives are concatenated
         children_text_items.append(self.sanitize(view_text))
         children_partial_text = f" {self.sentence_delimiter} ".join(filter(lambda text: isinstance(text, str) and self.is_not_blank(text), children_text_items))
-        children_alternatives = list(filter(lambda text: isinstance(text, list), children_text_items))
+        children_alternatives = list(filter(lambda text: isinstance(text, LabelAlternatives), children_text_items))
         if len(children_alternatives) == 0:
-            children_text = children_partial_text  # string
-        else:
-            children_alternative_texts = [f" {self.sentence_delimiter} ".join(item) for item in itertools.product(*children_alternatives)]
-            children_text = [f"{children_partial_text}{self.sentence_delimiter} {item}" for item in children_alternative_texts]  # list
-        self.ui[guid].label = children_text
-        return children_text
+            return children_partial_text  # string
+        return self.combine_alternatives(children_alternatives, children_partial_text)  # lazy, expanded by the consumers
 
     def collect_text(self, text_attrs):
         """
@@ -518,10 +1036,7 @@ class FrontmatterUiParser:
         return self.concat_labels(more_itertools.unique_everseen(map(lambda t: self.parse_text(t), text_attrs)))
 
     def parse_fragment(self, fragment, activity_name):
-        layouts = fragment.get('layouts')
-        if not layouts:
-            return []
-        return list(self.flatten([self.parse_layout(layout, activity_name) for layout in layouts]))  # list of strings
+        return self.parse_view(fragment, activity_name)  # list of strings
 
     @staticmethod
     def is_not_blank(string):
@@ -551,7 +1066,11 @@ class FrontmatterUiParser:
         return self.parse_view(fragment)
 
     def is_normal(self):
-        return self.meta.get('type', 'NORMAL') == 'NORMAL'
+        return self.normal_meta(self.meta)
+
+    @staticmethod
+    def normal_meta(meta) -> bool:
+        return meta.get('type', 'NORMAL') == 'NORMAL'
 
     @staticmethod
     def flatten(items):
@@ -575,7 +1094,7 @@ class FrontmatterUiParser:
             view = View()
             guid = button.get("guid", "")
             view.label = button.get("label", "")
-            view.listener = button.get("listener", "")
+            listener = button.get("listener", "")
             view.activity = activity_name
             view.context = dialog_string
             view.clazz = "DialogButton"
@@ -583,7 +1102,7 @@ class FrontmatterUiParser:
             if guid != "":
                 self.ui[guid] = view
             else:
-                self.dialogs[view.listener] = view  # in case of old analysis version
+                self.dialogs[listener] = view  # in case of old analysis version
 
     @staticmethod
     def is_content_url(perm_name):
@@ -618,15 +1137,8 @@ class FrontmatterUiParser:
                 if source:
                     self.service_mapping[source].append(api['uri'])
                 return []  # FIXME
-            else:
-                uris = api['uri'].split('|')  # may be several uris or parts of one uri
-                api_uri = []
-                for uri in uris:  # use uri with of ContentResolver methods: query, insert
-                    uri = self.filter_api(uri, sensitive_only)
-                    uri = self.sanitize_uri(uri)
-                    if uri:
-                        api_uri.append(f"{uri}|{api['method']}")
-                return api_uri
+            else:  # use uri with of ContentResolver methods: query, insert
+                return list(self.filter_uri_call(api['uri'], api['method'], sensitive_only))
         else:
             api = self.filter_api(api, sensitive_only)
             return [api] if api else []
@@ -653,12 +1165,6 @@ class FrontmatterUiParser:
         else:
             return attr
 
-    @staticmethod
-    def load_actions() -> set:
-        with open('actions.list') as fd:
-            actions = {line.strip() for line in fd.readlines() if not line.startswith("#")}
-        return actions
-
     @staticmethod
     def sanitize_uri(uri: str):
         return uri.replace(":", "=")
@@ -0,0 +1,230 @@
+"""
+Generator of synthetic frontmatter results (ui and api json) for reproducible benchmarks without real app data
+Every app is generated from the seed and its index, the shape of the corpus (activities, widget tree depth and fan-out,
+fragments, orphaned fragments, dialogs, menus, transitions, api calls) is set by GeneratorConfig
+Sensitive apis and content uris are sampled from the permission mapping, so api filtering has work to do
+--legacy writes the older result format read by frontmatter_luigi/import_db.py
+"""
+import argparse
+import json
+import random
+from collections import namedtuple
+from pathlib import Path
+
+import permission_index
+
+GeneratorConfig = namedtuple('GeneratorConfig', [
+    'activities',  # mean number of activities per app
+    'depth',  # max depth of a layout tree
+    'fan_out',  # max children of a view group
+    'text_rate',  # share of views with a text
+    'listener_rate',  # share of views with a click listener
+    'icon_rate',  # share of views with a drawable
+    'fragment_rate',  # share of view groups hosting a fragment
+    'orphaned_rate',  # share of activities with orphaned fragments
+    'dialog_rate',  # share of activities with a dialog
+    'menu_rate',  # share of activities with an options menu
+    'reuse_rate',  # share of activities attaching the layout of another activity (same guids)
+    'transitions',  # mean number of transitions per activity
+    'api_rate',  # share of views calling apis
+    'apis_per_view',  # max api calls of such a view
+    'declared_rate',  # share of sensitive apis whose permission the app declares
+    'platform_rate',  # share of unity apps
+    'error_rate',  # share of failed analyses
+    'foreign_rate',  # share of apps not in english
+], defaults=[8, 5, 4, 0.6, 0.3, 0.2, 0.1, 0.3, 0.25, 0.5, 0.1, 1.5, 0.15, 3, 0.8, 0.1, 0.02, 0.05])
+
+VIEW_CLASSES = ('android.widget.Button', 'android.widget.TextView', 'android.widget.ImageButton', 'android.widget.EditText',
+                'android.widget.CheckBox', 'android.widget.ImageView', 'android.widget.Switch')
+GROUP_CLASSES = ('android.widget.LinearLayout', 'android.widget.FrameLayout', 'android.widget.RelativeLayout',
+                 'androidx.constraintlayout.widget.ConstraintLayout', 'android.widget.ScrollView')
+TEXT_ATTRIBUTES = ('text', 'hint', 'contentDescription')
+WORDS = ('ok', 'cancel', 'save', 'delete', 'share', 'settings', 'login', 'sign in', 'password', 'email', 'search', 'next',
+         'back', 'camera', 'photo', 'location', 'map', 'contacts', 'call', 'message', 'send', 'profile', 'help', 'about',
+         'record', 'start', 'stop', 'open', 'close', 'account', 'notifications', 'privacy', 'terms', 'upload', 'download')
+PLAIN_APIS = ('<java.lang.Object: void <init>()>', '<android.util.Log: int d(java.lang.String,java.lang.String)>',
+              '<android.widget.Toast: void show()>', '<android.content.Context: java.lang.String getString(int)>',
+              '<android.app.Activity: void startActivity(android.content.Intent)>', '<java.lang.String: int length()>')
+URI_METHODS = ('query', 'insert', 'update', 'delete')
+SYSTEM_ACTIONS = ('android.intent.action.BOOT_COMPLETED', 'android.intent.action.PACKAGE_ADDED', 'android.net.conn.CONNECTIVITY_CHANGE')
+
+
+def sensitive_apis():
+    """
+    :return: sorted lists of (signature, permission) and (content uri, permission) of the permission mapping
+    """
+    perms = permission_index.get_index().sensitive_perms
+    signatures = sorted((api, perm) for api, perm in perms.items() if api.startswith('<'))
+    uris = sorted((api, perm) for api, perm in perms.items() if api.startswith('content://'))
+    return signatures, uris
+
+
+class AppGenerator:
+    def __init__(self, config: GeneratorConfig, seed: int, index: int, apis: tuple):
+        self.config = config
+        self.rng = random.Random(f"{seed}-{index}")
+        self.pkg = f"com.synthetic.app{index:06d}"
+        self.signatures, self.uris = apis
+        self.guids = 0
+        self.activity_names = []
+        self.api_guids = []  # views calling apis
+        self.layouts = []
+
+    def chance(self, rate):
+        return self.rng.random() < rate
+
+    def guid(self):
+        self.guids += 1
+        return self.guids
+
+    def label(self):
+        return ' '.join(self.rng.sample(WORDS, self.rng.randint(1, 3)))
+
+    def view(self, depth):
+        is_group = depth > 0 and self.chance(0.5)
+        guid = self.guid()
+        view = {'viewClass': self.rng.choice(GROUP_CLASSES if is_group else VIEW_CLASSES), 'id': 2130000000 + guid, 'guid': guid,
+                'idVariable': f"view_{guid}"}
+        if self.chance(self.config.text_rate):
+            view['textAttributes'] = [{'name': self.rng.choice(TEXT_ATTRIBUTES), 'value': self.label()}]
+        if self.chance(self.config.listener_rate):
+            view['listeners'] = [f"<{self.pkg}.Listener{guid % 7}: void onClick(android.view.View)>"]
+        if self.chance(self.config.icon_rate):
+            view['otherAttributes'] = {'src': {'value': f"drawable/ic_{self.rng.choice(WORDS).replace(' ', '_')}", 'variable': 'ic'}}
+        if self.chance(self.config.api_rate):
+            self.api_guids.append(guid)
+        if is_group:
+            children = [self.view(depth - 1) for _ in range(self.rng.randint(1, self.config.fan_out))]
+            if self.chance(self.config.fragment_rate):
+                children.append(self.fragment(depth - 1))
+            view['children'] = children
+        return view
+
+    def fragment(self, depth):
+        return {'fragmentClass': f"{self.pkg}.Fragment{self.guids % 5}", 'layouts': [self.view(depth) for _ in range(self.rng.randint(1, 2))]}
+
+    def activity(self, name):
+        activity = {'name': name, 'titles': [self.label().title()]}
+        if self.layouts and self.chance(self.config.reuse_rate):
+            layout = self.rng.choice(self.layouts)
+        else:
+            layout = self.view(self.config.depth)
+            self.layouts.append(layout)
+        activity['layouts'] = [layout]
+        if self.chance(self.config.orphaned_rate):
+            activity['orphanedFragments'] = [self.fragment(self.config.depth - 2) for _ in range(self.rng.randint(1, 3))]
+        if self.chance(self.config.menu_rate):
+            items = [{'guid': self.guid(), 'title': {'value': self.label(), 'variable': 'menu'}} for _ in range(self.rng.randint(1, 4))]
+            if self.chance(0.2):
+                items[0]['subMenu'] = [{'guid': self.guid(), 'title': self.label()}]
+            activity['menu'] = [{'items': items}]
+        if self.chance(self.config.dialog_rate):
+            buttons = [{'guid': self.guid(), 'label': self.rng.choice(('OK', 'Cancel', 'Allow', 'Deny')), 'listener': f"<{self.pkg}.Dialog: void onClick()>"} for _ in range(2)]
+            activity['dialogs'] = [{'titles': [self.label().title()], 'messages': [self.label()], 'buttons': buttons}]
+        return activity
+
+    def ui(self) -> dict:
+        if self.chance(self.config.error_rate):
+            return {'error': self.rng.choice(('TIMEOUT', 'PARSING_ERROR'))}
+        count = self.rng.randint(1, 2 * self.config.activities - 1)
+        self.activity_names = [f"{self.pkg}.Activity{i}" for i in range(count)]
+        if self.chance(self.config.platform_rate):
+            self.activity_names[0] = 'com.unity3d.player.UnityPlayerActivity'
+        language = 'de' if self.chance(self.config.foreign_rate) else 'en'
+        activities = [self.activity(name) for name in self.activity_names]
+        transitions = []
+        for name in self.activity_names:
+            for _ in range(self.rng.randint(0, round(2 * self.config.transitions))):
+                triggers = [self.rng.randint(1, self.guids)] if self.chance(0.8) else []
+                transitions.append({'scr': name, 'dest': self.rng.choice(self.activity_names), 'trigger': triggers})
+        return {'meta': {'type': 'NORMAL', 'defaultLanguage': language}, 'activities': activities, 'transitions': transitions}
+
+    def api_call(self, permissions):
+        kind = self.rng.random()
+        if kind < 0.3:
+            signature, perm = self.rng.choice(self.signatures)
+            if self.chance(self.config.declared_rate):
+                permissions.add(perm)
+            return signature
+        if kind < 0.4:
+            uri, perm = self.rng.choice(self.uris)
+            if self.chance(self.config.declared_rate):
+                permissions.add(perm)
+            return {'uri': uri, 'method': self.rng.choice(URI_METHODS)}
+        return self.rng.choice(PLAIN_APIS)
+
+    def api_calls(self, permissions):
+        return [self.api_call(permissions) for _ in range(self.rng.randint(1, self.config.apis_per_view))]
+
+    def api(self) -> dict:
+        """
+        api results of the app, to be generated after its ui
+        """
+        if not self.activity_names:
+            return {'error': 'TIMEOUT'}
+        permissions = set()
+        views = [{'guid': guid, 'listeners': ['onClick'], 'api': self.api_calls(permissions)} for guid in self.api_guids]
+        service = f"{self.pkg}.SyncService"
+        broadcasts = [{'name': f"{self.pkg}.Receiver", 'intent': [self.rng.choice(SYSTEM_ACTIONS)], 'api': self.api_calls(permissions)}]
+        activity_lc = [{'name': name, 'api': self.api_calls(permissions)} for name in self.activity_names if self.chance(0.3)]
+        services = [{'name': service, 'api': self.api_calls(permissions)}]
+        if activity_lc:
+            activity_lc[0]['api'].append({'uri': service, 'startService': True})
+        return {'permissions': sorted(permissions), 'views': views, 'serviceLS': services, 'broadcasts': broadcasts, 'activityLC': activity_lc}
+
+    def legacy_view(self, view):
+        legacy = {'viewClass': view['viewClass'], 'id': view['id'], 'idVariable': view['idVariable']}
+        legacy['textAttributes'] = {attr['name']: {'value': attr['value'], 'variable': 'str'} for attr in view.get('textAttributes', [])}
+        legacy['otherAttributes'] = view.get('otherAttributes', {})
+        legacy['children'] = [self.legacy_view(child) for child in view.get('children', []) if 'fragmentClass' not in child]
+        return legacy
+
+    def legacy(self) -> dict:
+        """
+        ui results in the format of the first analysis versions (frontmatter_luigi/import_db.py)
+        """
+        ui = self.ui()
+        if 'error' in ui:
+            return ui
+        activities = []
+        for activity in ui['activities']:
+            fragments = [{'layout': self.legacy_view(layout)} for fragment in activity.get('orphanedFragments', []) for layout in fragment['layouts']]
+            activities.append({'activity': activity['name'], 'label': activity['titles'][0], 'layouts': [self.legacy_view(layout) for layout in activity['layouts']],
+                               'fragments': fragments})
+        return {'activities': activities, 'mainActivities': self.activity_names[:1]}
+
+
+def generate(out_dir: Path, count: int, config: GeneratorConfig = GeneratorConfig(), seed: int = 0, legacy: bool = False):
+    """
+    writes `count` apps to out_dir/ui and out_dir/api, or out_dir/legacy
+    :return: ui folder, api folder (None for legacy results)
+    """
+    apis = sensitive_apis()
+    ui_dir = out_dir / ('legacy' if legacy else 'ui')
+    api_dir = None if legacy else out_dir / 'api'
+    for folder in (ui_dir, api_dir):
+        if folder:
+            folder.mkdir(parents=True, exist_ok=True)
+    for index in range(count):
+        generator = AppGenerator(config, seed, index, apis)
+        name = f"{generator.pkg}.json"
+        with (ui_dir / name).open('w') as fd:
+            json.dump(generator.legacy() if legacy else generator.ui(), fd)
+        if api_dir:
+            with (api_dir / name).open('w') as fd:
+                json.dump(generator.api(), fd)
+    return ui_dir, api_dir
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-o', '--output-dir', required=True, help="folder for the ui/ and api/ (or legacy/) results")
+    parser.add_argument('-n', '--count', type=int, default=1000, help="number of apps")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--legacy', default=False, action='store_true', help="write the older ui format read by import_db.py")
+    for field, default in GeneratorConfig._field_defaults.items():
+        parser.add_argument(f"--{field.replace('_', '-')}", type=type(default), default=default)
+    args = parser.parse_args()
+    config = GeneratorConfig(**{field: getattr(args, field) for field in GeneratorConfig._fields})
+    ui_dir, api_dir = generate(Path(args.output_dir), args.count, config, args.seed, args.legacy)
+    print(f"{args.count} apps written to {ui_dir}" + (f" and {api_dir}" if api_dir else ""))
@@ -0,0 +1,89 @@
+"""
+Json decoding for frontmatter result files with the fastest available backend: orjson, pysimdjson or stdlib json
+Files are decoded from bytes (big files from a memory map) without creating an intermediate str
+The backend can be forced with the FRONTMATTER_JSON_BACKEND environment variable or set_backend()
+"""
+import json
+import mmap
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+MMAP_THRESHOLD = 16 * 1024 * 1024  # files bigger than this are memory mapped if the backend accepts buffers
+COMPRESSION_SUFFIXES = ('.gz', '.zst')  # as result_source.COMPRESSION_SUFFIXES, other paths are plain files
+
+DecodeError = ValueError  # common base of the backends' decoding errors
+
+
+def _simdjson_loads(data):
+    return _simdjson_parser.parse(data, True)  # recursive: convert to python objects
+
+
+def _stdlib_loads(data):
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+_simdjson_parser = simdjson.Parser() if simdjson else None
+
+# name -> (loads, accepts buffers), ordered by preference
+BACKENDS = {}
+if orjson:
+    BACKENDS['orjson'] = (orjson.loads, True)
+if simdjson:
+    BACKENDS['simdjson'] = (_simdjson_loads, True)
+BACKENDS['json'] = (_stdlib_loads, False)
+
+backend = ''
+_loads = None
+_accepts_buffer = False
+
+
+def set_backend(name):
+    global backend, _loads, _accepts_buffer
+    if name not in BACKENDS:
+        raise ValueError(f"json backend {name} is not available, choose from: {', '.join(BACKENDS)}")
+    backend = name
+    _loads, _accepts_buffer = BACKENDS[name]
+
+
+def get_backend():
+    return backend
+
+
+def loads(data):
+    """
+    :param data: bytes, bytearray or memoryview with a json document
+    """
+    return _loads(data)
+
+
+def load(path):
+    """
+    :param path: result file, compressed files and archive members are decoded from their uncompressed bytes
+    """
+    if not isinstance(path, (str, os.PathLike)) or os.fspath(path).endswith(COMPRESSION_SUFFIXES):
+        try:
+            import result_source  # only here: the luigi scripts use this module without the parser's result sources
+        except ImportError:
+            result_source = None
+        if result_source is not None:
+            with result_source.open_result(path) as fd:
+                return _loads(fd.read())
+    with open(path, 'rb') as fd:
+        size = os.fstat(fd.fileno()).st_size
+        if _accepts_buffer and size > MMAP_THRESHOLD:
+            with mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+                return _loads(view)
+        return _loads(fd.read())
+
+
+set_backend(os.environ.get('FRONTMATTER_JSON_BACKEND') or next(iter(BACKENDS)))
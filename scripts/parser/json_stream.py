@@ -0,0 +1,45 @@
+"""
+Incremental decoding of frontmatter result files
+Instead of loading the whole json document, values located at given prefixes (ijson notation, e.g. 'activities.item')
+are built one at a time, so the memory footprint is bounded by the largest single value
+"""
+try:
+    import ijson
+except ImportError:  # streaming mode is optional
+    ijson = None
+
+JSONError = ijson.JSONError if ijson else ValueError
+
+
+def is_available():
+    return ijson is not None
+
+
+def iter_items(fd, prefixes):
+    """
+    yields (prefix, value) for every json value located at one of the `prefixes` in order of appearance
+    :param fd: file opened in binary mode
+    :param prefixes: collection of ijson prefixes, e.g. {'meta', 'activities.item'}
+    """
+    if ijson is None:
+        raise RuntimeError("streaming mode requires ijson (pip install ijson)")
+    builder = None
+    current = None
+    depth = 0
+    for prefix, event, value in ijson.parse(fd, use_float=True):
+        if builder is None:
+            if prefix not in prefixes or event == 'map_key':
+                continue
+            if event not in ('start_map', 'start_array'):
+                yield prefix, value  # scalar value
+                continue
+            builder = ijson.ObjectBuilder()
+            current = prefix
+        builder.event(event, value)
+        if event in ('start_map', 'start_array'):
+            depth += 1
+        elif event in ('end_map', 'end_array'):
+            depth -= 1
+            if depth == 0:
+                yield current, builder.value
+                builder = None
@@ -0,0 +1,159 @@
+"""
+Combines the outputs of sharded runs (--shard i/N) into the outputs of an unsharded run
+Tables and transition graphs (.npz) are concatenated in shard order, feature stores (folders) are appended, stats files
+(.json) are summed up
+Shards contain disjoint sets of apps, so concatenated tables need no further de-duplication, except for the string
+dictionaries of integer-coded (--intern) outputs which are united
+"""
+import argparse
+import json
+import shutil
+from pathlib import Path
+
+import feature_matrix
+import profiling
+import string_dictionary
+import table_writer
+import transition_graph
+from sharding import SHARD_PATTERN, find_shards
+
+MAX_STATS = {'depth'}  # options of the runs reported in the stats, equal on all shards
+OVERLAPPING_STATS = {'features': ('apis', 'permissions')}  # vocabulary sizes of columns shared by the shards, not additive
+
+
+def merge_csv(shards: list, path: Path):
+    with path.open('w', newline='') as out:
+        header = None
+        for shard in shards:
+            with shard.open(newline='') as fd:
+                shard_header = fd.readline()
+                if shard_header.strip() == '':  # empty table
+                    continue
+                if header is None:
+                    header = shard_header
+                    out.write(header)
+                elif shard_header != header:
+                    raise ValueError(f"columns of {shard} differ from the other shards")
+                shutil.copyfileobj(fd, out)
+        if header is None:
+            out.write('\n')
+
+
+def merge_parquet(shards: list, path: Path):
+    table_writer.require_pyarrow()
+    pq = table_writer.pyarrow.parquet
+    writer = None
+    for shard in shards:
+        shard_file = pq.ParquetFile(shard)
+        if not shard_file.schema_arrow.names:  # empty table
+            continue
+        if writer is None:
+            writer = pq.ParquetWriter(path, shard_file.schema_arrow, compression=table_writer.PARQUET_COMPRESSION, use_dictionary=True)
+        for group in range(shard_file.num_row_groups):
+            writer.write_table(shard_file.read_row_group(group))  # keeps the row groups of the shards
+    if writer is None:
+        pq.write_table(table_writer.pyarrow.table({}), path, compression=table_writer.PARQUET_COMPRESSION)
+    else:
+        writer.close()
+
+
+def merge_features(shards: list, path: Path):
+    store = feature_matrix.FeatureStore(path)
+    for shard in shards:
+        store.extend(feature_matrix.FeatureStore(shard))
+    store.save()
+
+
+def merge_values(merged, value, key: str = None):
+    """
+    :param key: name of the value in the stats
+    :raise ValueError: for lists, which have no generic merge
+    """
+    if isinstance(value, dict):
+        merged = dict(merged or {})
+        for item_key, item in value.items():
+            merged[item_key] = merge_values(merged.get(item_key), item, item_key)
+        return merged
+    if isinstance(value, list):
+        raise ValueError(f"no rule to merge the list in stats: {key}")
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        if key in MAX_STATS:
+            return value if merged is None else max(merged, value)
+        return round((merged or 0) + value, 6) if isinstance(value, float) else (merged or 0) + value
+    if merged is None or merged == value:
+        return value
+    return ','.join(sorted(set(str(merged).split(',')) | {str(value)}))  # e.g. different json backends on the nodes
+
+
+def merge_stats(shard_stats: list) -> dict:
+    """
+    sums up counters, duplicate ratios are weighted by the number of rows of the shards, profiles are combined by
+    profiling.merge_stats, vocabulary sizes of shared columns are left out
+    """
+    merged = {}
+    for stats in shard_stats:
+        stats = {key: value for key, value in stats.items() if key not in ('duplicates', 'profile')}
+        for key, names in OVERLAPPING_STATS.items():
+            if key in stats:
+                stats[key] = {name: value for name, value in stats[key].items() if name not in names}
+        merged = merge_values(merged, stats)
+    profiles = [stats['profile'] for stats in shard_stats if 'profile' in stats]
+    if profiles:
+        merged['profile'] = profiling.merge_stats(profiles)
+    duplicates = {}
+    for table in {table for stats in shard_stats for table in stats.get('duplicates', {})}:
+        rows = [(stats['duplicates'].get(table, 0.0), stats.get('rows', {}).get(table, 1)) for stats in shard_stats if 'duplicates' in stats]
+        total = sum(count for _, count in rows)
+        duplicates[table] = sum(ratio * count for ratio, count in rows) / total if total else 0.0
+    if duplicates:
+        merged['duplicates'] = duplicates
+    return merged
+
+
+def merge(path: Path):
+    shards = find_shards(path)
+    if path.suffix == '.json':
+        shard_stats = []
+        for shard in shards:
+            with shard.open() as fd:
+                shard_stats.append(json.load(fd))
+        with path.open('w') as fd:
+            json.dump(merge_stats(shard_stats), fd)
+    elif shards[0].is_dir():  # feature store (extract_corpus.py --features)
+        merge_features(shards, path)
+    elif path.stem == string_dictionary.DICTIONARY_TABLE:  # shards share strings, their dictionaries overlap
+        table_writer.save_table(string_dictionary.merge_dictionaries(shards), path)
+    elif path.suffix == '.npz':
+        transition_graph.save_graph(transition_graph.concat_graphs([transition_graph.load_graph(shard) for shard in shards]), path)
+    elif table_writer.is_parquet(path):
+        merge_parquet(shards, path)
+    else:
+        merge_csv(shards, path)
+    print(f"{path}: merged {len(shards)} shards")
+
+
+def sharded_outputs(folder: Path) -> list:
+    """
+    :return: output paths of all sharded files and feature stores in a folder
+    """
+    outputs = set()
+    for candidate in folder.iterdir():
+        suffix = '' if candidate.is_dir() else candidate.suffix  # the shard suffix of a folder is its last suffix
+        match = SHARD_PATTERN.match(candidate.name[:len(candidate.name) - len(suffix)])
+        if match:
+            outputs.add(folder / f"{match['stem']}{suffix}")
+    return sorted(outputs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('outputs', nargs='*', help="output paths as given to the sharded runs, e.g. widgets.csv stats.json")
+    parser.add_argument('-d', '--dir', help="merge all sharded outputs in this folder")
+    args = parser.parse_args()
+    outputs = [Path(output) for output in args.outputs]
+    if args.dir:
+        outputs.extend(sharded_outputs(Path(args.dir)))
+    if not outputs:
+        parser.error("give output paths or --dir")
+    for output in outputs:
+        merge(output)
@@ -1,44 +1,66 @@
 import argparse
 import contextlib
 import json
-import os
 import traceback
 from collections import defaultdict, Counter
 from pathlib import Path
 
 import joblib
 import pandas as pd
-from joblib import Parallel, delayed
-from tqdm import tqdm
 
+import driver
+import json_backend
+import profiling
+import result_source
+import sharding
+from driver import ParseOptions, RunOptions
 from frontmatter_parser import FrontmatterUiParser
+from table_writer import open_writer, pack_rows, save_table
 
 
-def process_file(ui_file_path, api_file_path: Path, with_api, sensitive_only, force=False):
+def process_file(ui_file_path, api_file_path: Path, options: ParseOptions, head=None):
+    """
+    :param options: with_api, sensitive_only, force, streaming, max_alternatives, packed and profile are used
+    :param head: cached error marker/meta block of the ui file, rejected apps are not read at all
+    :return: rows and stats of the app, with options.profile together with the profile report of the app
+    """
     l_platform_stats = defaultdict(int)
     l_lang_stats = defaultdict(int)
     l_error_stats = defaultdict(int)
+    l_truncated_stats = defaultdict(int)
     widgets_api_data = []
+    app_profile = profiling.AppProfile() if options.profile else profiling.NULL_PROFILE
     try:
-        frontmatter = FrontmatterUiParser(ui_file_path)
-        frontmatter.read_ui(force)
-        widgets_ui_data = frontmatter.get_widget_ui_data(True)
-        if widgets_ui_data and with_api:
+        frontmatter = FrontmatterUiParser(ui_file_path, max_alternatives=options.max_alternatives, profile=app_profile)
+        frontmatter.read_ui(options.force, options.streaming, head)
+        head = frontmatter.head
+        with app_profile.phase('rows.ui'):
+            widgets_ui_data = frontmatter.get_widget_ui_data(True)
+        if widgets_ui_data and options.with_api:
             if api_file_path.exists():
-                frontmatter.read_api(api_file_path, sensitive_only)
-                widgets_api_data = frontmatter.get_widget_api_data(True)
+                frontmatter.read_api(api_file_path, options.sensitive_only, options.streaming)
+                with app_profile.phase('rows.api'):
+                    widgets_api_data = frontmatter.get_widget_api_data(True)
         if frontmatter.ui_error != '':
             l_error_stats[frontmatter.ui_error] += 1
         if frontmatter.apk_platform != '':
             l_platform_stats[frontmatter.apk_platform] += 1
         l_lang_stats[frontmatter.lang] += 1
+        if frontmatter.truncated_alternatives:
+            l_truncated_stats[frontmatter.pkg] = frontmatter.truncated_alternatives
         del frontmatter
     except Exception as err:
         print(ui_file_path)
-        traceback.print_last()
+        traceback.print_exc()
         widgets_ui_data = []
         # raise err
-    return widgets_ui_data, widgets_api_data, l_error_stats, l_platform_stats, l_lang_stats
+    if options.packed:
+        with app_profile.phase('pack'):
+            widgets_ui_data, widgets_api_data = pack_rows(widgets_ui_data), pack_rows(widgets_api_data)
+    result = widgets_ui_data, widgets_api_data, l_error_stats, l_platform_stats, l_lang_stats, l_truncated_stats, head
+    if options.profile:
+        return result, app_profile.report(FrontmatterUiParser.get_pkg_name(ui_file_path))
+    return result
 
 
 @contextlib.contextmanager
@@ -63,56 +85,54 @@ def tqdm_joblib(tqdm_object):
         tqdm_object.close()
 
 
-def read_data_parallel(ui_path: Path, api_path: Path, with_api, sensitive_only):
-    n_jobs = max(1, os.cpu_count() - 1)
-    file_paths = [(data_file, api_path / data_file.name) for data_file in ui_path.iterdir() if data_file.suffix.endswith('json')]
-    if with_api:
-        file_paths = list(filter(lambda x: x[1].exists(), file_paths))
-    results = Parallel(n_jobs=n_jobs)(delayed(process_file)(data_file, api_file, with_api, sensitive_only) for data_file, api_file in tqdm(file_paths))
-    return results
-
+def write_app(writers, table, rows):
+    if table in writers:
+        writers[table].write_app(rows)
 
-def read_data_sequential(ui_path: Path, api_path: Path, with_api, sensitive_only):
-    results = []
-    for data_file in tqdm(ui_path.iterdir()):
-        if not data_file.suffix.endswith('json'):
-            continue
-        file_path = data_file
-        api_file_path = api_path / data_file.name
-        if with_api and not api_file_path.exists():
-            continue
-        res = process_file(file_path, api_file_path, with_api, sensitive_only)
-        results.append(res)
-    return results
 
-
-def read_data(ui_path: Path, api_path: Path, with_api, sensitive_only, parallel):
+def read_data(ui_path: Path, api_path: Path, options: ParseOptions, run: RunOptions = RunOptions()):
+    """
+    :param run: with writers, a TableWriter per table ('ui', 'api') to write rows incrementally instead of returning
+        DataFrames, rows of tables without a writer are dropped
+    """
     ui_corpus = []
     api_corpus = []
     c_error_stats = Counter()
     c_platform_stats = Counter()
     c_lang_stats = Counter()
-    results = read_data_parallel(ui_path, api_path, with_api, sensitive_only) if parallel else read_data_sequential(ui_path, api_path, with_api, sensitive_only)
+    truncated_stats = {}  # pkg -> number of dropped label combinations
+    writers = run.writers
+    options = options._replace(packed=writers is not None, profile=run.profiler is not None)
+    results = driver.app_results(result_source.list_pairs(ui_path, api_path, options.with_api), process_file, options, run, options.with_api)
     for res in results:
-        app_data, api_data, l_error_stats, l_platform_stats, l_lang_stats = res
-        if app_data:  # if with_api collect only apps with api results
+        app_data, api_data, l_error_stats, l_platform_stats, l_lang_stats, l_truncated_stats, _ = res
+        if app_data and writers is not None:
+            write_app(writers, 'ui', app_data)
+            write_app(writers, 'api', api_data)
+        elif app_data:  # if with_api collect only apps with api results
             ui_corpus.extend(app_data)
             api_corpus.extend(api_data)
         c_error_stats = c_error_stats + Counter(l_error_stats)
         c_platform_stats = c_platform_stats + Counter(l_platform_stats)
         c_lang_stats = c_lang_stats + Counter(l_lang_stats)
+        truncated_stats.update(l_truncated_stats)
     error_stats = dict(c_error_stats)
     platform_stats = dict(c_platform_stats)
     lang_stats = dict(c_lang_stats)
     # if 'unknown' in lang_stats:
     #     del lang_stats['unknown']
-    stats = {'errors': error_stats, 'platform': platform_stats, 'lang': lang_stats}
+    stats = {'errors': error_stats, 'platform': platform_stats, 'lang': lang_stats, 'json_backend': json_backend.get_backend(), 'truncated': truncated_stats}
+    stats.update(driver.run_stats(run))
     return pd.DataFrame(ui_corpus), pd.DataFrame(api_corpus), stats
 
 
 def save_data(corpus, path):
-    corpus = corpus.drop_duplicates()
-    corpus.to_csv(path, index=False)
+    """
+    :return: ratio of dropped duplicate rows
+    """
+    unique_corpus = corpus.drop_duplicates()
+    save_table(unique_corpus, path)
+    return (len(corpus) - len(unique_corpus)) / len(corpus) if len(corpus) else 0.0
 
 
 def save_stats(stats_file):
@@ -122,20 +142,36 @@ def save_stats(stats_file):
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument('-d', '--data-dir', help="folder with json ui analysis results")
-    parser.add_argument('-a', '--api-dir', help="folder with json api analysis results")
-    parser.add_argument('--ui', help="output csv file for extracted widgets")
-    parser.add_argument('--api', help="output csv file for activity apis")
-    parser.add_argument('-p', '--parallel', default=False, action='store_true', help="use parallel processing")
-    parser.add_argument('-s', '--stats-file', help="output csv file for stats")
-    parser.add_argument('--sensitive_only', default=False, action='store_true', help="collect only sensitive APIs")
+    parser.add_argument('-d', '--data-dir', help="folder or archive (.tar, .tar.gz, .tar.zst, .zip) with json ui analysis results, optionally .gz/.zst compressed")
+    parser.add_argument('-a', '--api-dir', help="folder or archive with json api analysis results")
+    parser.add_argument('--ui', help="output csv (or .parquet) file for extracted widgets")
+    parser.add_argument('--api', help="output csv (or .parquet) file for activity apis")
+    parser.add_argument('-s', '--stats-file', help="output json file for stats")
     parser.add_argument('--with-api', default=False, action='store_true')
+    driver.add_arguments(parser)
     args = parser.parse_args()
+    print(f"json backend: {json_backend.get_backend()}")
     data_dir = Path(args.data_dir)
     api_dir = Path(args.api_dir)
-
-    ui_df, api_df, stats = read_data(data_dir, api_dir, args.with_api, args.sensitive_only, args.parallel)
-    save_data(ui_df, args.ui)
-    if args.api:
-        save_data(api_df, args.api)
+    if args.shard:
+        args.ui, args.api, args.stats_file = (sharding.shard_path(path, args.shard) for path in (args.ui, args.api, args.stats_file))
+    options = driver.parse_options(args)
+    run = driver.run_options(args, driver.cache_options('widgets', options))
+
+    if args.stream_output:
+        outputs = {'ui': args.ui, 'api': args.api}
+        with contextlib.ExitStack() as stack:
+            writers = {table: stack.enter_context(open_writer(path, dedup=driver.deduplicator(args))) for table, path in outputs.items() if path}
+            _, _, stats = read_data(data_dir, api_dir, options, run._replace(writers=writers))
+        stats['duplicates'] = {table: writer.dedup.duplicate_ratio for table, writer in writers.items()}
+        stats['rows'] = {table: writer.dedup.total for table, writer in writers.items()}
+    else:
+        ui_df, api_df, stats = read_data(data_dir, api_dir, options, run)
+        stats['duplicates'] = {'ui': save_data(ui_df, args.ui)}
+        stats['rows'] = {'ui': len(ui_df)}
+        if args.api:
+            stats['duplicates']['api'] = save_data(api_df, args.api)
+            stats['rows']['api'] = len(api_df)
     save_stats(args.stats_file)
+    if run.head_cache:
+        run.head_cache.save()
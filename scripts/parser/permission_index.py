@@ -0,0 +1,91 @@
+"""
+Index of sensitive APIs (api signature -> permission) and system broadcast actions
+The index is compiled from permission_mapping/ and actions.list into a pickle next to them and recompiled when any text source changes
+get_index() loads it once per process: joblib's loky workers are spawned, not forked, so every worker unpickles its
+own copy on its first app (the drivers compile the file before starting them, so the workers never recompile it)
+"""
+import os
+import pickle
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+INDEX_FILE = 'permission_index.pickle'
+FORMAT_VERSION = 1
+
+
+class PermissionIndex:
+    def __init__(self, sensitive_perms: dict, actions: frozenset, sources: dict):
+        self.sensitive_perms = sensitive_perms  # api -> android.permission.X
+        self.actions = actions
+        self.sources = sources  # source file name -> (size, mtime), used for the staleness check
+
+    @staticmethod
+    def source_files(base_dir: Path) -> list:
+        perm_files = sorted((base_dir / 'permission_mapping').iterdir())
+        return perm_files + [base_dir / 'actions.list']
+
+    @classmethod
+    def fingerprint(cls, base_dir: Path) -> dict:
+        sources = {}
+        for path in cls.source_files(base_dir):
+            stat = path.stat()
+            sources[str(path.relative_to(base_dir))] = (stat.st_size, stat.st_mtime_ns)
+        return sources
+
+    @staticmethod
+    def load_permission_list(perm_file: Path):
+        with perm_file.open() as fd:
+            apis = [api.strip() for api in fd.readlines() if not api.startswith("#")]
+        return apis
+
+    @staticmethod
+    def load_actions(actions_file: Path) -> frozenset:
+        with actions_file.open() as fd:
+            actions = frozenset(line.strip() for line in fd.readlines() if not line.startswith("#"))
+        return actions
+
+    @classmethod
+    def compile(cls, base_dir: Path = BASE_DIR):
+        sensitive_perms = {}
+        for perm_file in sorted((base_dir / 'permission_mapping').iterdir()):
+            perm_name = f"android.permission.{perm_file.stem}"
+            for api in cls.load_permission_list(perm_file):
+                sensitive_perms[api] = perm_name
+        actions = cls.load_actions(base_dir / 'actions.list')
+        return cls(sensitive_perms, actions, cls.fingerprint(base_dir))
+
+    def save(self, path: Path):
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with tmp_path.open('wb') as fd:
+            pickle.dump((FORMAT_VERSION, self.sensitive_perms, self.actions, self.sources), fd, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)  # atomic, concurrent compilations don't corrupt the file
+
+    @classmethod
+    def load(cls, base_dir: Path = BASE_DIR, index_path: Path = None):
+        """
+        load the compiled index, recompile it if it is missing, corrupted or older than the text sources
+        """
+        index_path = index_path or base_dir / INDEX_FILE
+        try:
+            with index_path.open('rb') as fd:
+                version, sensitive_perms, actions, sources = pickle.load(fd)
+            if version == FORMAT_VERSION and sources == cls.fingerprint(base_dir):
+                return cls(sensitive_perms, actions, sources)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            pass
+        index = cls.compile(base_dir)
+        try:
+            index.save(index_path)
+        except OSError:
+            pass  # read-only location, use the index without caching it
+        return index
+
+
+_index = None
+
+
+def get_index() -> PermissionIndex:
+    global _index
+    if _index is None:
+        _index = PermissionIndex.load()
+    return _index
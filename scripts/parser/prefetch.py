@@ -0,0 +1,117 @@
+"""
+Read-ahead of result files: a thread pool reads the bytes of the next apps while the workers parse the current ones,
+so that the workers do not block on open()/read() of slow (network) storage
+At most `depth` apps are read ahead, and the read apps hold about `budget` bytes until their results are back
+With parallel processing the read bytes are pickled into the tasks and cross the IPC to the loky workers, the workers
+do not open the files again
+Members of compressed tarballs (.tar.gz, .tar.zst) can only be read by one sequential cursor, they are read by a single
+thread in the order of the apps, i.e. in member order for the ui results
+Apps known to be rejected (by a cached head, see result_head) are passed on unread
+"""
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import result_source
+
+PREFETCH_BUDGET = 256 * 1024 * 1024
+MAX_THREADS = 16
+
+
+class Prefetcher:
+    def __init__(self, depth: int, budget: int = PREFETCH_BUDGET, threads: int = None):
+        """
+        :param depth: number of apps read ahead
+        :param budget: bytes held by read but not yet parsed apps, reading ahead pauses above it
+        :param threads: parallel reads, defaults to depth (at most MAX_THREADS)
+        """
+        self.depth = max(1, depth)
+        self.budget = budget
+        self.threads = threads or min(self.depth, MAX_THREADS)
+        self.lock = threading.Lock()
+        self.held = 0
+        self.dispatched = deque()  # bytes of the apps handed to the parse stage whose results are not back yet
+        self.files = 0
+        self.bytes = 0
+        self.read_time = 0.0  # summed over the reading threads
+        self.wait_time = 0.0  # parse stage blocked on reads
+        self.stage_time = 0.0  # wall time of the parse stage between two apps
+
+    def read(self, path):
+        """
+        :return: Prefetched bytes of the file, the path itself if it cannot be read (the parser reports the error)
+        """
+        start = time.perf_counter()
+        try:
+            with result_source.open_stored(path) as fd:
+                data = fd.read()
+        except OSError:
+            return path
+        with self.lock:
+            self.read_time += time.perf_counter() - start
+            self.held += len(data)
+            self.files += 1
+            self.bytes += len(data)
+        return result_source.Prefetched(path, data)
+
+    def finished(self):
+        """
+        releases the bytes of the oldest dispatched app, called when its result is back
+        """
+        with self.lock:
+            if self.dispatched:
+                self.held -= self.dispatched.popleft()
+
+    def iterate(self, file_paths: list, with_api: bool, skipped: list = None):
+        """
+        yields (ui file, api file) of file_paths in order with their bytes read ahead
+        :param with_api: read ahead the api files too
+        :param skipped: flag per app, flagged apps are yielded as given without reading them
+        """
+        sequential = bool(file_paths) and any(result_source.is_sequential(path) for path in file_paths[0])
+        file_paths = zip(file_paths, skipped or itertools.repeat(False))
+        pending = deque()
+        with ThreadPoolExecutor(1 if sequential else self.threads, thread_name_prefix='prefetch') as pool:
+
+            def fill():
+                while len(pending) < self.depth and (not pending or self.held < self.budget):  # one app is read ahead in any case
+                    paths, skip = next(file_paths, (None, False))
+                    if paths is None:
+                        return
+                    ui_file, api_file = paths
+                    if skip:
+                        pending.append(paths)
+                    else:
+                        pending.append((pool.submit(self.read, ui_file), pool.submit(self.read, api_file) if with_api else api_file))
+
+            fill()
+            while pending:
+                wait_start = time.perf_counter()
+                ui_file, api_file = (item.result() if isinstance(item, Future) else item for item in pending.popleft())
+                self.wait_time += time.perf_counter() - wait_start
+                with self.lock:
+                    self.dispatched.append(sum(len(file.data) for file in (ui_file, api_file) if isinstance(file, result_source.Prefetched)))
+                fill()
+                yielded = time.perf_counter()
+                yield ui_file, api_file
+                self.stage_time += time.perf_counter() - yielded
+
+    def stats(self) -> dict:
+        """
+        io_wait: seconds the parse stage waited for reads, stage_wall: wall clock seconds it was working (parsing or
+        dispatching to workers), not CPU time
+        """
+        return {'depth': self.depth, 'files': self.files, 'bytes': self.bytes, 'read_seconds': round(self.read_time, 3),
+                'io_wait_seconds': round(self.wait_time, 3), 'stage_wall_seconds': round(self.stage_time, 3)}
+
+
+def prefetched(file_paths: list, prefetcher: Prefetcher, with_api: bool, skipped: list = None):
+    """
+    :param skipped: flag per app, flagged apps are not read ahead
+    :return: iterator over (ui file, api file), read ahead if a prefetcher is given
+    """
+    if prefetcher is None:
+        return iter(file_paths)
+    return prefetcher.iterate(file_paths, with_api, skipped)
@@ -0,0 +1,138 @@
+"""
+Opt-in per-phase profiling of the parser: every app gets an AppProfile collecting the seconds spent per phase
+(decode, platform detection, activities, transitions, api, row extraction) and counters, the Profiler aggregates them
+into percentiles per phase and the slowest apps for the stats file
+Disabled profiling uses NULL_PROFILE, whose timers are a shared no-op context manager
+In streaming mode decoding is interleaved with parsing and accounted to the ui_stream/api_stream phases
+"""
+import contextlib
+import heapq
+import time
+from array import array
+from collections import Counter, defaultdict
+
+TOP_APPS = 20
+
+
+class PhaseTimer:
+    __slots__ = ('phases', 'name', 'start')
+
+    def __init__(self, phases: dict, name: str):
+        self.phases = phases
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.phases[self.name] += time.perf_counter() - self.start
+
+
+class AppProfile:
+    def __init__(self):
+        self.created = time.perf_counter()
+        self.phases = defaultdict(float)
+        self.counters = defaultdict(int)
+
+    def phase(self, name: str) -> PhaseTimer:
+        """
+        context manager adding the time spent in its block to the phase, phases may be entered repeatedly
+        """
+        return PhaseTimer(self.phases, name)
+
+    def count(self, name: str, value: int = 1):
+        self.counters[name] += value
+
+    def report(self, pkg: str) -> dict:
+        """
+        :return: picklable summary of the app, the 'total' phase covers everything since the profile was created
+        """
+        phases = dict(self.phases)
+        phases['total'] = time.perf_counter() - self.created
+        return {'pkg': pkg, 'phases': phases, 'counters': dict(self.counters)}
+
+
+class NullProfile:
+    _timer = contextlib.nullcontext()
+
+    def phase(self, name: str):
+        return self._timer
+
+    def count(self, name: str, value: int = 1):
+        pass
+
+    def report(self, pkg: str):
+        return None
+
+
+NULL_PROFILE = NullProfile()
+
+
+def percentile(values: list, q: float) -> float:
+    """
+    :param values: sorted values
+    """
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class Profiler:
+    """
+    aggregates the reports of the parsed apps
+    """
+
+    def __init__(self, top: int = TOP_APPS):
+        self.top = top
+        self.apps = 0
+        self.durations = defaultdict(lambda: array('d'))  # phase -> seconds per app
+        self.counters = Counter()
+        self.slowest = []  # min-heap of (total seconds, pkg, phases)
+
+    def add(self, result, report: dict):
+        """
+        records the report of an app
+        :return: result, the profile is stripped off before the result is cached
+        """
+        if report is None:
+            return result
+        self.apps += 1
+        for phase, seconds in report['phases'].items():
+            self.durations[phase].append(seconds)
+        self.counters.update(report['counters'])
+        entry = (report['phases']['total'], report['pkg'], report['phases'])
+        if len(self.slowest) < self.top:
+            heapq.heappush(self.slowest, entry)
+        elif entry[0] > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, entry)
+        return result
+
+    def stats(self) -> dict:
+        phases = {}
+        for phase, durations in sorted(self.durations.items()):
+            values = sorted(durations)
+            phases[phase] = {'apps': len(values), 'seconds': round(sum(values), 6), 'p50': round(percentile(values, 0.5), 6),
+                             'p95': round(percentile(values, 0.95), 6), 'max': round(values[-1], 6)}
+        slowest = [{'pkg': pkg, 'seconds': round(total, 6), 'phases': {phase: round(seconds, 6) for phase, seconds in phases_of_app.items()}}
+                   for total, pkg, phases_of_app in sorted(self.slowest, reverse=True)]
+        return {'apps': self.apps, 'phases': phases, 'counters': dict(self.counters), 'slowest': slowest, 'top': self.top}
+
+
+def merge_stats(profiles: list) -> dict:
+    """
+    combines the stats() of profilers of disjoint sets of apps (e.g. of shards)
+    percentiles of the union cannot be derived from the percentiles of the parts and are left out
+    """
+    phases = {}
+    counters = Counter()
+    slowest = []
+    for profile in profiles:
+        for phase, stats in profile['phases'].items():
+            merged = phases.setdefault(phase, {'apps': 0, 'seconds': 0.0, 'max': 0.0})
+            merged['apps'] += stats['apps']
+            merged['seconds'] = round(merged['seconds'] + stats['seconds'], 6)
+            merged['max'] = max(merged['max'], stats['max'])
+        counters.update(profile['counters'])
+        slowest.extend(profile['slowest'])
+    top = max(profile.get('top', len(profile['slowest'])) for profile in profiles)
+    slowest = sorted(slowest, key=lambda app: (app['seconds'], app['pkg']), reverse=True)[:top]
+    return {'apps': sum(profile['apps'] for profile in profiles), 'phases': dict(sorted(phases.items())), 'counters': dict(counters),
+            'slowest': slowest, 'top': top}
@@ -0,0 +1,227 @@
+"""
+Reachability index of the transition graphs of a corpus (a --graph-npz file of extract_corpus.py)
+All apps are processed in one batched pass over the block diagonal adjacency matrix of the corpus: strongly connected
+components (scipy.sparse.csgraph), BFS depth from the entry activities as level-synchronous sparse matrix-vector steps,
+and dead-end screens (no transition to another activity)
+The results do not record the launcher activities, entries are the activities of source components of the condensation
+(no transition into them from other components) unless a launcher table (pkg, activity) is given for the app
+The index is saved as .npz together with the adjacency arrays and queried per app by ReachabilityIndex without recomputation
+"""
+import argparse
+from collections import defaultdict, deque
+
+import numpy as np
+import pandas as pd
+
+import transition_graph
+from table_writer import read_table, save_table
+
+try:
+    import scipy.sparse
+    import scipy.sparse.csgraph
+except ImportError:  # reachability requires scipy
+    scipy = None
+
+
+def require_scipy():
+    if scipy is None:
+        raise RuntimeError("reachability requires scipy, install it with: pip install scipy")
+
+
+def adjacency(graph: dict):
+    """
+    :return: sparse matrix of the corpus graph, entry (src, dest) for every transition
+    """
+    nodes = len(graph['activities'])
+    return scipy.sparse.csr_matrix((np.ones(len(graph['indices']), dtype=np.int8), graph['indices'], graph['indptr']), shape=(nodes, nodes))
+
+
+def edge_sources(graph: dict) -> np.ndarray:
+    return np.repeat(np.arange(len(graph['activities']), dtype=np.int32), np.diff(graph['indptr']))
+
+
+def entry_nodes(graph: dict, scc: np.ndarray, launchers: dict = None) -> np.ndarray:
+    """
+    :param scc: component label per node
+    :param launchers: pkg -> set of launcher activities, apps without launchers fall back to the source components
+    :return: boolean entry flag per node
+    """
+    src = edge_sources(graph)
+    dest = graph['indices']
+    has_incoming = np.zeros(scc.max() + 1 if len(scc) else 0, dtype=bool)
+    has_incoming[scc[dest[scc[src] != scc[dest]]]] = True
+    entries = ~has_incoming[scc]
+    for index, pkg in enumerate(graph['pkgs']):
+        if launchers and pkg in launchers:
+            first, end = graph['app_ptr'][index], graph['app_ptr'][index + 1]
+            entries[first:end] = np.isin(graph['activities'][first:end], list(launchers[pkg]))
+    return entries
+
+
+def bfs_depth(matrix, entries: np.ndarray) -> np.ndarray:
+    """
+    multi-source BFS of all apps at once, one sparse matrix-vector product per level
+    :return: minimum number of transitions from an entry per node, -1 if unreachable
+    """
+    depth = np.where(entries, 0, -1).astype(np.int32)
+    transposed = matrix.T.tocsr()
+    frontier = entries
+    level = 0
+    while frontier.any():
+        level += 1
+        frontier = (transposed @ frontier.astype(np.int32) > 0) & (depth < 0)
+        depth[frontier] = level
+    return depth
+
+
+def per_app(reduce, values: np.ndarray, app_ptr: np.ndarray, empty) -> np.ndarray:
+    """
+    reduce (numpy ufunc) of the node values of every app, `empty` for apps without nodes
+    """
+    result = np.full(len(app_ptr) - 1, empty, dtype=values.dtype)
+    sizes = np.diff(app_ptr)
+    if len(values):
+        starts = app_ptr[:-1][sizes > 0]
+        result[sizes > 0] = reduce.reduceat(values, starts)
+    return result
+
+
+def build_index(graph: dict, launchers: dict = None) -> dict:
+    """
+    :param graph: corpus graph arrays (transition_graph.load_graph)
+    :param launchers: pkg -> launcher activities, optional
+    :return: index arrays: the graph arrays plus per node scc (component label, app-local), entry, depth and dead_end,
+        per app reachable, max_depth, sccs, dead_ends
+    """
+    require_scipy()
+    matrix = adjacency(graph)
+    _, scc = scipy.sparse.csgraph.connected_components(matrix, directed=True, connection='strong')  # never crosses apps
+    scc = scc.astype(np.int32)
+    entries = entry_nodes(graph, scc, launchers)
+    depth = bfs_depth(matrix, entries)
+    src = edge_sources(graph)
+    leaving = src != graph['indices']
+    dead_end = np.bincount(src[leaving], minlength=len(scc)) == 0
+    app_ptr = graph['app_ptr']
+    app_of_node = np.repeat(np.arange(len(app_ptr) - 1), np.diff(app_ptr))
+    # renumber components per app in order of their first node
+    first_of_scc = np.full(scc.max() + 1 if len(scc) else 0, len(scc), dtype=np.int64)
+    np.minimum.at(first_of_scc, scc, np.arange(len(scc)))
+    scc_order = np.argsort(first_of_scc, kind='stable')
+    rank = np.empty_like(scc_order)
+    rank[scc_order] = np.arange(len(scc_order))
+    global_scc = rank[scc]
+    sccs = np.bincount(app_of_node[first_of_scc[scc_order]], minlength=len(app_ptr) - 1) if len(scc) else np.zeros(len(app_ptr) - 1, dtype=np.int64)
+    scc_offsets = np.concatenate([[0], np.cumsum(sccs)])
+    index = dict(graph)
+    index.update({
+        'scc': (global_scc - scc_offsets[app_of_node]).astype(np.int32),
+        'entry': entries,
+        'depth': depth,
+        'dead_end': dead_end,
+        'reachable': per_app(np.add, (depth >= 0).astype(np.int32), app_ptr, 0),
+        'max_depth': per_app(np.maximum, depth, app_ptr, -1),
+        'sccs': sccs.astype(np.int32),
+        'dead_ends': per_app(np.add, dead_end.astype(np.int32), app_ptr, 0),
+    })
+    return index
+
+
+class ReachabilityIndex:
+    """
+    per app queries of a saved index
+    """
+
+    def __init__(self, path):
+        self.arrays = transition_graph.load_graph(path)
+        self.apps = {pkg: index for index, pkg in enumerate(self.arrays['pkgs'].tolist())}
+        self.activities = self.arrays['activities'].tolist()
+
+    def nodes(self, pkg: str) -> range:
+        index = self.apps[pkg]
+        return range(self.arrays['app_ptr'][index], self.arrays['app_ptr'][index + 1])
+
+    def node(self, pkg: str, activity: str) -> int:
+        nodes = self.nodes(pkg)
+        matches = np.flatnonzero(self.arrays['activities'][nodes.start:nodes.stop] == activity)
+        if len(matches) == 0:
+            raise KeyError(f"{activity} is not an activity of {pkg}")
+        return nodes.start + int(matches[0])
+
+    def summary(self, pkg: str) -> dict:
+        index = self.apps[pkg]
+        nodes = self.nodes(pkg)
+        return {'pkg': pkg, 'activities': len(nodes), 'entries': int(self.arrays['entry'][nodes.start:nodes.stop].sum()),
+                'reachable': int(self.arrays['reachable'][index]), 'max_depth': int(self.arrays['max_depth'][index]),
+                'sccs': int(self.arrays['sccs'][index]), 'dead_ends': int(self.arrays['dead_ends'][index])}
+
+    def depth(self, pkg: str, activity: str) -> int:
+        """
+        :return: minimum number of transitions from an entry activity, -1 if unreachable
+        """
+        return int(self.arrays['depth'][self.node(pkg, activity)])
+
+    def entries(self, pkg: str) -> list:
+        return [self.activities[node] for node in self.nodes(pkg) if self.arrays['entry'][node]]
+
+    def dead_ends(self, pkg: str) -> list:
+        return [self.activities[node] for node in self.nodes(pkg) if self.arrays['dead_end'][node]]
+
+    def components(self, pkg: str) -> list:
+        """
+        :return: activity lists of the strongly connected components of the app
+        """
+        components = defaultdict(list)
+        for node in self.nodes(pkg):
+            components[self.arrays['scc'][node]].append(self.activities[node])
+        return [components[scc] for scc in sorted(components)]
+
+    def reachable(self, pkg: str, activity: str = None) -> list:
+        """
+        :param activity: start activity, None for the entry activities (answered from the index)
+        :return: activities reachable from the start (including it)
+        """
+        if activity is None:
+            return [self.activities[node] for node in self.nodes(pkg) if self.arrays['depth'][node] >= 0]
+        indptr, indices = self.arrays['indptr'], self.arrays['indices']
+        start = self.node(pkg, activity)
+        seen = {start}
+        queue = deque([start])
+        while queue:
+            node = queue.popleft()
+            for dest in indices[indptr[node]:indptr[node + 1]]:
+                if dest not in seen:
+                    seen.add(dest)
+                    queue.append(dest)
+        return [self.activities[node] for node in sorted(seen)]
+
+
+def node_table(index: dict) -> pd.DataFrame:
+    app_ptr = index['app_ptr']
+    return pd.DataFrame({'pkg': np.repeat(index['pkgs'], np.diff(app_ptr)), 'activity': index['activities'], 'entry': index['entry'],
+                         'depth': index['depth'], 'scc': index['scc'], 'dead_end': index['dead_end']})
+
+
+def read_launchers(path) -> dict:
+    """
+    :param path: table with pkg and activity columns
+    """
+    launchers = defaultdict(set)
+    for pkg, activity in read_table(path, columns=['pkg', 'activity']).itertuples(index=False):
+        launchers[pkg].add(activity)
+    return launchers
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('graph', help="corpus transition graph (.npz written by extract_corpus.py --graph-npz)")
+    parser.add_argument('-o', '--output-file', required=True, help="reachability index (.npz)")
+    parser.add_argument('--launchers', help="table (csv/parquet) with pkg and activity columns of the launcher activities, source components are used for other apps")
+    parser.add_argument('--table', help="also write depth, scc, entry and dead-end flag of every activity as a table")
+    args = parser.parse_args()
+    reachability_index = build_index(transition_graph.load_graph(args.graph), read_launchers(args.launchers) if args.launchers else None)
+    transition_graph.save_graph(reachability_index, args.output_file)
+    if args.table:
+        save_table(node_table(reachability_index), args.table)
+    print(f"{len(reachability_index['pkgs'])} apps, {len(reachability_index['activities'])} activities, "
+          f"{int(reachability_index['reachable'].sum())} reachable from the entries")
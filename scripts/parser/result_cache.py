@@ -0,0 +1,103 @@
+"""
+Per-app cache of extraction results for incremental reruns
+A result is stored under a key derived from the parser version, the extraction options, the sources of the permission
+index and the ui/api result files, identified by size and mtime or, with content_hash, by a hash of their bytes; changed
+files get a new key and are parsed again
+"""
+import hashlib
+import os
+import pickle
+from pathlib import Path
+
+import permission_index
+import result_source
+from frontmatter_parser import PARSER_VERSION
+
+HASH_CHUNK = 1024 * 1024
+
+
+def file_digest(path: Path) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with result_source.open_stored(path) as fd:
+        for chunk in iter(lambda: fd.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    def __init__(self, path: Path, options: dict, content_hash: bool = False):
+        """
+        :param options: everything besides the input files that changes the result, e.g. driver name and flags
+        :param content_hash: identify files by their content instead of size and mtime
+        """
+        self.path = Path(path)
+        self.content_hash = content_hash
+        mapping = sorted(permission_index.get_index().sources.items())  # an edited permission mapping changes the api rows
+        self.prefix = repr((PARSER_VERSION, sorted(options.items()), mapping))
+        self.hits = 0
+        self.misses = 0
+
+    def file_id(self, path: Path):
+        try:
+            if self.content_hash:
+                return file_digest(path)
+            stat = path.stat()
+            return stat.st_size, stat.st_mtime_ns
+        except (FileNotFoundError, NotADirectoryError):  # no api results, also inside an archive location
+            return None
+
+    def key(self, ui_file: Path, api_file: Path = None) -> str:
+        api_id = self.file_id(api_file) if api_file is not None else None
+        identity = repr((self.prefix, ui_file.name, self.file_id(ui_file), api_id))
+        return hashlib.blake2b(identity.encode(), digest_size=16).hexdigest()
+
+    def entry_path(self, key: str) -> Path:
+        return self.path / key[:2] / f"{key}.pickle"
+
+    def contains(self, key: str) -> bool:
+        return self.entry_path(key).exists()
+
+    def get(self, key: str):
+        """
+        :return: cached result, None if there is none
+        """
+        try:
+            with self.entry_path(key).open('rb') as fd:
+                return pickle.load(fd)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def put(self, key: str, result):
+        entry_path = self.entry_path(key)
+        entry_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = entry_path.with_name(f"{entry_path.name}.{os.getpid()}.tmp")
+        with tmp_path.open('wb') as fd:
+            pickle.dump(result, fd, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, entry_path)
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+def cached_results(file_paths: list, cache: ResultCache, compute):
+    """
+    yields the results of all files in order, only files missing in the cache are computed and their results stored
+    :param file_paths: list of (ui file, api file)
+    :param compute: function taking a list of (ui file, api file) and returning an iterator over their results in order
+    """
+    if cache is None:
+        yield from compute(file_paths)
+        return
+    keys = [cache.key(ui_file, api_file) for ui_file, api_file in file_paths]
+    hits = [cache.contains(key) for key in keys]
+    computed = compute([paths for paths, hit in zip(file_paths, hits) if not hit])
+    for paths, key, hit in zip(file_paths, keys, hits):
+        result = cache.get(key) if hit else None
+        if result is not None:
+            cache.hits += 1
+            yield result
+            continue
+        result = next(computed) if not hit else next(iter(compute([paths])))  # a hit without result is an unreadable entry
+        cache.misses += 1
+        cache.put(key, result)
+        yield result
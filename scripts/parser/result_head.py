@@ -0,0 +1,93 @@
+"""
+Cheap classification of result files by their head: the error marker or the meta block, serialized before the activities
+Heads are cached per file (keyed by size and mtime), so repeated extractions skip rejected apps without opening them
+"""
+import json
+import os
+import pickle
+from pathlib import Path
+
+import result_source
+
+HEAD_SIZE = 8 * 1024
+HEAD_KEYS = {'meta', 'error'}
+
+_decoder = json.JSONDecoder()
+
+
+def skip_whitespace(text, pos):
+    while pos < len(text) and text[pos] in ' \t\n\r':
+        pos += 1
+    return pos
+
+
+def read_head(path, head_size=HEAD_SIZE):
+    """
+    decode the top-level values preceding the activities from the first `head_size` bytes
+    :return: dict with 'meta' and/or 'error', None if the head is inconclusive
+    """
+    with result_source.open_result(path) as fd:
+        head = fd.read(head_size)
+    text = head.decode('utf-8', errors='ignore')  # the cut may split a multi-byte character
+    values = {}
+    try:
+        pos = skip_whitespace(text, 0)
+        if text[pos] != '{':
+            return None
+        pos += 1
+        while True:
+            pos = skip_whitespace(text, pos)
+            if text[pos] == '}':  # the whole document fits into the head
+                return values
+            key, pos = _decoder.raw_decode(text, pos)
+            pos = skip_whitespace(text, pos)
+            if text[pos] != ':':
+                return None
+            if key not in HEAD_KEYS:
+                return values if values else None
+            value, pos = _decoder.raw_decode(text, skip_whitespace(text, pos + 1))
+            values[key] = value
+            pos = skip_whitespace(text, pos)
+            if text[pos] == ',':
+                pos += 1
+    except (ValueError, IndexError):  # truncated or malformed head
+        return None
+
+
+class HeadCache:
+    """
+    persistent map: file path -> (size, mtime, head)
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.heads = {}
+        self.changed = False
+        if path.exists():
+            with path.open('rb') as fd:
+                self.heads = pickle.load(fd)
+
+    def get(self, file: Path):
+        entry = self.heads.get(str(file))
+        if entry is None:
+            return None
+        stat = file.stat()
+        size, mtime, head = entry
+        if (size, mtime) != (stat.st_size, stat.st_mtime_ns):
+            return None
+        return head
+
+    def put(self, file: Path, head):
+        if head is None:
+            return
+        stat = file.stat()
+        self.heads[str(file)] = (stat.st_size, stat.st_mtime_ns, head)
+        self.changed = True
+
+    def save(self):
+        if not self.changed:
+            return
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with tmp_path.open('wb') as fd:
+            pickle.dump(self.heads, fd, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
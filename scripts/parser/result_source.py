@@ -0,0 +1,312 @@
+"""
+Reading of result files stored compressed (.json.gz, .json.zst) or as members of tar/zip archives, without extracting them to disk
+A results location (-d/-a) is a folder or an archive; its entries are Paths or ArchiveMembers, both are opened with open_result
+Members of .tar and .zip archives are read at random, compressed tarballs (.tar.gz, .tgz, .tar.zst) can only be read
+sequentially: every process keeps a cursor per tarball, so apps are processed fastest in archive order
+"""
+import contextlib
+import gzip
+import io
+import os
+import tarfile
+import threading
+import zipfile
+from collections import namedtuple
+from datetime import datetime
+from pathlib import Path, PurePosixPath
+
+try:
+    import zstandard
+except ImportError:  # zstd compressed results are optional
+    zstandard = None
+
+GZIP_SUFFIXES = ('.gz', '.tgz')
+ZSTD_SUFFIXES = ('.zst', '.tzst')
+COMPRESSION_SUFFIXES = ('.gz', '.zst')
+ARCHIVE_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.tar.zst', '.tzst', '.zip')
+
+MemberStat = namedtuple('MemberStat', ['st_size', 'st_mtime_ns'])
+
+
+class ArchiveMember(namedtuple('ArchiveMember', ['archive', 'member', 'size', 'mtime_ns', 'position'])):
+    """
+    result file inside an archive, stands in for a Path (name, stat(), exists())
+    position is the data offset for .tar, the member index for compressed tarballs and None for .zip
+    """
+    __slots__ = ()
+
+    @property
+    def name(self):
+        return PurePosixPath(self.member).name
+
+    def stat(self):
+        return MemberStat(self.size, self.mtime_ns)
+
+    def exists(self):
+        return True
+
+    def __str__(self):
+        return f"{self.archive}/{self.member}"
+
+
+class Prefetched(namedtuple('Prefetched', ['path', 'data'])):
+    """
+    stored bytes of a result file read ahead of parsing (see prefetch), stands in for the file
+    """
+    __slots__ = ()
+
+    @property
+    def name(self):
+        return file_name(self.path)
+
+    def exists(self):
+        return True
+
+    def __str__(self):
+        return str(self.path)
+
+
+def require_zstandard():
+    if zstandard is None:
+        raise RuntimeError("zstd compressed results require zstandard (pip install zstandard)")
+
+
+def file_name(path) -> str:
+    return path.name if isinstance(path, (ArchiveMember, Prefetched)) else os.path.basename(path)
+
+
+def strip_compression(name: str) -> str:
+    for suffix in COMPRESSION_SUFFIXES:
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def is_result_name(name: str) -> bool:
+    return PurePosixPath(strip_compression(name)).suffix.endswith('json')
+
+
+def is_archive(path) -> bool:
+    return str(path).endswith(ARCHIVE_SUFFIXES)
+
+
+def is_plain_file(path) -> bool:
+    """
+    :return: True for uncompressed files on disk, which can be memory mapped
+    """
+    return not isinstance(path, (ArchiveMember, Prefetched)) and strip_compression(str(path)) == str(path)
+
+
+def is_sequential(path) -> bool:
+    """
+    :return: True for members of compressed tarballs, which are read through one sequential TarCursor per process
+    """
+    return isinstance(path, ArchiveMember) and not path.archive.name.endswith(('.zip', '.tar'))
+
+
+def pkg_name(path) -> str:
+    return os.path.splitext(strip_compression(file_name(path)))[0]
+
+
+def decompressed(fd, name: str):
+    if name.endswith(GZIP_SUFFIXES):
+        return gzip.GzipFile(fileobj=fd, mode='rb')
+    if name.endswith(ZSTD_SUFFIXES):
+        require_zstandard()
+        return zstandard.ZstdDecompressor().stream_reader(fd, read_across_frames=True)
+    return fd
+
+
+@contextlib.contextmanager
+def open_tar_stream(path: Path):
+    with open(path, 'rb') as fd, decompressed(fd, path.name) as stream, tarfile.open(fileobj=stream, mode='r|') as archive:
+        yield archive
+
+
+def iter_tar_stream(archive: tarfile.TarFile):
+    while True:
+        info = archive.next()
+        if info is None:
+            return
+        archive.members = []  # a stream has no index, keep tarfile from collecting all headers
+        yield info
+
+
+class MemberReader(io.RawIOBase):
+    """
+    reads the data of a plain tar member in place
+    """
+
+    def __init__(self, path: Path, offset: int, size: int):
+        self.fd = open(path, 'rb')
+        self.fd.seek(offset)
+        self.remaining = size
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        with memoryview(buffer) as view:
+            count = self.fd.readinto(view[:self.remaining])
+        self.remaining -= count
+        return count
+
+    def readall(self):
+        data = self.fd.read(self.remaining)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.fd.close()
+        super().close()
+
+
+class TarCursor:
+    """
+    sequential reader of a compressed tarball, keeps the data of the last read member as it is usually opened more than once
+    (head, then the whole file), going back restarts from the beginning; shared by the threads of a process
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.stack = None
+        self.archive = None
+        self.members = None
+        self.index = -1
+        self.data = None
+        self.lock = threading.Lock()
+
+    def restart(self):
+        if self.stack is not None:
+            self.stack.close()
+        self.stack = contextlib.ExitStack()
+        self.archive = self.stack.enter_context(open_tar_stream(self.path))
+        self.members = iter_tar_stream(self.archive)
+        self.index = -1
+
+    def read(self, index: int) -> bytes:
+        with self.lock:
+            return self.read_member(index)
+
+    def read_member(self, index: int) -> bytes:
+        if index == self.index:
+            return self.data
+        if self.stack is None or index < self.index:
+            self.restart()
+        info = None
+        while self.index < index:
+            info = next(self.members, None)
+            if info is None:
+                raise FileNotFoundError(f"{self.path} has no member {index}")
+            self.index += 1
+        self.data = self.archive.extractfile(info).read()
+        return self.data
+
+
+_handles = {}  # (pid, archive) -> open ZipFile or TarCursor, per process as forked workers must not share file offsets
+
+
+def archive_handle(path: Path, factory):
+    key = (os.getpid(), path)
+    handle = _handles.get(key)
+    if handle is None:
+        handle = _handles.setdefault(key, factory(path))  # a concurrent thread may have opened it meanwhile
+    return handle
+
+
+def open_member(member: ArchiveMember):
+    """
+    :return: binary stream of the stored (possibly compressed) member data
+    """
+    if member.archive.name.endswith('.zip'):
+        return archive_handle(member.archive, zipfile.ZipFile).open(member.member)
+    if member.archive.name.endswith('.tar'):
+        return io.BufferedReader(MemberReader(member.archive, member.position, member.size))
+    return io.BytesIO(archive_handle(member.archive, TarCursor).read(member.position))
+
+
+@contextlib.contextmanager
+def open_stored(path):
+    """
+    opens the bytes of a result file as stored, without decompressing it
+    """
+    if isinstance(path, Prefetched):
+        fd = io.BytesIO(path.data)
+    elif isinstance(path, ArchiveMember):
+        fd = open_member(path)
+    else:
+        fd = open(path, 'rb')
+    with fd:
+        yield fd
+
+
+@contextlib.contextmanager
+def open_result(path):
+    """
+    opens a result file (Path, ArchiveMember or Prefetched) for reading the json document, decompressing it on the fly
+    """
+    with open_stored(path) as fd, decompressed(fd, file_name(path)) as stream:
+        yield stream
+
+
+def zip_mtime(info: zipfile.ZipInfo) -> int:
+    return int(datetime(*info.date_time).timestamp()) * 10 ** 9
+
+
+def list_results(location: Path, sort: bool = False) -> list:
+    """
+    :param location: folder or archive with result files
+    :param sort: sort the files of a folder by name, archive members keep their order
+    :return: result files (Paths or ArchiveMembers), empty if the location does not exist
+    """
+    if not location.exists():
+        return []
+    if not is_archive(location):
+        results = [entry for entry in location.iterdir() if is_result_name(entry.name)]
+        return sorted(results) if sort else results
+    if location.name.endswith('.zip'):
+        with zipfile.ZipFile(location) as archive:
+            return [ArchiveMember(location, info.filename, info.file_size, zip_mtime(info), None) for info in archive.infolist() if not info.is_dir() and is_result_name(info.filename)]
+    random_access = location.name.endswith('.tar')
+    with (tarfile.open(location, 'r:') if random_access else open_tar_stream(location)) as archive:
+        return tar_results(location, enumerate(archive if random_access else iter_tar_stream(archive)), random_access)
+
+
+def tar_results(location: Path, members, random_access: bool) -> list:
+    """
+    :param members: (index, TarInfo) in archive order
+    :param random_access: members are read at their data offset, otherwise by their index in a stream
+    """
+    results = []
+    stored = {}  # name -> member holding the data, hard links point there
+    for index, info in members:
+        if info.isreg() and not info.issparse():
+            member = ArchiveMember(location, info.name, info.size, info.mtime * 10 ** 9, info.offset_data if random_access else index)
+            stored[info.name] = member
+        elif info.islnk() and info.linkname in stored:
+            member = stored[info.linkname]._replace(member=info.name)
+        else:
+            continue
+        if is_result_name(info.name):
+            results.append(member)
+    return results
+
+
+def list_pairs(ui_location: Path, api_location: Path, with_api: bool, sort: bool = False) -> list:
+    """
+    pairs the ui results with the api results of the same package, the two locations may be stored differently
+    :param with_api: skip apps without api results, otherwise they are paired with a non-existing path
+    :return: list of (ui file, api file)
+    """
+    api_results = list_results(api_location)
+    api_by_name = {result.name: result for result in api_results}
+    api_by_pkg = {pkg_name(result): result for result in api_results}
+    pairs = []
+    for ui_file in list_results(ui_location, sort):
+        api_file = api_by_name.get(ui_file.name) or api_by_pkg.get(pkg_name(ui_file))
+        if api_file is None:
+            if with_api:
+                continue
+            api_file = api_location / ui_file.name
+        pairs.append((ui_file, api_file))
+    return pairs
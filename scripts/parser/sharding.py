@@ -0,0 +1,78 @@
+"""
+Deterministic partitioning of the corpus across machines
+An app belongs to shard hash(package name) mod N, a stable hash, so the same app always lands on the same shard on every node
+Sharded runs write their outputs with a .shard-i-of-N suffix, merge_shards.py combines them
+"""
+import argparse
+import hashlib
+import re
+from pathlib import Path
+
+from frontmatter_parser import FrontmatterUiParser
+
+SHARD_PATTERN = re.compile(r'^(?P<stem>.*)\.shard-(?P<index>\d+)-of-(?P<count>\d+)$')
+
+
+def parse_shard(text: str) -> tuple:
+    """
+    argparse type for i/N, 0 <= i < N
+    """
+    try:
+        index, count = map(int, text.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"shard should be given as i/N: {text}")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"shard index should be in [0, {count}): {text}")
+    return index, count
+
+
+def shard_of(pkg: str, count: int) -> int:
+    digest = hashlib.blake2b(pkg.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') % count
+
+
+def select_shard(file_paths: list, shard: tuple) -> list:
+    """
+    :param file_paths: list of (ui file, api file)
+    :param shard: (index, count) or None for all files
+    """
+    if shard is None:
+        return file_paths
+    index, count = shard
+    return [paths for paths in file_paths if shard_of(FrontmatterUiParser.get_pkg_name(paths[0]), count) == index]
+
+
+def shard_path(path, shard: tuple):
+    """
+    output path of a shard: widgets.csv -> widgets.shard-1-of-4.csv
+    """
+    if path is None or shard is None:
+        return path
+    path = Path(path)
+    index, count = shard
+    return path.with_name(f"{path.stem}.shard-{index}-of-{count}{path.suffix}")
+
+
+def find_shards(path) -> list:
+    """
+    :return: shard files of an output path ordered by shard index
+    :raise ValueError: if shards are missing or belong to runs with different shard counts
+    """
+    path = Path(path)
+    shards = {}
+    counts = set()
+    for candidate in path.parent.glob(f"{path.stem}.shard-*-of-*{path.suffix}"):
+        match = SHARD_PATTERN.match(candidate.name[:len(candidate.name) - len(path.suffix)])
+        if match is None or match['stem'] != path.stem:
+            continue
+        shards[int(match['index'])] = candidate
+        counts.add(int(match['count']))
+    if not shards:
+        raise ValueError(f"no shards of {path}")
+    if len(counts) != 1:
+        raise ValueError(f"shards of {path} come from runs with different shard counts: {sorted(counts)}")
+    count = counts.pop()
+    missing = sorted(set(range(count)) - set(shards))
+    if missing:
+        raise ValueError(f"missing shards of {path}: {missing}")
+    return [shards[index] for index in range(count)]
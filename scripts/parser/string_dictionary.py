@@ -0,0 +1,84 @@
+"""
+Corpus-wide string dictionary for integer-coded output tables (extract_corpus.py --intern)
+Every string value gets a stable 63-bit id derived from its blake2b hash, so ids agree between workers, runs and shards
+without coordination: the dictionary of a corpus is the union of the (id, string) pairs of its apps, written as the
+`strings` table next to the coded tables; shard dictionaries are merged by dropping duplicate pairs
+load_dictionary() detects the (unlikely) case of two strings with the same id
+"""
+import functools
+import hashlib
+
+import pandas as pd
+
+from table_writer import read_table
+
+DICTIONARY_TABLE = 'strings'
+
+
+@functools.lru_cache(maxsize=65536)
+def string_id(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=8).digest(), 'little') >> 1
+
+
+def encode_rows(rows: list, strings: dict) -> list:
+    """
+    replaces the string values of the rows by their ids
+    :param strings: collects id -> string of the encoded values
+    """
+    encoded = []
+    for row in rows:
+        coded = {}
+        for column, value in row.items():
+            if isinstance(value, str):
+                key = string_id(value)
+                strings[key] = value
+                value = key
+            coded[column] = value
+        encoded.append(coded)
+    return encoded
+
+
+def dictionary_rows(strings: dict) -> list:
+    return [{'id': key, 'string': value} for key, value in strings.items()]
+
+
+def check_dictionary(dictionary: pd.DataFrame) -> pd.DataFrame:
+    """
+    :return: the dictionary without duplicate entries
+    """
+    dictionary = dictionary.drop_duplicates()
+    collisions = dictionary[dictionary['id'].duplicated(keep=False)]
+    if len(collisions):
+        raise ValueError(f"strings with the same id: {collisions.head(10).to_dict('records')}")
+    return dictionary
+
+
+def read_dictionary(path) -> pd.DataFrame:
+    dictionary = read_table(path)
+    dictionary['string'] = dictionary['string'].astype(object).fillna('')  # empty strings are read as NaN from csv
+    return dictionary
+
+
+def merge_dictionaries(paths: list) -> pd.DataFrame:
+    return check_dictionary(pd.concat([read_dictionary(path) for path in paths], ignore_index=True))
+
+
+def load_dictionary(path) -> dict:
+    """
+    :return: id -> string
+    """
+    dictionary = check_dictionary(read_dictionary(path))
+    return dict(zip(dictionary['id'], dictionary['string']))
+
+
+def decode(table: pd.DataFrame, dictionary: dict, columns: list = None) -> pd.DataFrame:
+    """
+    :param columns: coded columns, by default all columns whose values are all in the dictionary
+    :return: the table with the coded columns replaced by their strings
+    """
+    decoded = table.copy()
+    if columns is None:
+        columns = [column for column in table.columns if pd.api.types.is_integer_dtype(table[column]) and table[column].map(dictionary).notna().all()]
+    for column in columns:
+        decoded[column] = table[column].map(dictionary)
+    return decoded
@@ -0,0 +1,186 @@
+"""
+Incremental output of extracted tables as csv or parquet (chosen by the file extension)
+Rows are written app by app in bounded batches instead of collecting the whole corpus into one DataFrame
+Duplicate rows are dropped as they are written (see dedup.py), the result equals drop_duplicates() on the whole table
+Workers can send rows packed (pack_rows): column names once and per-app unique value tuples, smaller to pickle than row dicts
+Parquet files are zstd compressed with dictionary encoded columns and one row group per batch, read_table() loads them
+"""
+import csv
+from collections import namedtuple
+from pathlib import Path
+
+import pandas as pd
+
+from dedup import Deduplicator
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # parquet output is optional
+    pyarrow = None
+
+BATCH_SIZE = 10000  # rows buffered per table before they are written
+PARQUET_SUFFIX = '.parquet'
+PARQUET_COMPRESSION = 'zstd'
+
+PackedRows = namedtuple('PackedRows', ['columns', 'rows', 'total'])  # total: number of rows before dropping duplicates
+
+
+def pack_rows(rows: list):
+    """
+    :param rows: row dicts of one app, all with the same columns
+    :return: PackedRows, the empty list if there are no rows
+    """
+    if not rows:
+        return rows
+    unique_rows = list(dict.fromkeys(tuple(row.values()) for row in rows))  # keeps the first occurrence
+    return PackedRows(tuple(rows[0]), unique_rows, len(rows))
+
+
+def row_count(rows) -> int:
+    return rows.total if isinstance(rows, PackedRows) else len(rows)
+
+
+def require_pyarrow():
+    if pyarrow is None:
+        raise RuntimeError("parquet output requires pyarrow (pip install pyarrow)")
+
+
+def is_parquet(path) -> bool:
+    return Path(path).suffix == PARQUET_SUFFIX
+
+
+class TableWriter:
+    def __init__(self, path: Path, batch_size: int = BATCH_SIZE, dedup: Deduplicator = None):
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.dedup = dedup or Deduplicator()
+        self.columns = None
+        self.batch = []
+        self.rows = 0  # number of written rows
+
+    def write_app(self, rows):
+        """
+        :param rows: row dicts of one app, all with the same columns, or PackedRows
+        """
+        if not rows:
+            return
+        if isinstance(rows, PackedRows):
+            if self.columns is None:
+                self.columns = list(rows.columns)
+                self.start(dict(zip(rows.columns, rows.rows[0])))
+            self.dedup.add_dropped(rows.total - len(rows.rows))  # duplicates within the app were dropped by pack_rows
+            values = rows.rows
+        else:
+            if self.columns is None:
+                self.columns = list(rows[0])
+                self.start(rows[0])
+            values = (tuple(row[column] for column in self.columns) for row in rows)
+        self.batch.extend(self.dedup.filter(values))
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.batch:
+            self.write_batch(self.batch)
+        self.rows += len(self.batch)
+        self.batch = []
+
+    def close(self):
+        for row in self.dedup.drain():  # rows held back after the hashes were spilled
+            self.batch.append(row)
+            if len(self.batch) >= self.batch_size:
+                self.flush()
+        self.flush()
+        self.dedup.close()
+        self.finish()
+
+    def start(self, first_row: dict):
+        raise NotImplementedError
+
+    def write_batch(self, batch: list):
+        raise NotImplementedError
+
+    def finish(self):
+        raise NotImplementedError
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class CsvTableWriter(TableWriter):
+    def __init__(self, path: Path, batch_size: int = BATCH_SIZE, dedup: Deduplicator = None):
+        super().__init__(path, batch_size, dedup)
+        self.fd = self.path.open('w', newline='')
+        self.writer = csv.writer(self.fd, lineterminator='\n')
+
+    def start(self, first_row: dict):
+        self.writer.writerow(self.columns)
+
+    def write_batch(self, batch: list):
+        self.writer.writerows(batch)
+
+    def finish(self):
+        if self.columns is None:
+            self.fd.write('\n')  # empty table, same as an empty DataFrame.to_csv
+        self.fd.close()
+
+
+class ParquetTableWriter(TableWriter):
+    def __init__(self, path: Path, batch_size: int = BATCH_SIZE, dedup: Deduplicator = None):
+        require_pyarrow()
+        super().__init__(path, batch_size, dedup)
+        self.schema = None
+        self.writer = None
+
+    @staticmethod
+    def column_type(value):
+        return pyarrow.int64() if isinstance(value, int) else pyarrow.string()
+
+    def start(self, first_row: dict):
+        self.schema = pyarrow.schema([(column, self.column_type(value)) for column, value in first_row.items()])
+        self.writer = pyarrow.parquet.ParquetWriter(self.path, self.schema, compression=PARQUET_COMPRESSION, use_dictionary=True)
+
+    def write_batch(self, batch: list):
+        arrays = [pyarrow.array(values, type=field.type) for values, field in zip(zip(*batch), self.schema)]
+        self.writer.write_table(pyarrow.Table.from_arrays(arrays, schema=self.schema))  # one row group per batch
+
+    def finish(self):
+        if self.writer is None:  # empty table
+            pyarrow.parquet.write_table(pyarrow.table({}), self.path, compression=PARQUET_COMPRESSION)
+            return
+        self.writer.close()
+
+
+def open_writer(path, batch_size: int = BATCH_SIZE, dedup: Deduplicator = None) -> TableWriter:
+    if is_parquet(path):
+        return ParquetTableWriter(path, batch_size, dedup)
+    return CsvTableWriter(path, batch_size, dedup)
+
+
+def save_table(corpus, path, index=False):
+    """
+    write a DataFrame as csv or parquet
+    """
+    if is_parquet(path):
+        require_pyarrow()
+        corpus.to_parquet(path, index=index, compression=PARQUET_COMPRESSION, use_dictionary=True, row_group_size=BATCH_SIZE)
+    else:
+        corpus.to_csv(path, index=index)
+
+
+def read_table(path, columns=None):
+    """
+    load a table written by the parsers, string columns of parquet files are loaded as categoricals
+    :param columns: subset of columns to load, only these are read from parquet files
+    """
+    if not is_parquet(path):
+        return pd.read_csv(path, usecols=columns)
+    require_pyarrow()
+    schema = pyarrow.parquet.read_schema(path)
+    string_columns = [field.name for field in schema if (pyarrow.types.is_string(field.type) or pyarrow.types.is_large_string(field.type)) and (columns is None or field.name in columns)]
+    table = pyarrow.parquet.read_table(path, columns=columns, read_dictionary=string_columns)
+    return table.to_pandas()
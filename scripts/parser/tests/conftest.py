@@ -0,0 +1,42 @@
+"""
+Fixtures of the parser tests: a small synthetic corpus (generate_results.py) shared by the tests of a session and helpers
+running the drivers on it
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # the parser scripts are flat modules
+
+import extract_corpus  # noqa: E402
+import generate_results  # noqa: E402
+from driver import ParseOptions, RunOptions  # noqa: E402
+
+APPS = 40
+
+
+@pytest.fixture(scope='session')
+def corpus(tmp_path_factory):
+    """
+    :return: ui folder, api folder of the generated apps
+    """
+    return generate_results.generate(tmp_path_factory.mktemp('corpus'), APPS, seed=1)
+
+
+def table_rows(table) -> list:
+    """
+    :return: sorted rows of a DataFrame, comparable independently of the app order
+    """
+    return sorted(map(repr, table.itertuples(index=False, name=None)))
+
+
+@pytest.fixture
+def extract(corpus):
+    """
+    :return: function running extract_corpus.read_data on the corpus, returns the sorted rows per table and the stats
+    """
+    def run(tables=tuple(extract_corpus.DEFAULT_TABLES), run_options=RunOptions(), **options):
+        tables, stats = extract_corpus.read_data(*corpus, ParseOptions(tables=list(tables), **options), run_options)
+        return {table: table_rows(rows) for table, rows in tables.items()}, stats
+    return run
@@ -0,0 +1,54 @@
+import pytest
+
+import checkpoint
+import extract_corpus
+from driver import RunOptions
+
+PROCESS_FILE = extract_corpus.process_file
+
+
+class Interrupted(Exception):
+    pass
+
+
+def counting_process_file(monkeypatch, fail_after=None) -> list:
+    """
+    counts the parsed apps, raises Interrupted (as a killed run) once `fail_after` apps are parsed
+    """
+    parsed = []
+
+    def process(*args, **kwargs):
+        if fail_after is not None and len(parsed) == fail_after:
+            raise Interrupted()
+        parsed.append(args[0].name)
+        return PROCESS_FILE(*args, **kwargs)
+
+    monkeypatch.setattr(extract_corpus, 'process_file', process)
+    return parsed
+
+
+def test_resumed_run_matches_uninterrupted_run(corpus, extract, monkeypatch, tmp_path):
+    expected, expected_stats = extract()
+    options = {'driver': 'corpus'}
+    counting_process_file(monkeypatch, fail_after=12)
+    with pytest.raises(Interrupted):
+        extract(run_options=RunOptions(checkpoints=checkpoint.Checkpoint(tmp_path, options, every=5)))
+    parsed = counting_process_file(monkeypatch)
+    resumed, resumed_stats = extract(run_options=RunOptions(checkpoints=checkpoint.Checkpoint(tmp_path, options, every=5, resume=True)))
+    assert len(parsed) == len(list(corpus[0].iterdir())) - 10  # the apps of the two committed shards are replayed, the uncommitted shard is parsed again
+    assert resumed == expected
+    assert resumed_stats == expected_stats
+
+
+def test_resume_with_other_options_is_refused(tmp_path):
+    checkpoint.Checkpoint(tmp_path, {'sensitive_only': False}, every=1).add('a.json', 1)
+    with pytest.raises(ValueError):
+        checkpoint.Checkpoint(tmp_path, {'sensitive_only': True}, resume=True)
+
+
+def test_new_run_removes_only_checkpoint_files(tmp_path):
+    previous = checkpoint.Checkpoint(tmp_path, {}, every=1)
+    previous.add('a.json', 1)
+    (tmp_path / 'notes.txt').write_text('kept')
+    checkpoint.Checkpoint(tmp_path, {})
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['notes.txt']
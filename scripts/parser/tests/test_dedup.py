@@ -0,0 +1,29 @@
+import pytest
+
+import dedup
+
+
+def rows_with_interned_ids() -> list:
+    """
+    rows of 63-bit ids (string_dictionary.string_id), pairs of ids differing by 2**61 - 1 have the same builtin hash()
+    """
+    rows = []
+    for index in range(200):
+        key = 2 ** 62 + index * 7919
+        rows.append((key, index % 3))
+        rows.append((key - (2 ** 61 - 1), index % 3))
+    return rows
+
+
+@pytest.mark.parametrize('hash_bits', [64, 128])
+@pytest.mark.parametrize('max_hashes', [dedup.MAX_HASHES, 50])
+def test_unique_rows_are_kept_in_order(hash_bits, max_hashes, tmp_path):
+    rows = rows_with_interned_ids()
+    assert len({hash(row) for row in rows}) < len(rows)
+    deduplicator = dedup.Deduplicator(hash_bits, max_hashes, spill_dir=tmp_path)
+    emitted = deduplicator.filter(rows[:300]) + deduplicator.filter(rows + rows[::-1])
+    emitted.extend(deduplicator.drain())
+    deduplicator.close()
+    assert emitted == rows
+    assert deduplicator.spilled == (max_hashes < len(rows))
+    assert deduplicator.duplicate_ratio == pytest.approx(1 - len(rows) / (300 + 2 * len(rows)))
@@ -0,0 +1,72 @@
+import json
+from collections import Counter
+
+import pytest
+
+import extract_corpus
+import feature_matrix
+from driver import ParseOptions
+
+pytest.importorskip('scipy')
+
+API_TABLES = ['widget_api', 'activity_api', 'component_api']
+
+
+def entries(features: dict, name: str) -> Counter:
+    """
+    :param features: matrices and vocabularies of a store (feature_matrix.load_features)
+    :return: (row key, column key) -> value of the non-zero entries of a matrix
+    """
+    rows, columns = feature_matrix.MATRICES[name]
+    row_keys = list(features[rows].itertuples(index=False, name=None))
+    column_keys = features[columns].iloc[:, 0].tolist()
+    matrix = features[name].tocoo()
+    return Counter({(row_keys[row] if len(row_keys[row]) > 1 else row_keys[row][0], column_keys[column]): int(value)
+                    for row, column, value in zip(matrix.row, matrix.col, matrix.data)})
+
+
+@pytest.fixture(scope='module')
+def extracted(corpus, tmp_path_factory):
+    """
+    :return: api tables extracted together with the feature store, the saved store
+    """
+    folder = tmp_path_factory.mktemp('features')
+    store = feature_matrix.FeatureStore(folder)
+    tables, _ = extract_corpus.read_data(*corpus, ParseOptions(tables=API_TABLES), features=store)
+    store.save()
+    return {table: list(rows.itertuples(index=False)) for table, rows in tables.items()}, folder
+
+
+def test_matrices_match_api_tables(extracted):
+    tables, folder = extracted
+    features = feature_matrix.load_features(folder)
+    widgets = Counter(((row.pkg, row.guid), row.api) for row in tables['widget_api'])
+    activities = Counter(((row.pkg, row.activity), row.api) for row in tables['activity_api'])
+    activities.update(((row.pkg, row.name), row.api) for row in tables['component_api'] if row.type == 'activity')
+    apps = Counter((row.pkg, row.api) for row in tables['widget_api'])
+    apps.update((row.pkg, row.api) for row in tables['component_api'])
+    assert entries(features, 'widget_api') == widgets
+    assert entries(features, 'activity_api') == activities
+    assert entries(features, 'app_api') == apps
+
+
+def test_permissions_are_the_declared_permissions(corpus, extracted):
+    tables, folder = extracted
+    features = feature_matrix.load_features(folder)
+    expected = Counter()
+    for pkg in {row.pkg for row in tables['component_api']}:  # apps whose api results were read, all have a service
+        with (corpus[1] / f"{pkg}.json").open() as fd:
+            expected.update({(pkg, permission): 1 for permission in json.load(fd).get('permissions', [])})
+    assert entries(features, 'app_permission') == expected
+
+
+def test_rerun_appends_only_new_apps(corpus, extracted):
+    _, folder = extracted
+    before = feature_matrix.load_features(folder)
+    store = feature_matrix.FeatureStore(folder)
+    extract_corpus.read_data(*corpus, ParseOptions(tables=API_TABLES), features=store)
+    assert store.added == 0 and store.skipped == len(before['apps'])
+    store.save()
+    after = feature_matrix.load_features(folder)
+    for name in feature_matrix.MATRICES:
+        assert entries(after, name) == entries(before, name)
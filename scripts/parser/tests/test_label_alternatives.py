@@ -0,0 +1,65 @@
+import argparse
+from collections import Counter, defaultdict
+
+import pytest
+
+import driver
+import extract_corpus
+from driver import ParseOptions
+from frontmatter_parser import LabelAlternatives
+
+FACTORS = [list('abcd'), list('xyz'), ['1', '2']]
+
+
+def test_sampling_is_seeded():
+    complete = list(LabelAlternatives(FACTORS, '.'))
+    sampled = LabelAlternatives(FACTORS, '.', limit=5)
+    assert len(complete) == 24 and len(sampled) == 5 and sampled.truncated == 19
+    assert list(sampled) == list(LabelAlternatives(FACTORS, '.', limit=5))
+    assert list(sampled) == [sampled[index] for index in range(5)]
+    assert set(sampled) < set(complete)
+    assert LabelAlternatives(FACTORS, '.', limit=24).truncated == 0
+
+
+@pytest.mark.parametrize('limit', ['0', '-1', 'x'])
+def test_limits_below_one_are_rejected(limit):
+    parser = argparse.ArgumentParser()
+    driver.add_arguments(parser)
+    with pytest.raises(SystemExit):
+        parser.parse_args(['--max-alternatives', limit])
+
+
+@pytest.mark.parametrize('limit', [0, -1])
+def test_empty_samples_are_refused(limit):
+    with pytest.raises(ValueError):
+        LabelAlternatives(FACTORS, '.', limit=limit)
+
+
+def activity_rows(corpus, **options) -> tuple:
+    tables, stats = extract_corpus.read_data(*corpus, ParseOptions(tables=['activities'], **options))
+    return tables['activities'], stats
+
+
+@pytest.mark.parametrize('limit', [1, 3])
+def test_truncated_count_is_the_number_of_dropped_rows(corpus, limit):
+    complete, _ = activity_rows(corpus)
+    sampled, stats = activity_rows(corpus, max_alternatives=limit)
+    complete_counts, sampled_counts = Counter(complete['pkg']), Counter(sampled['pkg'])
+    dropped = {pkg: count - sampled_counts[pkg] for pkg, count in complete_counts.items() if count != sampled_counts[pkg]}
+    assert dropped and stats['truncated'] == dropped
+    assert set(sampled.itertuples(index=False, name=None)) <= set(complete.itertuples(index=False, name=None))
+
+
+def test_factored_rows_are_the_parts_of_the_combinations(corpus):
+    complete, _ = activity_rows(corpus)
+    factored, stats = activity_rows(corpus, factored=True)
+    assert not stats['truncated']
+    limited, _ = activity_rows(corpus, factored=True, max_alternatives=1)
+    assert sorted(limited.itertuples(index=False, name=None)) == sorted(factored.itertuples(index=False, name=None))
+    combinations = defaultdict(list)
+    for row in complete.itertuples(index=False):
+        combinations[row.pkg, row.activity, row.title].append(row.labels)
+    assert set(zip(factored['pkg'], factored['activity'], factored['title'])) == set(combinations)
+    assert factored['group'].max() > 0
+    for row in factored.itertuples(index=False):
+        assert any(row.labels in labels for labels in combinations[row.pkg, row.activity, row.title])
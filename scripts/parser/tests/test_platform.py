@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+from frontmatter_parser import FrontmatterUiParser, PlatformClassifier
+
+pytest.importorskip('ijson')
+
+XAMARIN = {'name': 'md5' + '0' * 32 + '.MainActivity', 'layouts': []}
+UNITY = {'name': 'com.unity3d.player.UnityPlayerActivity', 'layouts': []}
+AIR = {'name': 'air.com.example.AppEntry', 'layouts': []}
+PLAIN = {'name': 'com.example.Main', 'layouts': []}
+CONTENT = {'name': 'com.example.Settings', 'layouts': [{'viewClass': 'android.widget.LinearLayout', 'guid': 1, 'children': [{'viewClass': 'android.widget.Button', 'guid': 2}]}]}
+
+
+def classify(activities, stop_early) -> tuple:
+    """
+    :return: platform, number of activities read
+    """
+    classifier = PlatformClassifier(FrontmatterUiParser.platform_rules, stop_early)
+    for count, activity in enumerate(activities, 1):
+        if classifier.add(activity):
+            return classifier.platform, count
+    return classifier.platform, len(activities)
+
+
+@pytest.mark.parametrize('activities, platform, read', [
+    ([UNITY, PLAIN, XAMARIN], 'xamarin', 3),  # a rule before unity can still match
+    ([XAMARIN, UNITY, PLAIN], 'xamarin', 1),
+    ([AIR, UNITY, PLAIN], 'unity', 3),  # air only applies to apps without content
+    ([CONTENT, AIR, UNITY, PLAIN], 'unity', 4),
+    ([AIR, PLAIN], 'air', 2),
+    ([AIR, CONTENT], None, 2),
+    ([PLAIN], 'unidentified', 1),
+])
+def test_first_rule_of_the_table_gives_the_platform(activities, platform, read):
+    assert classify(activities, stop_early=True) == (platform, read)
+    assert classify(activities, stop_early=False) == (platform, len(activities))
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+@pytest.mark.parametrize('force', [False, True])
+def test_platform_apps_are_parsed_only_with_force(tmp_path, force, streaming):
+    path = tmp_path / 'com.example.json'
+    path.write_text(json.dumps({'meta': {'type': 'NORMAL', 'defaultLanguage': 'en'}, 'activities': [CONTENT, UNITY, PLAIN, XAMARIN], 'transitions': []}))
+    frontmatter = FrontmatterUiParser(path)
+    frontmatter.read_ui(force, streaming)
+    assert frontmatter.apk_platform == 'xamarin'
+    assert sorted(frontmatter.activities) == (sorted(activity['name'] for activity in (CONTENT, UNITY, PLAIN, XAMARIN)) if force else [])
@@ -0,0 +1,79 @@
+import contextlib
+from concurrent.futures import Future
+
+import pytest
+
+import extract_corpus
+import prefetch
+import result_head
+import result_source
+from conftest import table_rows
+from driver import ParseOptions, RunOptions
+from frontmatter_parser import FrontmatterUiParser
+
+OPTIONS = ParseOptions(tables=extract_corpus.DEFAULT_TABLES)
+
+
+class InlineExecutor(contextlib.AbstractContextManager):
+    """
+    runs the reads when they are submitted, makes the read ahead deterministic
+    """
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __exit__(self, *exc_info):
+        return None
+
+    @staticmethod
+    def submit(fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+@pytest.fixture
+def reads(monkeypatch) -> list:
+    """
+    :return: names of the files read by prefetchers, in reading order
+    """
+    names = []
+    read = prefetch.Prefetcher.read
+    monkeypatch.setattr(prefetch, 'ThreadPoolExecutor', InlineExecutor)
+    monkeypatch.setattr(prefetch.Prefetcher, 'read', lambda prefetcher, path: names.append(path.name) or read(prefetcher, path))
+    return names
+
+
+def run(corpus, **run_options) -> tuple:
+    tables, stats = extract_corpus.read_data(*corpus, OPTIONS, RunOptions(**run_options))
+    return {table: table_rows(rows) for table, rows in tables.items()}, stats
+
+
+def test_apps_rejected_by_cached_heads_are_not_read(corpus, tmp_path, reads):
+    expected, _ = run(corpus)
+    head_cache = result_head.HeadCache(tmp_path / 'heads.pickle')
+    assert run(corpus, head_cache=head_cache)[0] == expected
+    rejected = {path.name for path in corpus[0].iterdir() if not FrontmatterUiParser.head_accepted(head_cache.get(path))}
+    assert rejected
+    prefetcher = prefetch.Prefetcher(4)
+    tables, stats = run(corpus, head_cache=head_cache, prefetcher=prefetcher)
+    assert tables == expected
+    assert rejected.isdisjoint(reads) and len(reads) == 2 * (len(list(corpus[0].iterdir())) - len(rejected))
+    assert stats['prefetch']['files'] == len(reads) and prefetcher.held == 0
+
+
+@pytest.mark.parametrize('depth, budget, ahead', [(3, prefetch.PREFETCH_BUDGET, 3), (3, 1, 1), (1, prefetch.PREFETCH_BUDGET, 1)])
+def test_reading_ahead_is_bounded(corpus, reads, depth, budget, ahead):
+    file_paths = result_source.list_pairs(*corpus, True, sort=True)
+    prefetcher = prefetch.Prefetcher(depth, budget)
+    apps = prefetcher.iterate(file_paths, True)
+    for index, (ui_file, api_file) in enumerate(apps):
+        assert (ui_file.path, api_file.path) == file_paths[index]
+        assert len(reads) == 2 * min(index + 1 + ahead, len(file_paths))  # the yielded app and the ones read ahead
+        if budget > 1:
+            prefetcher.finished()
+    if budget == 1:  # nothing was released, every read byte is held
+        assert prefetcher.held == sum(len(file.read_bytes()) for paths in file_paths for file in paths)
+        for _ in file_paths:
+            prefetcher.finished()
+    assert prefetcher.held == 0
@@ -0,0 +1,57 @@
+import pickle
+
+import pytest
+
+import checkpoint
+import driver
+import extract_corpus
+import parse_ui_to_activity
+import parse_ui_to_widgets
+import profiling
+from conftest import table_rows
+from dedup import read_records
+from driver import ParseOptions, RunOptions
+from result_cache import ResultCache
+
+DRIVERS = {
+    'widgets': (parse_ui_to_widgets.read_data, ParseOptions(with_api=True)),
+    'activity': (parse_ui_to_activity.read_data, ParseOptions(with_api=True)),
+    'extract': (extract_corpus.read_data, ParseOptions(tables=extract_corpus.DEFAULT_TABLES)),
+}
+
+
+def stored(folder) -> dict:
+    """
+    :return: unpickled cache entries and checkpoint records by file
+    """
+    entries = {}
+    for path in folder.rglob('*.pickle'):
+        if path.match(checkpoint.SHARD_PATTERN):
+            entries[path.relative_to(folder)] = list(read_records(path))
+        else:
+            with path.open('rb') as fd:
+                entries[path.relative_to(folder)] = pickle.load(fd)
+    return entries
+
+
+def profiled_run(corpus, folder, name, profiler) -> tuple:
+    """
+    :return: sorted rows of the tables, stats of a run caching and checkpointing to folder
+    """
+    read_data, options = DRIVERS[name]
+    key = driver.cache_options(name, options)
+    run = RunOptions(cache=ResultCache(folder / 'cache', key), checkpoints=checkpoint.Checkpoint(folder / 'checkpoint', key, every=7), profiler=profiler)
+    *tables, stats = read_data(*corpus, options, run)
+    tables = tables[0] if isinstance(tables[0], dict) else dict(enumerate(tables))
+    return {table: table_rows(rows) for table, rows in tables.items()}, stats
+
+
+@pytest.mark.parametrize('name', sorted(DRIVERS))
+def test_profiling_does_not_change_the_results(corpus, tmp_path, name):
+    tables, stats = profiled_run(corpus, tmp_path / 'plain', name, None)
+    profiled_tables, profiled_stats = profiled_run(corpus, tmp_path / 'profiled', name, profiling.Profiler(top=3))
+    assert profiled_tables == tables
+    profile = profiled_stats.pop('profile')
+    assert profiled_stats == stats
+    assert profile['apps'] == len(list(corpus[0].iterdir())) and len(profile['slowest']) == 3 and 'total' in profile['phases']
+    assert stored(tmp_path / 'profiled') == stored(tmp_path / 'plain') != {}
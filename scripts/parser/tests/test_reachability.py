@@ -0,0 +1,101 @@
+from collections import deque
+
+import pytest
+
+import extract_corpus
+import reachability
+import transition_graph
+from driver import ParseOptions
+
+pytest.importorskip('scipy')
+
+
+@pytest.fixture(scope='module')
+def graph(corpus, tmp_path_factory):
+    path = tmp_path_factory.mktemp('graph') / 'graph.npz'
+    with transition_graph.GraphWriter(path) as writer:
+        extract_corpus.read_data(*corpus, ParseOptions(tables=['graph_nodes', 'graph_edges']), graph=writer)
+    return path
+
+
+def app_successors(graph: dict, index: int) -> list:
+    """
+    :return: successor lists of the nodes of an app, app-local node ids
+    """
+    first, end = graph['app_ptr'][index], graph['app_ptr'][index + 1]
+    return [sorted({int(dest) - first for dest in graph['indices'][graph['indptr'][node]:graph['indptr'][node + 1]]}) for node in range(first, end)]
+
+
+def reachable_from(successors: list, starts) -> dict:
+    """
+    :return: breadth-first depth of the nodes reachable from the starts
+    """
+    depth = {start: 0 for start in starts}
+    queue = deque(starts)
+    while queue:
+        node = queue.popleft()
+        for dest in successors[node]:
+            if dest not in depth:
+                depth[dest] = depth[node] + 1
+                queue.append(dest)
+    return depth
+
+
+def reference(successors: list, launchers: set = None, activities: list = None) -> dict:
+    """
+    reachability of an app computed node by node
+    """
+    nodes = range(len(successors))
+    reach = [set(reachable_from(successors, [node])) for node in nodes]
+    component = [frozenset(other for other in reach[node] if node in reach[other]) for node in nodes]
+    if launchers:
+        entries = [activities[node] in launchers for node in nodes]
+    else:
+        entries = [not any(src not in component[node] for src in nodes for dest in successors[src] if dest in component[node]) for node in nodes]
+    depth = reachable_from(successors, [node for node in nodes if entries[node]])
+    return {'entry': entries, 'depth': [depth.get(node, -1) for node in nodes], 'component': component,
+            'dead_end': [not any(dest != node for dest in successors[node]) for node in nodes]}
+
+
+def test_index_matches_node_by_node_reference(graph):
+    arrays = transition_graph.load_graph(graph)
+    index = reachability.build_index(arrays)
+    assert len(arrays['pkgs']) > 0
+    for app in range(len(arrays['pkgs'])):
+        first, end = index['app_ptr'][app], index['app_ptr'][app + 1]
+        expected = reference(app_successors(arrays, app))
+        assert index['entry'][first:end].tolist() == expected['entry']
+        assert index['depth'][first:end].tolist() == expected['depth']
+        assert index['dead_end'][first:end].tolist() == expected['dead_end']
+        scc = index['scc'][first:end].tolist()
+        assert all((scc[node] == scc[other]) == (other in expected['component'][node]) for node in range(end - first) for other in range(end - first))
+        assert index['sccs'][app] == len(set(expected['component']))
+        assert index['reachable'][app] == sum(depth >= 0 for depth in expected['depth'])
+        assert index['max_depth'][app] == max(expected['depth'], default=-1)
+
+
+def test_launchers_replace_source_components(graph):
+    arrays = transition_graph.load_graph(graph)
+    pkg = str(arrays['pkgs'][0])
+    activities = arrays['activities'][arrays['app_ptr'][0]:arrays['app_ptr'][1]].tolist()
+    launchers = {activities[-1]}
+    index = reachability.build_index(arrays, {pkg: launchers})
+    expected = reference(app_successors(arrays, 0), launchers, activities)
+    assert index['entry'][:len(activities)].tolist() == expected['entry']
+    assert index['depth'][:len(activities)].tolist() == expected['depth']
+
+
+def test_saved_index_answers_queries(graph, tmp_path):
+    arrays = transition_graph.load_graph(graph)
+    path = tmp_path / 'index.npz'
+    transition_graph.save_graph(reachability.build_index(arrays), path)
+    index = reachability.ReachabilityIndex(path)
+    for app, pkg in enumerate(arrays['pkgs'].tolist()):
+        activities = arrays['activities'][arrays['app_ptr'][app]:arrays['app_ptr'][app + 1]].tolist()
+        successors = app_successors(arrays, app)
+        expected = reference(successors)
+        assert index.entries(pkg) == [activity for activity, entry in zip(activities, expected['entry']) if entry]
+        assert index.reachable(pkg) == [activity for activity, depth in zip(activities, expected['depth']) if depth >= 0]
+        for node, activity in enumerate(activities):
+            assert index.depth(pkg, activity) == expected['depth'][node]
+            assert index.reachable(pkg, activity) == [activities[other] for other in sorted(reachable_from(successors, [node]))]
@@ -0,0 +1,69 @@
+import os
+import shutil
+
+import pytest
+
+import driver
+import extract_corpus
+import permission_index
+from conftest import table_rows
+from driver import ParseOptions, RunOptions
+from result_cache import ResultCache
+
+OPTIONS = ParseOptions(tables=extract_corpus.DEFAULT_TABLES, sensitive_only=True)
+
+
+def cached_run(corpus, folder, options=OPTIONS) -> tuple:
+    """
+    :return: rows per table, cache stats of an extraction using the cache in folder
+    """
+    cache = ResultCache(folder, driver.cache_options('extract', options))
+    tables, _ = extract_corpus.read_data(*corpus, options, RunOptions(cache=cache))
+    return {table: table_rows(rows) for table, rows in tables.items()}, cache.stats()
+
+
+@pytest.fixture
+def cache_dir(corpus, tmp_path):
+    """
+    :return: cache folder filled by a first run
+    """
+    _, stats = cached_run(corpus, tmp_path)
+    assert stats == {'hits': 0, 'misses': len(list(corpus[0].iterdir()))}
+    return tmp_path
+
+
+def test_rerun_is_served_from_the_cache(corpus, cache_dir, extract):
+    tables, stats = cached_run(corpus, cache_dir)
+    assert stats == {'hits': len(list(corpus[0].iterdir())), 'misses': 0}
+    assert tables == extract(tables=OPTIONS.tables, sensitive_only=True)[0]
+
+
+def test_touched_file_is_parsed_again(corpus, cache_dir):
+    path = sorted(corpus[1].iterdir())[0]
+    stat = path.stat()
+    try:
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+        _, stats = cached_run(corpus, cache_dir)
+    finally:
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert stats == {'hits': len(list(corpus[0].iterdir())) - 1, 'misses': 1}
+
+
+def test_changed_flag_misses(corpus, cache_dir):
+    _, stats = cached_run(corpus, cache_dir, OPTIONS._replace(sensitive_only=False))
+    assert stats['hits'] == 0
+
+
+def test_changed_permission_mapping_misses(corpus, cache_dir, tmp_path_factory, monkeypatch):
+    base_dir = tmp_path_factory.mktemp('mapping')
+    shutil.copytree(permission_index.BASE_DIR / 'permission_mapping', base_dir / 'permission_mapping')  # keeps size and mtime
+    shutil.copy2(permission_index.BASE_DIR / 'actions.list', base_dir)
+    monkeypatch.setattr(permission_index, '_index', permission_index.PermissionIndex.compile(base_dir))
+    before, stats = cached_run(corpus, cache_dir)
+    assert stats['misses'] == 0
+    for path in sorted((base_dir / 'permission_mapping').iterdir())[1:]:
+        path.write_text('')
+    monkeypatch.setattr(permission_index, '_index', permission_index.PermissionIndex.compile(base_dir))
+    after, stats = cached_run(corpus, cache_dir)
+    assert stats['hits'] == 0
+    assert len(after['widget_api']) < len(before['widget_api'])
@@ -0,0 +1,77 @@
+import json
+import os
+
+import pytest
+
+import result_head
+from frontmatter_parser import FrontmatterUiParser
+
+ACTIVITIES = [{'name': 'com.example.Main', 'titles': ['Main'], 'layouts': []}]
+PADDING = 'x' * (2 * result_head.HEAD_SIZE)
+
+
+def special_results() -> dict:
+    """
+    result files whose head is rejected, accepted or inconclusive
+    """
+    return {
+        'error': {'error': 'TIMEOUT'},
+        'error_after_meta': {'meta': {'type': 'NORMAL'}, 'error': 'PARSING_ERROR'},
+        'foreign': {'meta': {'type': 'NORMAL', 'defaultLanguage': 'de'}, 'activities': ACTIVITIES, 'transitions': []},
+        'framework': {'meta': {'type': 'FRAMEWORK', 'defaultLanguage': 'en'}, 'activities': ACTIVITIES, 'transitions': []},
+        'accepted': {'meta': {'type': 'NORMAL', 'defaultLanguage': 'en'}, 'activities': ACTIVITIES, 'transitions': []},
+        'long_foreign': {'meta': {'type': 'NORMAL', 'defaultLanguage': 'de', 'padding': PADDING}, 'activities': ACTIVITIES, 'transitions': []},
+        'long_accepted': {'meta': {'type': 'NORMAL', 'defaultLanguage': 'en', 'padding': PADDING}, 'activities': ACTIVITIES, 'transitions': []},
+        'meta_last': {'activities': ACTIVITIES, 'transitions': [], 'meta': {'type': 'NORMAL', 'defaultLanguage': 'de'}},
+    }
+
+
+@pytest.fixture(scope='module')
+def result_files(corpus, tmp_path_factory):
+    folder = tmp_path_factory.mktemp('heads')
+    for name, result in special_results().items():
+        (folder / f"com.head.{name}.json").write_text(json.dumps(result))
+    return sorted(corpus[0].iterdir()) + sorted(folder.iterdir())
+
+
+def parsed(path, monkeypatch, sniff: bool) -> tuple:
+    """
+    :return: state of a parser after read_ui, with the head read from the file start or only from the full decode
+    """
+    with monkeypatch.context() as patch:
+        if not sniff:
+            patch.setattr(result_head, 'read_head', lambda path: None)
+        frontmatter = FrontmatterUiParser(path)
+        frontmatter.read_ui(False)
+    return frontmatter.ui_error, frontmatter.meta, frontmatter.apk_platform, sorted(frontmatter.activities)
+
+
+def test_head_decides_like_the_full_decode(result_files, monkeypatch):
+    inconclusive = set()
+    for path in result_files:
+        head = result_head.read_head(path)
+        if head is None:
+            inconclusive.add(path.stem)
+        else:
+            with path.open() as fd:
+                data = json.load(fd)
+            assert FrontmatterUiParser(path).accept_head(head) == FrontmatterUiParser(path).accept_head(data)
+        assert parsed(path, monkeypatch, sniff=True) == parsed(path, monkeypatch, sniff=False)
+    assert inconclusive == {'com.head.long_foreign', 'com.head.long_accepted', 'com.head.meta_last'}
+
+
+def test_stale_heads_are_ignored(tmp_path):
+    path = tmp_path / 'com.example.json'
+    path.write_text(json.dumps({'error': 'TIMEOUT'}))
+    cache = result_head.HeadCache(tmp_path / 'heads.pickle')
+    cache.put(path, result_head.read_head(path))
+    cache.save()
+    cache = result_head.HeadCache(tmp_path / 'heads.pickle')
+    assert cache.get(path) == {'error': 'TIMEOUT'}
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+    assert cache.get(path) is None
+    cache.put(path, result_head.read_head(path))
+    path.write_text(json.dumps({'meta': {'type': 'NORMAL'}}))
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))  # same mtime as the entry, other size
+    assert cache.get(path) is None
@@ -0,0 +1,123 @@
+import gzip
+import shutil
+import tarfile
+import zipfile
+
+import pytest
+
+import extract_corpus
+import parse_ui_to_activity
+import parse_ui_to_widgets
+import result_head
+import result_source
+from conftest import table_rows
+from driver import ParseOptions
+
+
+def add_files(archive: tarfile.TarFile, folder, prefix: str, linked: bool):
+    """
+    :param linked: store the data under a non-result name and add the result file as a hard link to it
+    """
+    for path in sorted(folder.iterdir()):
+        if not linked:
+            archive.add(path, f"{prefix}/{path.name}")
+            continue
+        archive.add(path, f"data/{path.stem}.bin")
+        info = tarfile.TarInfo(f"{prefix}/{path.name}")
+        info.type = tarfile.LNKTYPE
+        info.linkname = f"data/{path.stem}.bin"
+        archive.addfile(info)
+
+
+def gzip_folder(folder, target):
+    target.mkdir()
+    for path in folder.iterdir():
+        with path.open('rb') as src, gzip.open(target / f"{path.name}.gz", 'wb') as dest:
+            shutil.copyfileobj(src, dest)
+    return target
+
+
+@pytest.fixture(scope='module')
+def locations(corpus, tmp_path_factory):
+    """
+    :return: storage -> (ui location, api location) holding the same results
+    """
+    folder = tmp_path_factory.mktemp('stored')
+    locations = {'folder': corpus}
+    for suffix, mode in (('.tar', 'w'), ('.tar.gz', 'w:gz')):
+        stored = []
+        for source, linked in zip(corpus, (False, True)):
+            stored.append(folder / f"{source.name}{suffix}")
+            with tarfile.open(stored[-1], mode) as archive:
+                add_files(archive, source, source.name, linked)
+        locations[suffix] = tuple(stored)
+    stored = []
+    for source in corpus:
+        stored.append(folder / f"{source.name}.zip")
+        with zipfile.ZipFile(stored[-1], 'w') as archive:
+            for path in source.iterdir():
+                archive.write(path, f"{source.name}/{path.name}")
+    locations['.zip'] = tuple(stored)
+    locations['.json.gz'] = tuple(gzip_folder(source, folder / f"{source.name}_gz") for source in corpus)
+    locations['split'] = (locations['.tar.gz'][0], locations['.zip'][1])
+    locations['split_gz'] = (locations['.json.gz'][0], locations['.tar'][1])
+    return locations
+
+
+def driver_outputs(ui_location, api_location, streaming) -> dict:
+    """
+    :return: sorted rows of every table and the stats of each driver
+    """
+    outputs = {}
+    for name, read_data in (('widgets', parse_ui_to_widgets.read_data), ('activity', parse_ui_to_activity.read_data)):
+        *tables, stats = read_data(ui_location, api_location, ParseOptions(with_api=True, streaming=streaming))
+        outputs[name] = [table_rows(table) for table in tables], stats
+    tables, stats = extract_corpus.read_data(ui_location, api_location, ParseOptions(tables=extract_corpus.DEFAULT_TABLES, streaming=streaming))
+    outputs['extract'] = {table: table_rows(rows) for table, rows in tables.items()}, stats
+    return outputs
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+@pytest.mark.parametrize('storage', ['.tar', '.tar.gz', '.zip', '.json.gz', 'split', 'split_gz'])
+def test_stored_results_match_folder(locations, storage, streaming):
+    if streaming:
+        pytest.importorskip('ijson')
+    expected = driver_outputs(*locations['folder'], streaming)
+    assert driver_outputs(*locations[storage], streaming) == expected
+
+
+@pytest.mark.parametrize('storage', ['.tar', '.tar.gz', '.zip', '.json.gz'])
+def test_pairs_match_folder(locations, storage):
+    expected = [(ui.name, api.name) for ui, api in result_source.list_pairs(*locations['folder'], True, sort=True)]
+    pairs = result_source.list_pairs(*locations[storage], True, sort=True)
+    assert sorted((result_source.pkg_name(ui), result_source.pkg_name(api)) for ui, api in pairs) == [(ui[:-5], api[:-5]) for ui, api in expected]
+    for ui, api in pairs:
+        with result_source.open_result(api) as fd, (locations['folder'][1] / f"{result_source.pkg_name(api)}.json").open('rb') as plain:
+            assert fd.read() == plain.read()
+
+
+def test_compressed_tarball_is_read_backwards(locations, monkeypatch):
+    restarts = []
+    restart = result_source.TarCursor.restart
+    monkeypatch.setattr(result_source.TarCursor, 'restart', lambda cursor: restarts.append(cursor.index) or restart(cursor))
+    members = result_source.list_results(locations['.tar.gz'][1])
+    cursor = result_source.TarCursor(locations['.tar.gz'][1])
+    for member in reversed(members):
+        with (locations['folder'][1] / member.name).open('rb') as plain:
+            assert cursor.read(member.position) == plain.read()
+        assert cursor.read(member.position) is cursor.data  # read again without moving
+    assert len(restarts) == len(members)
+    with pytest.raises(FileNotFoundError):
+        cursor.read(2 * len(members) + 1)
+
+
+def test_member_reader_reads_head_then_whole_file(locations):
+    for member in result_source.list_results(locations['.tar'][0]):
+        with (locations['folder'][0] / member.name).open('rb') as plain:
+            data = plain.read()
+        with result_source.open_result(member) as fd:
+            assert fd.read(16) == data[:16]
+            assert fd.read() == data[16:]
+        assert result_head.read_head(member) == result_head.read_head(locations['folder'][0] / member.name)
+        with result_source.open_stored(member) as fd:
+            assert fd.read() == data
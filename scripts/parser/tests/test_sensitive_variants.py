@@ -0,0 +1,53 @@
+from pathlib import Path
+
+import pytest
+
+import extract_corpus
+from frontmatter_parser import FrontmatterUiParser
+from permission_index import PermissionIndex
+
+API = '<android.location.LocationManager: android.location.Location getLastKnownLocation(java.lang.String)>'
+URI = 'content://call_log/calls'
+INDEX = PermissionIndex({API: 'android.permission.ACCESS_FINE_LOCATION', URI: 'android.permission.READ_CALL_LOG'}, frozenset(), {})
+
+
+def parser(permissions: list) -> FrontmatterUiParser:
+    frontmatter = FrontmatterUiParser(Path('com.example.json'), permission_index=INDEX)
+    frontmatter.set_permissions(permissions)
+    return frontmatter
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_variants_match_separate_runs(extract, streaming):
+    if streaming:
+        pytest.importorskip('ijson')
+    plain, _ = extract(streaming=streaming)
+    sensitive, _ = extract(sensitive_only=True, streaming=streaming)
+    variants, _ = extract(variants=True, streaming=streaming)
+    api_tables = [table for table in extract_corpus.DEFAULT_TABLES if extract_corpus.TABLES[table][0]]
+    assert variants == {**plain, **{f"{table}{extract_corpus.SENSITIVE_SUFFIX}": sensitive[table] for table in api_tables}}
+    assert any(len(sensitive[table]) < len(plain[table]) for table in api_tables)
+
+
+@pytest.mark.parametrize('first, second', [(['android.permission.ACCESS_FINE_LOCATION', 'android.permission.READ_CALL_LOG'], []),
+                                           ([], ['android.permission.ACCESS_FINE_LOCATION', 'android.permission.READ_CALL_LOG'])])
+def test_second_app_is_decided_by_its_own_permissions(first, second):
+    frontmatter = parser(first)
+    frontmatter.parse_api_call(API, True, '')
+    frontmatter.parse_api_call({'uri': URI, 'method': 'query'}, True, '')
+    frontmatter.set_permissions(second)
+    expected = parser(second)
+    for sensitive_only in (False, True):
+        assert frontmatter.parse_api_call(API, sensitive_only, '') == expected.parse_api_call(API, sensitive_only, '')
+        call = {'uri': URI, 'method': 'query'}
+        assert frontmatter.parse_api_call(call, sensitive_only, '') == expected.parse_api_call(call, sensitive_only, '')
+    assert frontmatter.sensitive_apis == expected.sensitive_apis
+    assert bool(frontmatter.sensitive_apis) == bool(second)
+
+
+def test_filtered_uri_parts_are_dropped():
+    frontmatter = parser([])
+    call = {'uri': f"{URI}|content://com.example.notes", 'method': 'query'}
+    assert frontmatter.parse_api_call(call, False, '') == ['content=//com.example.notes|query']
+    assert frontmatter.parse_api_call(call, True, '') == []
+    assert frontmatter.parse_api_call({'uri': URI, 'method': 'insert'}, False, '') == []
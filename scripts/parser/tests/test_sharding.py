@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+import extract_corpus
+import merge_shards
+import result_source
+import sharding
+from conftest import table_rows
+from driver import ParseOptions, RunOptions
+from table_writer import read_table
+
+SHARDS = 3
+
+
+def test_shards_partition_the_apps(corpus):
+    file_paths = result_source.list_pairs(*corpus, False, sort=True)
+    shards = [sharding.select_shard(file_paths, (index, SHARDS)) for index in range(SHARDS)]
+    assert sorted(paths for shard in shards for paths in shard) == file_paths
+    assert shards == [sharding.select_shard(file_paths, (index, SHARDS)) for index in range(SHARDS)]
+
+
+def test_merged_shards_match_unsharded_run(corpus, tmp_path):
+    options = ParseOptions(tables=extract_corpus.DEFAULT_TABLES)
+    expected, expected_stats = extract_corpus.read_data(*corpus, options)
+    for table, rows in expected.items():
+        extract_corpus.save_data(rows, tmp_path / f"expected_{table}.csv")
+    for index in range(SHARDS):
+        tables, stats = extract_corpus.read_data(*corpus, options, RunOptions(shard=(index, SHARDS)))
+        for table, rows in tables.items():
+            extract_corpus.save_data(rows, sharding.shard_path(tmp_path / f"{table}.csv", (index, SHARDS)))
+        extract_corpus.save_stats(stats, sharding.shard_path(tmp_path / 'stats.json', (index, SHARDS)))
+    outputs = merge_shards.sharded_outputs(tmp_path)
+    assert outputs == sorted([tmp_path / f"{table}.csv" for table in expected] + [tmp_path / 'stats.json'])
+    for output in outputs:
+        merge_shards.merge(output)
+    for table in expected:
+        assert table_rows(read_table(tmp_path / f"{table}.csv")) == table_rows(read_table(tmp_path / f"expected_{table}.csv"))
+    with (tmp_path / 'stats.json').open() as fd:
+        assert json.load(fd) == expected_stats
+
+
+def profile(apps, seconds):
+    return {'apps': len(apps), 'phases': {'total': {'apps': len(apps), 'seconds': sum(seconds), 'p50': seconds[0], 'p95': seconds[-1], 'max': max(seconds)}},
+            'counters': {'views': len(apps)}, 'slowest': [{'pkg': pkg, 'seconds': value, 'phases': {}} for pkg, value in zip(apps, seconds)], 'top': 2}
+
+
+def test_merged_stats_keep_max_and_rerank_slowest_apps():
+    shard_stats = [{'prefetch': {'depth': 4, 'files': 2}, 'profile': profile(['a', 'b'], [0.5, 0.25])},
+                   {'prefetch': {'depth': 4, 'files': 3}, 'profile': profile(['c', 'd'], [0.75, 0.125])}]
+    merged = merge_shards.merge_stats(shard_stats)
+    assert merged['prefetch'] == {'depth': 4, 'files': 5}
+    assert merged['profile']['phases'] == {'total': {'apps': 4, 'seconds': 1.625, 'max': 0.75}}
+    assert [app['pkg'] for app in merged['profile']['slowest']] == ['c', 'a']
+    assert merged['profile']['counters'] == {'views': 4}
+
+
+def test_list_stats_are_refused():
+    with pytest.raises(ValueError):
+        merge_shards.merge_stats([{'files': ['a']}, {'files': ['b']}])
+
+
+def test_sharded_feature_stores_are_merged(corpus, tmp_path):
+    pytest.importorskip('scipy')
+    import feature_matrix
+    options = ParseOptions(tables=['widgets'])
+    expected = feature_matrix.FeatureStore(tmp_path / 'expected')
+    extract_corpus.read_data(*corpus, options, features=expected)
+    for index in range(SHARDS):
+        store = feature_matrix.FeatureStore(sharding.shard_path(tmp_path / 'out' / 'features', (index, SHARDS)))
+        extract_corpus.read_data(*corpus, options, RunOptions(shard=(index, SHARDS)), features=store)
+        store.save()
+    assert merge_shards.sharded_outputs(tmp_path / 'out') == [tmp_path / 'out' / 'features']
+    merge_shards.merge(tmp_path / 'out' / 'features')
+    merged = feature_matrix.FeatureStore(tmp_path / 'out' / 'features')
+    assert sorted(merged.vocabularies['apps'].keys()) == sorted(expected.vocabularies['apps'].keys())
+    for name, (rows, columns) in feature_matrix.MATRICES.items():
+        assert entries(merged, name, rows, columns) == entries(expected, name, rows, columns)
+
+
+def entries(store, name, rows, columns) -> set:
+    matrix = store.matrix(name).tocoo()
+    row_keys = store.vocabularies[rows].keys()
+    column_keys = store.vocabularies[columns].keys()
+    return {(row_keys[row], column_keys[column], value) for row, column, value in zip(matrix.row, matrix.col, matrix.data)}
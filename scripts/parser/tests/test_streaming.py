@@ -0,0 +1,39 @@
+import io
+import json
+
+import pytest
+
+import extract_corpus
+import json_stream
+from conftest import table_rows
+from driver import ParseOptions
+
+pytest.importorskip('ijson')
+
+
+@pytest.mark.parametrize('sensitive_only', [False, True])
+def test_streaming_matches_full_decoding(extract, sensitive_only):
+    full, full_stats = extract(sensitive_only=sensitive_only)
+    streamed, streamed_stats = extract(sensitive_only=sensitive_only, streaming=True)
+    assert streamed == full
+    assert streamed_stats == full_stats
+
+
+def test_iter_items_builds_values_in_order():
+    doc = b'{"meta": {"type": "NORMAL"}, "activities": [{"name": "a", "layouts": [1, 2]}, {"name": "b"}], "transitions": []}'
+    items = list(json_stream.iter_items(io.BytesIO(doc), {'meta', 'activities.item'}))
+    assert items == [('meta', {'type': 'NORMAL'}), ('activities.item', {'name': 'a', 'layouts': [1, 2]}), ('activities.item', {'name': 'b'})]
+
+
+def test_api_results_without_permissions_are_read_alike(corpus, tmp_path):
+    ui_dir, api_dir = corpus
+    meta_only = tmp_path / 'api'
+    meta_only.mkdir()
+    for path in api_dir.iterdir():
+        (meta_only / path.name).write_text(json.dumps({'meta': {'type': 'NOT_ANALYSABLE'}}))  # ApiModelSerializer
+    options = ParseOptions(tables=['widgets', 'widget_api', 'component_api'], sensitive_only=False)
+    full, full_stats = extract_corpus.read_data(ui_dir, meta_only, options)
+    streamed, streamed_stats = extract_corpus.read_data(ui_dir, meta_only, options._replace(streaming=True))
+    assert not full['widgets'].empty and full['widget_api'].empty and full['component_api'].empty
+    assert {table: table_rows(rows) for table, rows in streamed.items()} == {table: table_rows(rows) for table, rows in full.items()}
+    assert streamed_stats == full_stats
@@ -0,0 +1,40 @@
+import pandas as pd
+import pytest
+
+import extract_corpus
+import string_dictionary
+from conftest import table_rows
+from driver import ParseOptions
+
+
+def test_decoded_tables_match_plain_tables(corpus):
+    options = ParseOptions(tables=extract_corpus.DEFAULT_TABLES)
+    plain, _ = extract_corpus.read_data(*corpus, options)
+    coded, _ = extract_corpus.read_data(*corpus, options._replace(intern=True))
+    dictionary = string_dictionary.check_dictionary(coded[string_dictionary.DICTIONARY_TABLE])
+    strings = dict(zip(dictionary['id'], dictionary['string']))
+    for table, rows in plain.items():
+        columns = [column for column in rows.columns if rows[column].map(lambda value: isinstance(value, str)).all()]
+        assert columns or rows.empty
+        assert table_rows(string_dictionary.decode(coded[table], strings, columns)) == table_rows(rows)
+
+
+def test_ids_are_stable_63_bit_integers():
+    for text in ('', 'ok', 'android.widget.Button', 'Größe \U0001f600'):
+        assert string_dictionary.string_id(text) == string_dictionary.string_id(text[:]) < 2 ** 63
+
+
+def test_shard_dictionaries_are_united(tmp_path):
+    paths = []
+    for index, texts in enumerate((['a', 'b', ''], ['b', 'c', ''])):
+        strings = {}
+        string_dictionary.encode_rows([{'text': text} for text in texts], strings)
+        paths.append(tmp_path / f"strings.shard-{index}-of-2.csv")
+        pd.DataFrame(string_dictionary.dictionary_rows(strings)).to_csv(paths[-1], index=False)
+    merged = string_dictionary.merge_dictionaries(paths)
+    assert sorted(merged['string']) == ['', 'a', 'b', 'c']
+
+
+def test_colliding_ids_are_detected():
+    with pytest.raises(ValueError):
+        string_dictionary.check_dictionary(pd.DataFrame({'id': [1, 1], 'string': ['a', 'b']}))
@@ -0,0 +1,80 @@
+import itertools
+from collections import defaultdict
+from pathlib import Path
+
+import pytest
+
+import extract_corpus
+import transition_graph
+from driver import ParseOptions
+from frontmatter_parser import FrontmatterUiParser
+
+
+def button(guid, text) -> dict:
+    return {'viewClass': 'android.widget.Button', 'guid': guid, 'textAttributes': [{'name': 'text', 'value': text}]}
+
+
+def test_string_trigger_is_kept_whole():
+    frontmatter = FrontmatterUiParser(Path('com.synthetic.trigger.json'))
+    frontmatter.parse_activities([{'name': 'com.synthetic.trigger.Login', 'titles': ['Login'], 'layouts': [button(1, 'Sign in')]},
+                                  {'name': 'com.synthetic.trigger.Home', 'titles': ['Home'], 'layouts': [button(2, 'Log "out"')]}])
+    frontmatter.parse_transitions([{'scr': 'com.synthetic.trigger.Login', 'dest': 'com.synthetic.trigger.Home', 'trigger': [1]},
+                                   {'scr': 'com.synthetic.trigger.Home', 'dest': 'com.synthetic.trigger.Login', 'trigger': [2]},
+                                   {'scr': 'com.synthetic.trigger.Home', 'dest': 'com.synthetic.trigger.Home', 'trigger': []}])
+    assert sorted(row['triggers'] for row in frontmatter.get_app_data_transitions()) == ['', "Log 'out'", 'Sign in']
+    graph = frontmatter.get_transition_graph()
+    labels = {-1: '', **{row['label_set']: row['label'] for row in graph.label_sets}}
+    assert sorted(labels[edge['trigger']] for edge in graph.edges) == ['', "Log 'out'", 'Sign in']
+
+
+@pytest.fixture(scope='module')
+def graph_tables(corpus, tmp_path_factory):
+    """
+    :return: transitions and graph tables of the corpus, path of the corpus graph file
+    """
+    path = tmp_path_factory.mktemp('graph') / 'graph.npz'
+    with transition_graph.GraphWriter(path) as writer:
+        tables, _ = extract_corpus.read_data(*corpus, ParseOptions(tables=['transitions', *transition_graph.GRAPH_TABLES]), graph=writer)
+    return tables, path
+
+
+def combinations(groups: list) -> list:
+    return [f" {FrontmatterUiParser.sentence_delimiter} ".join(labels) for labels in itertools.product(*groups)] if groups else []
+
+
+def test_graph_tables_expand_to_the_transitions_table(graph_tables):
+    tables, _ = graph_tables
+    groups = defaultdict(list)  # (pkg, label set) -> label groups
+    for row in tables['graph_label_sets'].itertuples(index=False):
+        key = row.pkg, row.label_set
+        if len(groups[key]) <= row.group:
+            groups[key].append([])
+        groups[key][row.group].append(row.label)
+    nodes = {(row.pkg, row.node): row.label_set for row in tables['graph_nodes'].itertuples(index=False)}
+    expanded = set()
+    for edge in tables['graph_edges'].itertuples(index=False):
+        trigger = groups[edge.pkg, edge.trigger][0][0] if edge.trigger >= 0 else ''
+        for src in combinations(groups.get((edge.pkg, nodes[edge.pkg, edge.src]), [])):
+            for dest in combinations(groups.get((edge.pkg, nodes[edge.pkg, edge.dest]), [])):
+                expanded.add((edge.pkg, src, trigger, dest))
+    assert expanded == set(tables['transitions'][['pkg', 'src', 'triggers', 'dest']].itertuples(index=False, name=None))
+    assert len(expanded) > 0
+
+
+def test_csr_arrays_match_the_edge_table(graph_tables):
+    tables, path = graph_tables
+    arrays = transition_graph.load_graph(path)
+    edges, nodes = tables['graph_edges'], tables['graph_nodes']
+    assert arrays['pkgs'].tolist() == list(dict.fromkeys(nodes['pkg']))
+    expected, found = [], []
+    for app, pkg in enumerate(arrays['pkgs'].tolist()):
+        first, end = arrays['app_ptr'][app], arrays['app_ptr'][app + 1]
+        app_nodes = nodes[nodes['pkg'] == pkg].sort_values('node')
+        assert arrays['activities'][first:end].tolist() == app_nodes['activity'].tolist()
+        assert arrays['label_sets'][first:end].tolist() == app_nodes['label_set'].tolist()
+        expected.extend(sorted((pkg, row.src, row.dest, row.trigger) for row in edges[edges['pkg'] == pkg].itertuples(index=False)))
+        for src in range(end - first):
+            start, stop = arrays['indptr'][first + src], arrays['indptr'][first + src + 1]
+            found.extend((pkg, src, int(dest) - first, int(trigger)) for dest, trigger in zip(arrays['indices'][start:stop], arrays['triggers'][start:stop]))
+    assert found == expected
+    assert arrays['indptr'][-1] == len(edges) > 0
@@ -0,0 +1,61 @@
+import copy
+import sys
+from pathlib import Path
+
+import generate_results
+from frontmatter_parser import FrontmatterUiParser
+
+
+def parse(activities) -> FrontmatterUiParser:
+    frontmatter = FrontmatterUiParser(Path('com.synthetic.walker.json'))
+    frontmatter.parse_activities(activities)
+    return frontmatter
+
+
+def activity(name, layout):
+    return {'name': name, 'titles': [name.rsplit('.', 1)[-1]], 'layouts': [layout]}
+
+
+def layout(seed: int) -> dict:
+    generator = generate_results.AppGenerator(generate_results.GeneratorConfig(text_rate=0.9), seed, 0, generate_results.sensitive_apis())
+    return generator.view(5)
+
+
+def labels(frontmatter) -> dict:
+    return {row['activity']: row['labels'] for row in frontmatter.get_activity_data()}
+
+
+def test_deep_tree_does_not_recurse():
+    depth = 2 * sys.getrecursionlimit()
+    node = {'viewClass': 'android.widget.Button', 'guid': depth + 1, 'textAttributes': [{'name': 'text', 'value': 'leaf'}]}
+    for guid in range(depth, 0, -1):
+        node = {'viewClass': 'android.widget.LinearLayout', 'guid': guid, 'children': [node]}
+    frontmatter = parse([activity('com.synthetic.walker.Deep', node)])
+    assert len(frontmatter.ui) == depth + 1
+    assert frontmatter.ui[1].label == 'leaf'
+
+
+def test_replayed_layout_matches_fresh_parse():
+    for seed in range(20):
+        shared = layout(seed)
+        replayed = parse([activity('com.synthetic.walker.A', shared), activity('com.synthetic.walker.B', shared)])
+        fresh = parse([activity('com.synthetic.walker.B', copy.deepcopy(shared))])
+        assert labels(replayed)['com.synthetic.walker.B'] == labels(replayed)['com.synthetic.walker.A'] == labels(fresh)['com.synthetic.walker.B']
+        assert replayed.get_widget_ui_data(True) == fresh.get_widget_ui_data(True)
+        assert replayed.truncated_alternatives == 2 * fresh.truncated_alternatives
+
+
+def test_copied_layout_shares_texts():
+    for seed in range(20):
+        original = layout(seed)
+        copied = copy.deepcopy(original)
+        stack = [copied]
+        while stack:
+            node = stack.pop()
+            if 'guid' in node:
+                node['guid'] += 100000
+            stack.extend(node.get('children', []) + node.get('layouts', []))
+        frontmatter = parse([activity('com.synthetic.walker.A', original), activity('com.synthetic.walker.B', copied)])
+        fresh = parse([activity('com.synthetic.walker.B', copy.deepcopy(copied))])
+        assert labels(frontmatter)['com.synthetic.walker.B'] == labels(fresh)['com.synthetic.walker.B']
+        assert {guid: view.label for guid, view in frontmatter.ui.items() if guid > 100000} == {guid: view.label for guid, view in fresh.ui.items()}
@@ -0,0 +1,124 @@
+"""
+CSR adjacency arrays of the normalized transition graph (graph_nodes/graph_edges tables of extract_corpus.py)
+A .npz file has the arrays
+    pkgs: package per app, app_ptr: nodes of app i are app_ptr[i]:app_ptr[i + 1]
+    activities: activity name per node, label_sets: label set id per node
+    indptr/indices: CSR rows (src nodes) with the dest nodes, triggers: trigger label set per edge
+Node ids are corpus-wide in a corpus file and equal the app's node ids in a per-app file, label set ids are always local
+to the app (rows of graph_label_sets with its pkg), -1 stands for no labels/trigger
+"""
+from pathlib import Path
+
+import numpy as np
+
+from table_writer import PackedRows
+
+GRAPH_TABLES = ('graph_nodes', 'graph_label_sets', 'graph_edges')
+
+
+def row_dicts(rows) -> list:
+    if isinstance(rows, PackedRows):
+        return [dict(zip(rows.columns, row)) for row in rows.rows]
+    return rows
+
+
+def app_graph(nodes: list, edges: list) -> dict:
+    """
+    :param nodes: graph_nodes rows of an app
+    :param edges: graph_edges rows of the app
+    :return: graph arrays of the app, edges sorted by (src, dest, trigger)
+    """
+    label_sets = np.full(len(nodes), -1, dtype=np.int32)
+    activities = np.empty(len(nodes), dtype=object)
+    for node in nodes:
+        label_sets[node['node']] = node['label_set']
+        activities[node['node']] = node['activity']
+    src = np.fromiter((edge['src'] for edge in edges), dtype=np.int32, count=len(edges))
+    dest = np.fromiter((edge['dest'] for edge in edges), dtype=np.int32, count=len(edges))
+    triggers = np.fromiter((edge['trigger'] for edge in edges), dtype=np.int32, count=len(edges))
+    order = np.lexsort((triggers, dest, src))
+    indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=len(nodes)), out=indptr[1:])
+    return {'pkgs': np.array([nodes[0]['pkg']]), 'app_ptr': np.array([0, len(nodes)], dtype=np.int64), 'activities': activities.astype(str), 'label_sets': label_sets,
+            'indptr': indptr, 'indices': dest[order], 'triggers': triggers[order]}
+
+
+def concat_graphs(graphs: list) -> dict:
+    """
+    :param graphs: graph arrays of disjoint sets of apps
+    :return: graph arrays of all apps, node ids are shifted by the nodes of the preceding graphs
+    """
+    node_offsets = np.cumsum([0] + [len(graph['label_sets']) for graph in graphs])
+    edge_offsets = np.cumsum([0] + [graph['indptr'][-1] for graph in graphs])
+    return {
+        'pkgs': np.concatenate([np.zeros(0, dtype=str)] + [graph['pkgs'] for graph in graphs]),
+        'app_ptr': np.concatenate([[0]] + [graph['app_ptr'][1:] + offset for graph, offset in zip(graphs, node_offsets)]).astype(np.int64),
+        'activities': np.concatenate([np.zeros(0, dtype=str)] + [graph['activities'] for graph in graphs]),
+        'label_sets': np.concatenate([np.zeros(0, dtype=np.int32)] + [graph['label_sets'] for graph in graphs]),
+        'indptr': np.concatenate([[0]] + [graph['indptr'][1:] + offset for graph, offset in zip(graphs, edge_offsets)]).astype(np.int64),
+        'indices': np.concatenate([np.zeros(0, dtype=np.int32)] + [graph['indices'] + offset for graph, offset in zip(graphs, node_offsets)]).astype(np.int32),
+        'triggers': np.concatenate([np.zeros(0, dtype=np.int32)] + [graph['triggers'] for graph in graphs]),
+    }
+
+
+def save_graph(graph: dict, path):
+    np.savez_compressed(path, **graph)
+
+
+class GraphWriter:
+    """
+    collects the graphs of the extracted apps into one .npz (path ending with .npz) or writes <pkg>.npz files into a folder
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.per_app = self.path.suffix != '.npz'
+        if self.per_app:
+            self.path.mkdir(parents=True, exist_ok=True)
+        self.graphs = []  # graphs of the apps of a corpus file
+        self.apps = 0
+        self.nodes = 0
+        self.edges = 0
+
+    def add_app(self, nodes, edges, strings=None):
+        """
+        :param nodes: graph_nodes rows (dicts or PackedRows) of an app
+        :param edges: graph_edges rows of the app
+        :param strings: dictionary rows of the app if the rows are integer-coded (see string_dictionary)
+        """
+        nodes = row_dicts(nodes)
+        if not nodes:
+            return
+        if strings is not None:
+            names = {row['id']: row['string'] for row in row_dicts(strings)}
+            nodes = [{**node, 'pkg': names[node['pkg']], 'activity': names[node['activity']]} for node in nodes]
+        graph = app_graph(nodes, row_dicts(edges))
+        self.apps += 1
+        self.nodes += len(nodes)
+        self.edges += len(graph['indices'])
+        if self.per_app:
+            save_graph(graph, self.path / f"{nodes[0]['pkg']}.npz")
+        else:
+            self.graphs.append(graph)
+
+    def close(self):
+        if not self.per_app:
+            save_graph(concat_graphs(self.graphs), self.path)
+
+    def stats(self) -> dict:
+        return {'apps': self.apps, 'nodes': self.nodes, 'edges': self.edges}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+
+
+def load_graph(path) -> dict:
+    """
+    :return: arrays of a .npz graph file
+    """
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}